@@ -1,8 +1,28 @@
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 
-class NoCacheMiddleware(MiddlewareMixin):
+
+class PoliticaCacheMiddleware(MiddlewareMixin):
+    """
+    Política de caché HTTP por defecto. Las respuestas que ya traen
+    Cache-Control (vistas públicas del catálogo con
+    catalogo.versiones.pagina_publica) se dejan como vienen; los archivos
+    estáticos y de media servidos por Django se pueden guardar un día; todo
+    lo demás (mantenedores, formularios, sesión) queda con no-store.
+    """
+
     def process_response(self, request, response):
+        if response.has_header('Cache-Control'):
+            return response
+        if self._es_archivo(request.path):
+            response['Cache-Control'] = f'public, max-age={getattr(settings, "ARCHIVOS_HTTP_MAX_AGE", 86400)}'
+            return response
         response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
         response['Pragma'] = 'no-cache'
         response['Expires'] = '0'
         return response
+
+    @staticmethod
+    def _es_archivo(ruta):
+        prefijos = [p for p in (settings.STATIC_URL, settings.MEDIA_URL) if p and p != '/']
+        return any(ruta.startswith(p if p.startswith('/') else '/' + p) for p in prefijos)
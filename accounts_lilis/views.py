@@ -13,10 +13,15 @@ from django.contrib.auth import logout
 from .models import Usuario
 from .forms import RegisterForm, UsuarioAdminForm, CustomSetPasswordForm
 
+import logging
 import random
 import string
 from django.core.mail import send_mail
 
+from inventario.auditoria import registrar
+
+logger = logging.getLogger(__name__)
+
 class RegisterView(View):
     template_name = "accounts_lilis/register.html"
 
@@ -28,10 +33,7 @@ class RegisterView(View):
         form = RegisterForm(request.POST)
         if form.is_valid():
             user = form.save()
-            
-            # --- LOG AUDITORÍA ---
-            print(f"🆕 [AUDITORIA] Fecha: {timezone.now()} | IP: {request.META.get('REMOTE_ADDR')} | Acción: REGISTRO_PUBLICO | Usuario creado: {user.username}")
-            # ---------------------
+            registrar("REGISTRO_PUBLICO", request, usuario=user, entidad="usuario", entidad_id=user.id)
 
             messages.success(request, "✅ Registro exitoso. ¡Bienvenido/a!")
             auth_login(request, user)
@@ -72,9 +74,10 @@ def usuario_agregar(request):
             usuario.requiere_cambio_password = True 
             usuario.save()
 
-            # --- LOG AUDITORÍA ---
-            print(f"🔍 [AUDITORIA] Fecha: {timezone.now()} | Admin: {request.user.username} | Acción: CREAR_USUARIO | Nuevo Usuario: {usuario.username} | Rol: {usuario.rol}")
-            # ---------------------
+            registrar(
+                "CREAR_USUARIO", request, entidad="usuario", entidad_id=usuario.id,
+                nuevo_usuario=usuario.username, rol=usuario.rol,
+            )
 
             # Envío de correo (dentro de try/except por si falla no rompa la auditoría)
             try:
@@ -85,8 +88,8 @@ def usuario_agregar(request):
                     recipient_list=[usuario.email],
                     fail_silently=False,
                 )
-            except Exception as e:
-                print(f"⚠️ Error enviando correo: {e}")
+            except Exception:
+                logger.exception("Error enviando correo de bienvenida a %s", usuario.username)
 
             messages.success(request, "✅ Usuario creado y contraseña temporal enviada por correo.")
             return redirect("accounts_lilis:usuario_listar")
@@ -120,14 +123,15 @@ def usuario_editar(request, id):
                 usuario_editado.estado = "ACTIVO"
             usuario_editado.save()    
 
-            # --- LOG AUDITORÍA ---
-            print(f"✏️ [AUDITORIA] Fecha: {timezone.now()} | Admin: {request.user.username} | Acción: EDITAR_USUARIO | ID Afectado: {usuario.id} ({usuario.username})")
-            # ---------------------
+            registrar(
+                "EDITAR_USUARIO", request, entidad="usuario", entidad_id=usuario.id,
+                usuario_afectado=usuario.username, campos=form.changed_data,
+            )
 
             messages.success(request, "✅ Usuario modificado correctamente.")
             return redirect("accounts_lilis:usuario_listar")
         else:
-            print("ERRORES:", form.errors)  
+            logger.debug("Errores al editar usuario %s: %s", usuario.id, form.errors.as_json())
 
     return render(request, "mantenedores/usuarios/usuarios_editar.html", {
             "form": form,
@@ -146,9 +150,10 @@ def usuario_eliminar(request, id):
         messages.error(request, " No puedes eliminar al administrador principal.")
         return redirect("accounts_lilis:usuario_listar")
 
-    # --- LOG AUDITORÍA ---
-    print(f" [AUDITORIA] Fecha: {timezone.now()} | Admin: {request.user.username} | Acción: ELIMINAR_USUARIO | Usuario eliminado: {usuario.username} (ID: {usuario.id})")
-    # ---------------------
+    registrar(
+        "ELIMINAR_USUARIO", request, entidad="usuario", entidad_id=usuario.id,
+        usuario_eliminado=usuario.username,
+    )
 
     usuario.delete()
     messages.success(request, "✅ Usuario eliminado.")
@@ -178,7 +183,7 @@ def login_personalizado(request):
             user.sesiones_activas = user.sesiones_activas + 1
             user.save(update_fields=["ultimo_acceso", "sesiones_activas"])
 
-            print(f" [AUDITORIA] Fecha: {timezone.now()} | Usuario: {user.username} | Acción: LOGIN_EXITOSO | Rol: {user.rol}")
+            registrar("LOGIN_EXITOSO", request, usuario=user, entidad="sesion", rol=user.rol)
 
             if user.requiere_cambio_password:
                 return redirect("accounts_lilis:cambiar_password_obligatorio")
@@ -192,7 +197,7 @@ def login_personalizado(request):
             return redirect("mantenedores")
 
         messages.error(request, " Usuario o contraseña incorrectos")
-        print(f" [AUDITORIA] Fecha: {timezone.now()} | Acción: LOGIN_FALLIDO | Usuario intentado: {username}")
+        registrar("LOGIN_FALLIDO", request, username=(username or "")[:150], entidad="sesion")
 
     return render(request, "accounts_lilis/login.html")
 
@@ -214,8 +219,7 @@ class CambioPasswordObligatorioView(PasswordChangeView):
 @login_required
 def logout_personalizado(request):
     user = request.user
-    
-    print(f"[AUDITORIA] Fecha: {timezone.now()} | Usuario: {user.username} | Acción: LOGOUT")
+    registrar("LOGOUT", request, entidad="sesion")
 
     if user.sesiones_activas > 0:
         user.sesiones_activas -= 1
@@ -4,8 +4,9 @@ from catalogo.models import Categoria, Producto
 
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
-    list_display = ['id', 'nombre']
+    list_display = ['id', 'nombre', 'slug']
     search_fields = ['nombre']
+    readonly_fields = ['slug']
     ordering = ['nombre']
 
 
@@ -23,4 +24,5 @@ class ProductoAdmin(admin.ModelAdmin):
     ]
     list_filter = ['categoria', 'perishable', 'control_por_lote']
     search_fields = ['nombre', 'sku', 'descripcion']
+    readonly_fields = ['slug']
     ordering = ['nombre']
@@ -0,0 +1,44 @@
+"""
+Storage de Producto.imagen con nombres por contenido.
+
+Cada imagen subida se guarda como <upload_to>/<sha256>.<ext>: volver a
+subir el mismo archivo (o el mismo archivo en otro producto) reutiliza el
+que ya está en disco en vez de crear dubai_4r8NIOI.webp,
+dubai_4r8NIOI_BLDHQIE.webp, ... Los archivos que ningún producto usa los
+borra el comando limpiar_media_productos.
+"""
+import hashlib
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible(path="catalogo.almacenamiento.AlmacenamientoPorContenido")
+class AlmacenamientoPorContenido(FileSystemStorage):
+
+    def __init__(self, **kwargs):
+        # El mismo nombre siempre tiene el mismo contenido: sobrescribir es
+        # inofensivo y evita los sufijos al chocar dos subidas iguales
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def nombre_por_contenido(self, name, content):
+        digest = hashlib.sha256()
+        for parte in content.chunks():
+            digest.update(parte)
+        content.seek(0)
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(posixpath.dirname(name), f"{digest.hexdigest()}{extension}")
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        nombre = self.nombre_por_contenido(name, content)
+        if self.exists(nombre):
+            return nombre
+        return super().save(nombre, content, max_length=max_length)
+
+    def guardar_con_nombre(self, name, content, max_length=None):
+        """save() sin renombrar por contenido (derivadas de catalogo.imagenes)."""
+        return super().save(name, content, max_length=max_length)
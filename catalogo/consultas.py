@@ -0,0 +1,61 @@
+from django.db.models import Q
+
+from .models import Producto
+
+
+def filtrar_productos(q="", categoria=""):
+    """Filtros del listado de productos: texto (nombre / SKU / categoría) y categoría."""
+    qs = Producto.objects.select_related("categoria").order_by("nombre")
+    if categoria:
+        qs = qs.filter(categoria__nombre=categoria)
+    if q:
+        qs = qs.filter(
+            Q(nombre__icontains=q) |
+            Q(sku__icontains=q) |
+            Q(categoria__nombre__icontains=q)
+        )
+    return qs
+
+
+def buscar_productos(q, limite):
+    """
+    Productos cuyo SKU, EAN o nombre empieza con `q`, hasta `limite`. Una
+    consulta por campo (cada una por su índice) en vez de un OR que obliga
+    a recorrer la tabla.
+    """
+    encontrados = {}
+    for campo in ("sku", "ean_upc", "nombre"):
+        faltan = limite - len(encontrados)
+        if faltan <= 0:
+            break
+        qs = (
+            Producto.objects.filter(**{f"{campo}__istartswith": q})
+            .exclude(pk__in=list(encontrados))
+            .order_by(campo)
+            .only("sku", "ean_upc", "nombre")
+        )
+        for producto in qs[:faltan]:
+            encontrados[producto.pk] = producto
+    return list(encontrados.values())
+
+
+COLUMNAS_EXPORTACION = [
+    ("SKU", lambda p: p.sku),
+    ("EAN/UPC", lambda p: p.ean_upc or ""),
+    ("Nombre", lambda p: p.nombre),
+    ("Categoría", lambda p: p.categoria.nombre),
+    ("Marca", lambda p: p.marca or ""),
+    ("Modelo", lambda p: p.modelo or ""),
+    ("UOM compra", lambda p: p.uom_compra),
+    ("UOM venta", lambda p: p.uom_venta),
+    ("Costo estándar", lambda p: float(p.costo_estandar) if p.costo_estandar is not None else ""),
+    ("Costo promedio", lambda p: float(p.costo_promedio) if p.costo_promedio is not None else ""),
+    ("Precio venta", lambda p: float(p.precio_venta) if p.precio_venta is not None else ""),
+    ("IVA (%)", lambda p: p.impuesto_iva),
+    ("Stock mínimo", lambda p: p.stock_minimo),
+    ("Stock máximo", lambda p: p.stock_maximo if p.stock_maximo is not None else ""),
+    ("Punto reorden", lambda p: p.punto_reorden if p.punto_reorden is not None else ""),
+    ("Perecible", lambda p: "Sí" if p.perishable else "No"),
+    ("Control por lote", lambda p: "Sí" if p.control_por_lote else "No"),
+    ("Control por serie", lambda p: "Sí" if p.control_por_serie else "No"),
+]
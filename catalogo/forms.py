@@ -1,5 +1,6 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from .imagenes import generar_derivadas_seguro
 from .models import Categoria, Producto
 import re
 
@@ -105,9 +106,11 @@ class ProductoForm(forms.ModelForm):
         widget=forms.NumberInput(attrs={"class": "form-control"})
     )
 
+    # Lo calcula la valorización de inventario a partir de los movimientos
     costo_promedio = forms.DecimalField(
         required=False,
-        min_value=0,
+        disabled=True,
+        help_text="Se calcula automáticamente con los ingresos de inventario.",
         widget=forms.NumberInput(attrs={"class": "form-control"})
     )
 
@@ -181,3 +184,33 @@ class ProductoForm(forms.ModelForm):
 
         if punto_reorden and stock_max and punto_reorden > stock_max:
             raise ValidationError("El punto de reorden no puede ser mayor al stock máximo.")
+
+    def save(self, commit=True):
+        if "imagen" in self.changed_data:
+            # Las derivadas de la imagen anterior ya no sirven
+            self.instance.imagen_derivadas = False
+        producto = super().save(commit=commit)
+        if "imagen" in self.changed_data and producto.imagen:
+            if commit:
+                self._generar_derivadas(producto)
+            else:
+                # Con commit=False el archivo se escribe cuando la vista guarda
+                # el producto, antes de llamar a save_m2m()
+                save_m2m = self.save_m2m
+
+                def _save_m2m():
+                    save_m2m()
+                    self._generar_derivadas(producto)
+                self.save_m2m = _save_m2m
+        return producto
+
+    def _generar_derivadas(self, producto):
+        # Una imagen que Pillow no puede procesar no impide guardar el producto;
+        # queda sin marcar y se muestra el original. El nombre es por
+        # contenido: si ya existían derivadas con ese nombre, son de la misma
+        # imagen y no se regeneran
+        _, _, error = generar_derivadas_seguro(producto.imagen.name)
+        if error is None:
+            producto.imagen_derivadas = True
+            # save() y no update(): las señales invalidan la caché del catálogo
+            producto.save(update_fields=["imagen_derivadas"])
@@ -0,0 +1,228 @@
+"""
+Derivadas de Producto.imagen para mostrar en listados y en el catálogo.
+
+Cada imagen subida se guarda tal cual (con nombre por contenido, ver
+catalogo.almacenamiento) y, junto a ella, versiones reducidas en WebP y
+JPEG para cada tamaño de TAMANOS:
+
+    productos/9f86d08….webp              (original)
+    productos/9f86d08…__miniatura.webp
+    productos/9f86d08…__miniatura.jpg
+    productos/9f86d08…__tarjeta.webp
+    ...
+
+ProductoForm las genera al guardar una imagen nueva y el comando
+generar_derivadas_imagenes las crea para las imágenes existentes; ambos
+marcan Producto.imagen_derivadas. El tag {% imagen_producto %}
+(catalogo.templatetags.imagenes) lee esa marca y arma el <picture> con
+srcset a partir de los nombres, sin consultar la BD ni el storage.
+
+consolidar_nombres(), archivos_sin_uso() y eliminar_archivos() son la base
+del comando limpiar_media_productos: pasan las imágenes antiguas a nombres
+por contenido y borran los originales que ningún producto referencia y
+sus derivadas.
+"""
+import logging
+import posixpath
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from PIL import Image, ImageOps
+
+from .models import Producto
+
+
+logger = logging.getLogger(__name__)
+
+# Ancho máximo en píxeles de cada derivada (nunca se agranda el original)
+TAMANOS = {
+    "miniatura": 160,
+    "tarjeta": 480,
+    "detalle": 1200,
+}
+FORMATOS = {
+    "webp": "WEBP",
+    "jpg": "JPEG",
+}
+CALIDAD = getattr(settings, "CATALOGO_IMAGEN_CALIDAD", 80)
+FONDO_JPEG = (255, 255, 255)
+
+
+def ruta_derivada(nombre, tamano, extension):
+    """Nombre en el storage de la derivada de la imagen original nombre."""
+    directorio, archivo = posixpath.split(nombre)
+    base = posixpath.splitext(archivo)[0]
+    return posixpath.join(directorio, f"{base}__{tamano}.{extension}")
+
+
+def rutas_derivadas(nombre):
+    return [
+        ruta_derivada(nombre, tamano, extension)
+        for tamano in TAMANOS
+        for extension in FORMATOS
+    ]
+
+
+def storage_imagenes():
+    return Producto._meta.get_field("imagen").storage
+
+
+def directorio_imagenes():
+    return Producto._meta.get_field("imagen").upload_to.rstrip("/")
+
+
+def tiene_derivadas(nombre, storage=None):
+    storage = storage or storage_imagenes()
+    # Se generan todas juntas y la detalle JPEG es la última en escribirse
+    return storage.exists(ruta_derivada(nombre, "detalle", "jpg"))
+
+
+def _codificar(imagen, formato):
+    if formato == "JPEG" and imagen.mode != "RGB":
+        # JPEG no tiene transparencia: se aplana sobre blanco
+        fondo = Image.new("RGB", imagen.size, FONDO_JPEG)
+        rgba = imagen.convert("RGBA")
+        fondo.paste(rgba, mask=rgba.getchannel("A"))
+        imagen = fondo
+    elif formato == "WEBP" and imagen.mode not in ("RGB", "RGBA"):
+        imagen = imagen.convert("RGBA")
+    if formato == "JPEG":
+        opciones = {"quality": CALIDAD, "optimize": True, "progressive": True}
+    else:
+        opciones = {"quality": CALIDAD, "method": 6}
+    salida = BytesIO()
+    imagen.save(salida, formato, **opciones)
+    return salida.getvalue()
+
+
+def _guardar(storage, ruta, contenido):
+    # AlmacenamientoPorContenido renombra lo que recibe en save(); las
+    # derivadas llevan el nombre de su original
+    guardar = getattr(storage, "guardar_con_nombre", None)
+    if guardar is None:
+        if storage.exists(ruta):
+            storage.delete(ruta)
+        guardar = storage.save
+    guardar(ruta, ContentFile(contenido))
+
+
+def generar_derivadas(nombre, storage=None, forzar=False):
+    """
+    Crea las derivadas de la imagen nombre en el storage. Devuelve cuántos
+    archivos escribió (0 si ya existían y no se pide forzar).
+    """
+    storage = storage or storage_imagenes()
+    if not forzar and tiene_derivadas(nombre, storage):
+        return 0
+    with storage.open(nombre, "rb") as archivo:
+        original = Image.open(archivo)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    escritos = 0
+    for tamano, ancho in TAMANOS.items():
+        reducida = original.copy()
+        # Solo limita el ancho; thumbnail() no agranda imágenes pequeñas
+        reducida.thumbnail((ancho, ancho * 4), Image.LANCZOS)
+        # La detalle JPEG va al final (ver tiene_derivadas)
+        for extension, formato in FORMATOS.items():
+            _guardar(storage, ruta_derivada(nombre, tamano, extension), _codificar(reducida, formato))
+            escritos += 1
+    return escritos
+
+
+def generar_derivadas_seguro(nombre, forzar=False):
+    """
+    generar_derivadas() que no propaga errores de Pillow o del storage:
+    devuelve (nombre, archivos escritos, mensaje de error o None). Es la
+    función que ejecutan los procesos del comando de backfill.
+    """
+    try:
+        return nombre, generar_derivadas(nombre, forzar=forzar), None
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("No se pudieron generar las derivadas de %s: %s", nombre, e)
+        return nombre, 0, str(e)
+
+
+def archivos_referenciados():
+    """Nombres en uso: imágenes de productos y sus derivadas."""
+    en_uso = set()
+    nombres = Producto.objects.exclude(imagen="").exclude(imagen__isnull=True).values_list("imagen", flat=True)
+    for nombre in nombres:
+        en_uso.add(nombre)
+        en_uso.update(rutas_derivadas(nombre))
+    return en_uso
+
+
+def consolidar_nombres(storage=None):
+    """
+    Pasa a nombre por contenido las imágenes subidas antes de
+    AlmacenamientoPorContenido, así las copias idénticas (dubai.webp,
+    dubai_4r8NIOI.webp, ...) quedan en un solo archivo y las otras sin uso.
+    Devuelve cuántos productos cambiaron de archivo.
+    """
+    storage = storage or storage_imagenes()
+    if not hasattr(storage, "nombre_por_contenido"):
+        return 0
+    cambiados = 0
+    productos = Producto.objects.exclude(imagen="").exclude(imagen__isnull=True).only("id", "imagen", "imagen_derivadas")
+    for producto in productos.iterator(chunk_size=500):
+        actual = producto.imagen.name
+        if not storage.exists(actual):
+            continue
+        with storage.open(actual, "rb") as archivo:
+            nuevo = storage.nombre_por_contenido(actual, archivo)
+            if nuevo == actual:
+                continue
+            if not storage.exists(nuevo):
+                storage.guardar_con_nombre(nuevo, archivo)
+        _, _, error = generar_derivadas_seguro(nuevo)
+        producto.imagen.name = nuevo
+        producto.imagen_derivadas = error is None
+        # save() y no update(): las señales invalidan la caché del catálogo
+        producto.save(update_fields=["imagen", "imagen_derivadas"])
+        cambiados += 1
+    return cambiados
+
+
+def archivos_sin_uso(antiguedad=timedelta(hours=1), storage=None):
+    """
+    Archivos del directorio de imágenes de productos que ningún producto
+    usa. Se ignoran los modificados hace menos de antiguedad: una subida
+    recién escrita puede no tener aún su producto confirmado en la BD.
+    """
+    storage = storage or storage_imagenes()
+    directorio = directorio_imagenes()
+    if not storage.exists(directorio):
+        return []
+    en_uso = archivos_referenciados()
+    limite = timezone.now() - antiguedad
+    _, archivos = storage.listdir(directorio)
+    sin_uso = []
+    for archivo in sorted(archivos):
+        nombre = posixpath.join(directorio, archivo)
+        if nombre not in en_uso and storage.get_modified_time(nombre) < limite:
+            sin_uso.append(nombre)
+    return sin_uso
+
+
+def eliminar_archivos(nombres, storage=None):
+    """
+    Borra los archivos que siguen sin uso (se vuelve a consultar la BD
+    justo antes) y devuelve (cantidad, bytes liberados).
+    """
+    storage = storage or storage_imagenes()
+    en_uso = archivos_referenciados()
+    borrados = liberados = 0
+    for nombre in nombres:
+        if nombre in en_uso or not storage.exists(nombre):
+            continue
+        tamano = storage.size(nombre)
+        storage.delete(nombre)
+        borrados += 1
+        liberados += tamano
+    return borrados, liberados
@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from catalogo import versiones
+from catalogo.imagenes import generar_derivadas_seguro
+from catalogo.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las derivadas WebP/JPEG (miniatura, tarjeta, detalle) de las "
+        "imágenes de productos que aún no las tienen, en varios procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--procesos", type=int, default=os.cpu_count() or 1,
+            help="Procesos en paralelo (por defecto, uno por CPU).",
+        )
+        parser.add_argument(
+            "--forzar", action="store_true",
+            help="Regenera también las derivadas que ya existen.",
+        )
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.exclude(imagen="").exclude(imagen__isnull=True)
+        if not options["forzar"]:
+            productos = productos.filter(imagen_derivadas=False)
+        nombres = sorted(set(productos.values_list("imagen", flat=True)))
+        if not nombres:
+            self.stdout.write("No hay imágenes de productos.")
+            return
+
+        # Los procesos hijos no usan la BD: no deben heredar la conexión abierta
+        connections.close_all()
+        generadas = omitidas = 0
+        errores = []
+        listas = []
+        procesos = max(1, options["procesos"])
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            resultados = pool.map(
+                generar_derivadas_seguro, nombres, [options["forzar"]] * len(nombres)
+            )
+            for nombre, escritos, error in resultados:
+                if error:
+                    errores.append((nombre, error))
+                    continue
+                listas.append(nombre)
+                if escritos:
+                    generadas += 1
+                else:
+                    omitidas += 1
+
+        self._marcar(listas)
+        for nombre, error in errores:
+            self.stderr.write(f"  {nombre}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Derivadas generadas para {generadas} imágenes "
+            f"({omitidas} ya las tenían, {len(errores)} con error)."
+        ))
+
+    def _marcar(self, nombres):
+        # Marca los productos en bloque y cambia a mano la versión de sus
+        # páginas, que update() no pasa por las señales
+        if not nombres:
+            return
+        productos = Producto.objects.filter(imagen__in=nombres)
+        ambitos = set()
+        for slug, categoria in productos.values_list("slug", "categoria__slug"):
+            ambitos.add(versiones.producto(slug))
+            ambitos.add(versiones.categoria(categoria))
+        productos.update(imagen_derivadas=True)
+        versiones.marcar_cambio(*ambitos)
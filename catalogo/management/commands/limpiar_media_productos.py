@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from catalogo.imagenes import archivos_sin_uso, consolidar_nombres, eliminar_archivos
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra de media/ las imágenes de productos (y sus derivadas) que "
+        "ningún producto referencia, por lotes, e informa el espacio liberado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote", type=int, default=200,
+            help="Archivos por lote (por defecto 200).",
+        )
+        parser.add_argument(
+            "--horas", type=int, default=1,
+            help="No borra archivos modificados hace menos de estas horas (por defecto 1).",
+        )
+        parser.add_argument(
+            "--consolidar", action="store_true",
+            help="Antes de limpiar, pasa las imágenes antiguas a nombres por contenido "
+                 "para que las copias idénticas queden sin uso.",
+        )
+        parser.add_argument(
+            "--simular", action="store_true",
+            help="Solo informa qué se borraría.",
+        )
+
+    def handle(self, *args, **options):
+        if options["consolidar"] and not options["simular"]:
+            cambiados = consolidar_nombres()
+            self.stdout.write(f"  {cambiados} productos pasaron a nombre por contenido.")
+
+        candidatos = archivos_sin_uso(timedelta(hours=options["horas"]))
+        if options["simular"]:
+            for nombre in candidatos:
+                self.stdout.write(f"  {nombre}")
+            self.stdout.write(self.style.SUCCESS(f"{len(candidatos)} archivos sin uso (simulación)."))
+            return
+
+        lote = max(1, options["lote"])
+        borrados = liberados = 0
+        for inicio in range(0, len(candidatos), lote):
+            cantidad, tamano = eliminar_archivos(candidatos[inicio:inicio + lote])
+            borrados += cantidad
+            liberados += tamano
+            self.stdout.write(f"  {borrados} archivos borrados ({filesizeformat(liberados)})...")
+        self.stdout.write(self.style.SUCCESS(
+            f"Borrados {borrados} archivos sin uso; espacio liberado: "
+            f"{filesizeformat(liberados)} ({liberados} bytes)."
+        ))
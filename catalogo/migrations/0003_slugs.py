@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:19
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def generar_slugs(apps, schema_editor):
+    # Copia de models.slug_unico: los modelos históricos no tienen save()
+    db = schema_editor.connection.alias
+    for nombre_modelo, largo in (('Categoria', 60), ('Producto', 120)):
+        modelo = apps.get_model('catalogo', nombre_modelo)
+        usados = set()
+        pendientes = []
+        for obj in modelo.objects.using(db).order_by('id').only('id', 'nombre').iterator(chunk_size=2000):
+            base = slugify(obj.nombre)[:largo].strip('-') or 'item'
+            slug, n = base, 1
+            while slug in usados:
+                n += 1
+                sufijo = f'-{n}'
+                slug = f'{base[:largo - len(sufijo)]}{sufijo}'
+            usados.add(slug)
+            obj.slug = slug
+            pendientes.append(obj)
+        modelo.objects.using(db).bulk_update(pendientes, ['slug'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0002_producto_producto_nombre_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=60, null=True),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=120, null=True),
+        ),
+        migrations.RunPython(generar_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='categoria',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=60, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='producto',
+            name='slug',
+            field=models.SlugField(editable=False, max_length=120, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0003_slugs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='imagen_derivadas',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
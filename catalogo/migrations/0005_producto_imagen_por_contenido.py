@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:22
+
+import catalogo.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0004_producto_imagen_derivadas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producto',
+            name='imagen',
+            field=models.ImageField(blank=True, null=True, storage=catalogo.almacenamiento.AlmacenamientoPorContenido(), upload_to='productos/', verbose_name='Imagen del Producto'),
+        ),
+    ]
@@ -1,7 +1,29 @@
 from django.db import models
+from django.utils.text import slugify
+
+from .almacenamiento import AlmacenamientoPorContenido
+
+
+def slug_unico(modelo, texto, largo, pk=None):
+    """Slug de texto que no usa ningún otro registro de modelo (sufijo -2, -3...)."""
+    base = slugify(texto)[:largo].strip("-") or "item"
+    slug, n = base, 1
+    while modelo._default_manager.filter(slug=slug).exclude(pk=pk).exists():
+        n += 1
+        sufijo = f"-{n}"
+        slug = f"{base[:largo - len(sufijo)]}{sufijo}"
+    return slug
+
 
 class Categoria(models.Model):
     nombre = models.CharField(max_length=50, verbose_name='Nombre de Categoría', unique=True)
+    # Se genera al crear y no cambia al renombrar, para no romper las URLs públicas
+    slug = models.SlugField(max_length=60, unique=True, editable=False)
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slug_unico(Categoria, self.nombre, 60, self.pk)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.nombre
@@ -17,6 +39,7 @@ class Producto(models.Model):
     sku = models.CharField(max_length=30, unique=True, verbose_name='SKU')
     ean_upc = models.CharField(max_length=30, blank=True, null=True, unique=True, verbose_name='Código EAN/UPC')
     nombre = models.CharField(max_length=100, verbose_name='Nombre del Producto')
+    slug = models.SlugField(max_length=120, unique=True, editable=False)
     descripcion = models.TextField(blank=True, null=True, verbose_name='Descripción')
     categoria = models.ForeignKey(Categoria, on_delete=models.PROTECT, related_name='productos')
     marca = models.CharField(max_length=50, blank=True, null=True)
@@ -37,9 +60,19 @@ class Producto(models.Model):
     control_por_lote = models.BooleanField(default=False)
     control_por_serie = models.BooleanField(default=False)
 
-    imagen = models.ImageField(upload_to='productos/', blank=True, null=True, verbose_name='Imagen del Producto')
+    imagen = models.ImageField(
+        upload_to='productos/', storage=AlmacenamientoPorContenido(), blank=True, null=True,
+        verbose_name='Imagen del Producto',
+    )
+    # Se marca al generar las derivadas WebP/JPEG de imagen (catalogo.imagenes)
+    imagen_derivadas = models.BooleanField(default=False, editable=False)
     ficha_tecnica_url = models.CharField(max_length=200, blank=True, null=True)
 
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slug_unico(Producto, self.nombre, 120, self.pk)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.nombre} ({self.sku})"
 
@@ -48,3 +81,7 @@ class Producto(models.Model):
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
         ordering = ['nombre']
+        indexes = [
+            # Búsqueda por prefijo del autocompletar (SKU y EAN ya son únicos)
+            models.Index(fields=['nombre'], name='producto_nombre_idx'),
+        ]
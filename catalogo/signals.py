@@ -0,0 +1,50 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import versiones
+from .models import Categoria, Producto
+
+
+@receiver(pre_save, sender=Producto)
+def _producto_anterior(sender, instance, raw=False, **kwargs):
+    # Categoría antes de guardar: un cambio invalida también la página
+    # donde el producto estaba
+    instance._anterior_catalogo = None
+    if instance.pk and not raw:
+        instance._anterior_catalogo = (
+            Producto.objects.filter(pk=instance.pk).values_list("categoria__slug", flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Producto)
+def _producto_cambio(sender, instance, **kwargs):
+    ambitos = {
+        versiones.producto(instance.slug),
+        versiones.categoria(instance.categoria.slug),
+    }
+    anterior = getattr(instance, "_anterior_catalogo", None)
+    if anterior:
+        ambitos.add(versiones.categoria(anterior))
+    versiones.marcar_cambio(*ambitos)
+
+
+@receiver(pre_save, sender=Categoria)
+def _categoria_anterior(sender, instance, raw=False, **kwargs):
+    instance._anterior_catalogo = None
+    if instance.pk and not raw:
+        instance._anterior_catalogo = (
+            Categoria.objects.filter(pk=instance.pk).values_list("nombre", flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Categoria)
+def _categoria_cambio(sender, instance, **kwargs):
+    ambitos = {versiones.CATEGORIAS, versiones.categoria(instance.slug)}
+    anterior = getattr(instance, "_anterior_catalogo", None)
+    if anterior and anterior != instance.nombre:
+        # El detalle de cada producto muestra el nombre de su categoría
+        ambitos.update(
+            versiones.producto(slug)
+            for slug in instance.productos.values_list("slug", flat=True)
+        )
+    versiones.marcar_cambio(*ambitos)
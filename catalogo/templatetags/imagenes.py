@@ -0,0 +1,58 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from catalogo.imagenes import TAMANOS, ruta_derivada
+
+
+register = template.Library()
+
+# Ancho con que se muestra cada tamaño, para el atributo sizes del <img>
+SIZES = {
+    "miniatura": "70px",
+    "tarjeta": "(min-width: 768px) 25vw, 100vw",
+    "detalle": "(min-width: 768px) 33vw, 100vw",
+}
+IMAGEN_DEFECTO = "images/default.jpg"
+
+
+def _srcset(storage, nombre, extension):
+    return ", ".join(
+        f"{storage.url(ruta_derivada(nombre, tamano, extension))} {ancho}w"
+        for tamano, ancho in TAMANOS.items()
+    )
+
+
+@register.simple_tag
+def imagen_producto(producto, tamano="tarjeta", clase="", alt=None):
+    """
+    <picture> de la imagen del producto con srcset WebP y JPEG y carga
+    diferida. Sin derivadas (producto.imagen_derivadas) usa el original y
+    sin imagen, la por defecto.
+
+        {% load imagenes %}
+        {% imagen_producto producto "tarjeta" clase="card-img-top" %}
+    """
+    alt = producto.nombre if alt is None else alt
+    imagen = producto.imagen
+    if not imagen:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" loading="lazy" decoding="async">',
+            static(IMAGEN_DEFECTO), clase, alt,
+        )
+    # La marca la deja quien genera las derivadas: sin consultar el storage
+    if not producto.imagen_derivadas:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" loading="lazy" decoding="async">',
+            imagen.url, clase, alt,
+        )
+    storage = imagen.storage
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(storage, imagen.name, "webp"), SIZES[tamano],
+        storage.url(ruta_derivada(imagen.name, tamano, "jpg")),
+        _srcset(storage, imagen.name, "jpg"), SIZES[tamano],
+        clase, alt,
+    )
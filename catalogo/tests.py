@@ -1,3 +1,336 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+
+from catalogo import versiones
+from catalogo.forms import ProductoForm
+from catalogo.imagenes import (
+    TAMANOS, archivos_sin_uso, consolidar_nombres, eliminar_archivos, ruta_derivada, rutas_derivadas,
+    storage_imagenes,
+)
+from catalogo.models import Categoria, Producto
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CatalogoPublicoTestCase(TestCase):
+    """Una categoría con un producto; la caché en memoria para contar solo consultas a la BD."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = Categoria.objects.create(nombre="Chocolates")
+        cls.producto = Producto.objects.create(sku="CH-001", nombre="Bombones", categoria=cls.categoria)
+
+    def setUp(self):
+        cache.clear()
+
+
+class CacheHttpTests(CatalogoPublicoTestCase):
+    def test_pagina_publica_lleva_etag_y_cache_publica(self):
+        respuesta = self.client.get(reverse("catalogo"))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.has_header("ETag"))
+        self.assertTrue(respuesta.has_header("Last-Modified"))
+        self.assertIn("public", respuesta["Cache-Control"])
+        self.assertIn("max-age=60", respuesta["Cache-Control"])
+
+    def test_get_condicional_sin_cambios_responde_304_sin_consultas(self):
+        etag = self.client.get(reverse("catalogo"))["ETag"]
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(reverse("catalogo"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_un_cambio_del_catalogo_cambia_el_etag(self):
+        etag = self.client.get(reverse("catalogo"))["ETag"]
+        Categoria.objects.create(nombre="Caramelos")
+        respuesta = self.client.get(reverse("catalogo"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta["ETag"], etag)
+
+    def test_el_etag_depende_de_los_argumentos_de_la_url(self):
+        otra = Categoria.objects.create(nombre="Caramelos")
+        uno = self.client.get(reverse("subcatalogo", args=[self.categoria.slug]))["ETag"]
+        dos = self.client.get(reverse("subcatalogo", args=[otra.slug]))["ETag"]
+        self.assertNotEqual(uno, dos)
+
+    def test_paginas_privadas_quedan_sin_cache(self):
+        respuesta = self.client.get(reverse("mantenedores"))
+        self.assertIn("no-store", respuesta["Cache-Control"])
+
+
+class CachePaginasTests(CatalogoPublicoTestCase):
+    def etag(self, nombre, *args):
+        return self.client.get(reverse(nombre, args=args))["ETag"]
+
+    def test_editar_un_producto_invalida_solo_sus_paginas(self):
+        otra = Categoria.objects.create(nombre="Caramelos")
+        antes = {
+            "detalle": self.etag("detalle_producto", self.producto.slug),
+            "categoria": self.etag("subcatalogo", self.categoria.slug),
+            "otra": self.etag("subcatalogo", otra.slug),
+        }
+        self.producto.descripcion = "Caja de 12"
+        self.producto.save()
+        despues = {
+            "detalle": self.etag("detalle_producto", self.producto.slug),
+            "categoria": self.etag("subcatalogo", self.categoria.slug),
+            "otra": self.etag("subcatalogo", otra.slug),
+        }
+        self.assertNotEqual(antes["detalle"], despues["detalle"])
+        self.assertNotEqual(antes["categoria"], despues["categoria"])
+        self.assertEqual(antes["otra"], despues["otra"])
+
+    def test_renombrar_invalida_la_pagina_del_producto(self):
+        url = reverse("detalle_producto", args=[self.producto.slug])
+        etag = self.client.get(url)["ETag"]
+        self.producto.nombre = "Bombones surtidos"
+        self.producto.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, "Bombones surtidos")
+
+    def test_anonimo_recibe_la_pagina_guardada_sin_consultas(self):
+        url = reverse("subcatalogo", args=[self.categoria.slug])
+        primera = self.client.get(url)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(url)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.content, primera.content)
+
+    def test_un_nombre_inexistente_no_crea_versiones(self):
+        respuesta = self.client.get(reverse("detalle_producto", args=["no-existe"]))
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertIsNone(cache.get(versiones._clave(versiones.producto("no-existe"))))
+        # Mientras tanto la página usa la versión del catálogo completo
+        self.assertEqual(
+            versiones.versiones([versiones.producto("no-existe")])[versiones.producto("no-existe")],
+            versiones.version_catalogo(),
+        )
+
+
+class SlugTests(CatalogoPublicoTestCase):
+    def test_slug_unico_y_estable(self):
+        self.assertEqual(self.producto.slug, "bombones")
+        repetido = Producto.objects.create(sku="CH-002", nombre="Bombones", categoria=self.categoria)
+        self.assertEqual(repetido.slug, "bombones-2")
+
+        self.producto.nombre = "Bombones de Navidad"
+        self.producto.save()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.slug, "bombones")
+
+    def test_slug_largo_se_recorta_antes_del_sufijo(self):
+        nombre = "Caramelos " * 20
+        primero = Producto.objects.create(sku="CA-001", nombre=nombre, categoria=self.categoria)
+        segundo = Producto.objects.create(sku="CA-002", nombre=nombre, categoria=self.categoria)
+        self.assertLessEqual(len(primero.slug), 120)
+        self.assertEqual(len(segundo.slug), 120)
+        self.assertTrue(segundo.slug.endswith("-2"))
+        self.assertFalse(primero.slug.endswith("-"))
+
+    def test_las_urls_por_nombre_redirigen_permanentemente(self):
+        respuesta = self.client.get(reverse("subcatalogo_nombre", args=[self.categoria.nombre]))
+        self.assertRedirects(
+            respuesta, reverse("subcatalogo", args=[self.categoria.slug]), status_code=301
+        )
+        repetido = Producto.objects.create(sku="CH-002", nombre="Bombones", categoria=self.categoria)
+        respuesta = self.client.get(reverse("detalle_nombre", args=["Bombones"]))
+        self.assertRedirects(
+            respuesta, reverse("detalle_producto", args=[self.producto.slug]), status_code=301
+        )
+        self.assertNotEqual(repetido.slug, self.producto.slug)
+        self.assertEqual(self.client.get(reverse("detalle_nombre", args=["Turrón"])).status_code, 404)
+
+
+def imagen_png(ancho, alto, nombre="foto.png"):
+    salida = BytesIO()
+    Image.new("RGBA", (ancho, alto), (200, 80, 40, 128)).save(salida, "PNG")
+    return SimpleUploadedFile(nombre, salida.getvalue(), content_type="image/png")
+
+
+class ImagenesTestCase(CatalogoPublicoTestCase):
+    """Además, MEDIA_ROOT en un directorio temporal."""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def guardar_imagen(self, imagen):
+        datos = {
+            "sku": self.producto.sku, "nombre": self.producto.nombre,
+            "descripcion": "Caja de bombones surtidos", "uom_compra": "UN", "uom_venta": "UN",
+            "factor_conversion": "1", "impuesto_iva": "19", "stock_minimo": "0",
+            "categoria": self.categoria.pk,
+        }
+        form = ProductoForm(datos, {"imagen": imagen}, instance=self.producto)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def renderizar(self, producto, tamano="tarjeta"):
+        plantilla = Template('{% load imagenes %}{% imagen_producto producto tamano %}')
+        return plantilla.render(Context({"producto": producto, "tamano": tamano}))
+
+
+class ImagenesTests(ImagenesTestCase):
+    def test_guardar_una_imagen_genera_las_derivadas_y_las_marca(self):
+        producto = self.guardar_imagen(imagen_png(2000, 1000))
+        self.assertTrue(Producto.objects.get(pk=producto.pk).imagen_derivadas)
+        for tamano, ancho in TAMANOS.items():
+            for extension, formato in (("webp", "WEBP"), ("jpg", "JPEG")):
+                with default_storage.open(ruta_derivada(producto.imagen.name, tamano, extension)) as archivo:
+                    derivada = Image.open(archivo)
+                    self.assertEqual(derivada.format, formato)
+                    self.assertEqual(derivada.size, (ancho, ancho // 2))
+
+    def test_no_agranda_imagenes_pequenas(self):
+        producto = self.guardar_imagen(imagen_png(100, 50))
+        with default_storage.open(ruta_derivada(producto.imagen.name, "detalle", "jpg")) as archivo:
+            self.assertEqual(Image.open(archivo).size, (100, 50))
+
+    def test_si_falla_pillow_el_producto_se_guarda_sin_marca(self):
+        with mock.patch("catalogo.imagenes.generar_derivadas", side_effect=OSError("archivo dañado")), \
+                self.assertLogs("catalogo.imagenes", "WARNING"):
+            producto = self.guardar_imagen(imagen_png(300, 300))
+        producto.refresh_from_db()
+        self.assertTrue(producto.imagen)
+        self.assertFalse(producto.imagen_derivadas)
+        self.assertNotIn("<picture>", self.renderizar(producto))
+
+    def test_cambiar_la_imagen_quita_la_marca_hasta_regenerar(self):
+        self.guardar_imagen(imagen_png(300, 300))
+        with mock.patch("catalogo.imagenes.generar_derivadas", side_effect=OSError("archivo dañado")), \
+                self.assertLogs("catalogo.imagenes", "WARNING"):
+            producto = self.guardar_imagen(imagen_png(400, 400, "otra.png"))
+        producto.refresh_from_db()
+        self.assertFalse(producto.imagen_derivadas)
+
+    def test_el_tag_usa_la_marca_sin_consultar_el_storage(self):
+        producto = self.guardar_imagen(imagen_png(600, 300))
+        producto = Producto.objects.only("id", "nombre", "slug", "imagen", "imagen_derivadas").get(pk=producto.pk)
+        with mock.patch.object(FileSystemStorage, "exists") as exists, self.assertNumQueries(0):
+            html = self.renderizar(producto)
+        exists.assert_not_called()
+        self.assertIn('<picture><source type="image/webp"', html)
+        self.assertIn(" 160w, ", html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn(ruta_derivada(producto.imagen.name, "tarjeta", "jpg"), html)
+
+    def test_sin_marca_usa_el_original_y_sin_imagen_la_por_defecto(self):
+        self.producto.imagen = "productos/antigua.png"
+        html = self.renderizar(self.producto)
+        self.assertNotIn("<picture>", html)
+        self.assertIn('src="/media/productos/antigua.png"', html)
+
+        self.producto.imagen = None
+        self.assertIn("images/default.jpg", self.renderizar(self.producto))
+
+    def test_el_comando_genera_y_marca_las_imagenes_existentes(self):
+        nombre = default_storage.save("productos/antigua.png", imagen_png(800, 400))
+        Producto.objects.filter(pk=self.producto.pk).update(imagen=nombre)
+        etag = self.client.get(reverse("detalle_producto", args=[self.producto.slug]))["ETag"]
+
+        call_command("generar_derivadas_imagenes", procesos=1, stdout=StringIO())
+        self.producto.refresh_from_db()
+        self.assertTrue(self.producto.imagen_derivadas)
+        self.assertTrue(default_storage.exists(ruta_derivada(nombre, "detalle", "jpg")))
+        respuesta = self.client.get(reverse("detalle_producto", args=[self.producto.slug]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, "<picture>")
+
+
+class MediaProductosTests(ImagenesTestCase):
+    def envejecer(self, *nombres, horas=2):
+        antes = time.time() - horas * 3600
+        for nombre in nombres:
+            os.utime(storage_imagenes().path(nombre), (antes, antes))
+
+    def test_la_misma_imagen_se_guarda_una_sola_vez(self):
+        contenido = imagen_png(300, 200).read()
+        primero = self.guardar_imagen(SimpleUploadedFile("dubai.png", contenido)).imagen.name
+        otro = Producto.objects.create(sku="CH-002", nombre="Trufas", categoria=self.categoria)
+        otro.imagen = SimpleUploadedFile("dubai (copia).png", contenido)
+        otro.save()
+
+        self.assertEqual(otro.imagen.name, primero)
+        self.assertRegex(primero, r"^productos/[0-9a-f]{64}\.png$")
+        _, archivos = storage_imagenes().listdir("productos")
+        self.assertEqual(len(archivos), 1 + len(rutas_derivadas(primero)))
+
+    def test_volver_a_subir_la_misma_imagen_no_regenera_las_derivadas(self):
+        contenido = imagen_png(300, 200).read()
+        self.guardar_imagen(SimpleUploadedFile("dubai.png", contenido))
+        with mock.patch("catalogo.imagenes._codificar") as codificar:
+            producto = self.guardar_imagen(SimpleUploadedFile("dubai.png", contenido))
+        codificar.assert_not_called()
+        producto.refresh_from_db()
+        self.assertTrue(producto.imagen_derivadas)
+
+    def test_archivos_sin_uso_incluye_derivadas_y_respeta_la_antiguedad(self):
+        en_uso = self.guardar_imagen(imagen_png(300, 200)).imagen.name
+        huerfana = storage_imagenes().save("productos/vieja.png", imagen_png(100, 100))
+        storage_imagenes().guardar_con_nombre(ruta_derivada(huerfana, "tarjeta", "jpg"), imagen_png(10, 10))
+        reciente = storage_imagenes().save("productos/subiendo.png", imagen_png(50, 50))
+        self.envejecer(en_uso, huerfana, ruta_derivada(huerfana, "tarjeta", "jpg"), *rutas_derivadas(en_uso))
+
+        sin_uso = archivos_sin_uso()
+        self.assertEqual(sorted(sin_uso), sorted([huerfana, ruta_derivada(huerfana, "tarjeta", "jpg")]))
+        self.assertNotIn(reciente, sin_uso)
+        self.assertIn(reciente, archivos_sin_uso(timedelta(0)))
+
+    def test_eliminar_vuelve_a_revisar_las_referencias(self):
+        huerfana = storage_imagenes().save("productos/vieja.png", imagen_png(100, 100))
+        tomada = storage_imagenes().save("productos/otra.png", imagen_png(120, 100))
+        tamano = storage_imagenes().size(huerfana)
+        # Un producto toma la imagen entre el listado y el borrado
+        Producto.objects.filter(pk=self.producto.pk).update(imagen=tomada)
+
+        self.assertEqual(eliminar_archivos([huerfana, tomada]), (1, tamano))
+        self.assertFalse(storage_imagenes().exists(huerfana))
+        self.assertTrue(storage_imagenes().exists(tomada))
+
+    def test_el_comando_simula_y_luego_borra(self):
+        huerfana = storage_imagenes().save("productos/vieja.png", imagen_png(100, 100))
+        self.envejecer(huerfana)
+
+        salida = StringIO()
+        call_command("limpiar_media_productos", simular=True, stdout=salida)
+        self.assertIn(huerfana, salida.getvalue())
+        self.assertTrue(storage_imagenes().exists(huerfana))
+
+        salida = StringIO()
+        call_command("limpiar_media_productos", stdout=salida)
+        self.assertIn("Borrados 1 archivos", salida.getvalue())
+        self.assertFalse(storage_imagenes().exists(huerfana))
+
+    def test_consolidar_une_las_copias_de_nombres_antiguos(self):
+        contenido = imagen_png(300, 200).read()
+        storage = storage_imagenes()
+        uno = storage.guardar_con_nombre("productos/dubai.png", SimpleUploadedFile("a", contenido))
+        dos = storage.guardar_con_nombre("productos/dubai_4r8NIOI.png", SimpleUploadedFile("b", contenido))
+        otro = Producto.objects.create(sku="CH-002", nombre="Trufas", categoria=self.categoria)
+        Producto.objects.filter(pk=self.producto.pk).update(imagen=uno)
+        Producto.objects.filter(pk=otro.pk).update(imagen=dos)
+
+        self.assertEqual(consolidar_nombres(), 2)
+        nombres = set(Producto.objects.values_list("imagen", flat=True))
+        self.assertEqual(len(nombres), 1)
+        self.assertTrue(all(Producto.objects.values_list("imagen_derivadas", flat=True)))
+        self.envejecer(uno, dos)
+        self.assertEqual(sorted(archivos_sin_uso()), sorted([uno, dos]))
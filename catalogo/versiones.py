@@ -0,0 +1,164 @@
+"""
+Versiones del catálogo público para la caché HTTP y la caché de páginas.
+
+Cada página pública depende de uno o más "ámbitos": el catálogo completo,
+la lista de categorías, una categoría o un producto (por el slug que va
+en la URL). Las señales de catalogo.signals cambian solo la versión de los
+ámbitos que toca cada alta, edición o baja, así que editar un producto
+invalida su detalle y la página de su categoría pero no las demás.
+
+Las vistas marcadas con @pagina_publica:
+- arman su ETag con las versiones de sus ámbitos y los argumentos de la
+  URL, y usan la fecha del último cambio como Last-Modified; un GET
+  condicional sin cambios se responde 304 sin renderizar la plantilla;
+- para visitantes anónimos guardan la página completa en la caché, bajo
+  una clave que incluye el ETag (una versión nueva deja la copia anterior
+  sin uso hasta que vence por PAGINA_DURACION).
+Además las tarjetas de producto se cachean como fragmento (ver
+version_tarjetas), de modo que al rehacer la página de una categoría solo
+se renderizan las tarjetas que cambiaron.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+PREFIJO_VERSION = "catalogo:version"
+PREFIJO_PAGINA = "catalogo:pagina"
+
+# Ámbito que cambia con cualquier cambio del catálogo
+CATALOGO = ("catalogo", "")
+CATEGORIAS = ("categorias", "")
+# Ámbitos que existen siempre (los demás dependen de un nombre de la URL)
+FIJOS = {CATALOGO, CATEGORIAS}
+
+# Segundos que el navegador / proxy puede usar la página sin revalidar
+MAX_AGE = getattr(settings, "CATALOGO_HTTP_MAX_AGE", 60)
+# Segundos que una página o tarjeta renderizada se guarda en la caché
+PAGINA_DURACION = getattr(settings, "CATALOGO_PAGINA_DURACION", 60 * 60)
+
+
+def categoria(slug):
+    return ("categoria", slug)
+
+
+def producto(slug):
+    return ("producto", slug)
+
+
+def _clave(ambito):
+    tipo, valor = ambito
+    return f"{PREFIJO_VERSION}:{tipo}:{valor}"
+
+
+def _nueva_version():
+    return (format(time.time_ns(), "x"), timezone.now().replace(microsecond=0))
+
+
+def versiones(ambitos):
+    """
+    {ámbito: (version, modificado)} con una sola lectura de la caché. Al
+    leerlos solo se crean los ámbitos fijos (catálogo y lista de
+    categorías): la versión de una categoría o un producto la crean las
+    señales cuando cambia un registro real, y mientras no exista se usa la
+    del catálogo completo, que cambia con cualquier cambio. Así un nombre
+    inventado en la URL no deja claves permanentes en la caché.
+    """
+    ambitos = list(ambitos)
+    claves = {_clave(a): a for a in {*ambitos, CATALOGO}}
+    guardadas = cache.get_many(list(claves))
+    faltantes = {c: _nueva_version() for c, a in claves.items() if c not in guardadas and a in FIJOS}
+    if faltantes:
+        for clave, valor in faltantes.items():
+            cache.add(clave, valor, None)
+        # Otro request pudo crearlas primero
+        guardadas.update(cache.get_many(list(faltantes)))
+        for clave, valor in faltantes.items():
+            guardadas.setdefault(clave, valor)
+    catalogo = guardadas[_clave(CATALOGO)]
+    return {a: guardadas.get(_clave(a), catalogo) for a in ambitos}
+
+
+def version_catalogo():
+    """(version, modificado) del catálogo completo."""
+    return versiones([CATALOGO])[CATALOGO]
+
+
+def marcar_cambio(*ambitos):
+    """Nueva versión para los ámbitos dados y para el catálogo completo."""
+    nueva = _nueva_version()
+    cache.set_many({_clave(a): nueva for a in {CATALOGO, *ambitos}}, None)
+
+
+def version_tarjetas(productos):
+    """
+    Anota en cada producto su versión (producto.version_cache) para la
+    clave del fragmento {% cache %} de su tarjeta.
+    """
+    productos = list(productos)
+    actuales = versiones([producto(p.slug) for p in productos])
+    for p in productos:
+        p.version_cache = actuales[producto(p.slug)][0]
+    return productos
+
+
+def pagina_publica(vista=None, *, ambitos=None):
+    """
+    Vista pública del catálogo. ambitos(request, *args, **kwargs) devuelve
+    los ámbitos de los que depende la página (por omisión, el catálogo
+    completo). Responde 304 a un GET condicional si esos ámbitos no
+    cambiaron, sirve a los anónimos la página guardada y deja la respuesta
+    en caché pública por MAX_AGE segundos (el resto de las vistas queda con
+    no-store, ver accounts_lilis.middleware.PoliticaCacheMiddleware).
+    """
+    if vista is None:
+        return lambda v: pagina_publica(v, ambitos=ambitos)
+
+    def _versiones(request, args, kwargs):
+        # ETag, Last-Modified y la caché de página usan los mismos datos:
+        # una sola lectura de la caché por request
+        if not hasattr(request, "_versiones_catalogo"):
+            lista = ambitos(request, *args, **kwargs) if ambitos else [CATALOGO]
+            request._versiones_catalogo = versiones(lista)
+        return request._versiones_catalogo
+
+    def _etag(request, *args, **kwargs):
+        actuales = _versiones(request, args, kwargs)
+        marcas = ":".join(v[0] for _, v in sorted(actuales.items()))
+        clave = f"{vista.__name__}:{marcas}:{args}:{sorted(kwargs.items())}"
+        return hashlib.md5(clave.encode()).hexdigest()
+
+    def _modificado(request, *args, **kwargs):
+        return max(v[1] for v in _versiones(request, args, kwargs).values())
+
+    def _cacheada(request, *args, **kwargs):
+        anonimo = not request.user.is_authenticated
+        if not anonimo or request.method not in ("GET", "HEAD"):
+            return vista(request, *args, **kwargs)
+        ruta = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        clave = f"{PREFIJO_PAGINA}:{_etag(request, *args, **kwargs)}:{ruta}"
+        guardada = cache.get(clave)
+        if guardada is not None:
+            contenido, tipo = guardada
+            return HttpResponse(contenido, content_type=tipo)
+        respuesta = vista(request, *args, **kwargs)
+        if respuesta.status_code == 200 and not getattr(respuesta, "streaming", False):
+            cache.set(clave, (respuesta.content, respuesta["Content-Type"]), PAGINA_DURACION)
+        return respuesta
+
+    condicional = condition(etag_func=_etag, last_modified_func=_modificado)(_cacheada)
+
+    @wraps(vista)
+    def _envoltura(request, *args, **kwargs):
+        respuesta = condicional(request, *args, **kwargs)
+        if respuesta.status_code in (200, 304):
+            patch_cache_control(respuesta, public=True, max_age=MAX_AGE)
+        return respuesta
+    return _envoltura
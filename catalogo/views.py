@@ -1,42 +1,63 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from catalogo.models import Categoria, Producto
 from catalogo.forms import ProductoForm
-from django.http import HttpResponse
+from catalogo.consultas import COLUMNAS_EXPORTACION, filtrar_productos
+from catalogo import versiones
+from catalogo.versiones import pagina_publica, version_tarjetas
+from django.http import Http404, HttpResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from proveedores.models import Proveedor
-from accounts_lilis.models import Usuario
-from inventario.models import MovimientoInventario
-from django.utils import timezone 
 from accounts_lilis.permisos import role_required
+from proyecto_lilis.exportar import formato_solicitado, respuesta_exportacion
+from proyecto_lilis.replica import lectura_replica
+from inventario.auditoria import registrar
+from inventario.contadores import contadores
+from inventario.exportaciones import en_segundo_plano, encolar_desde_request
 
 
+@pagina_publica
 def landing(request):
     return render(request, 'catalogo/landing.html')
 
+@pagina_publica(ambitos=lambda request: [versiones.CATEGORIAS])
 def catalogo(request):
     categorias = Categoria.objects.all()
     return render(request, 'catalogo/catalogo.html', {
         "categorias": categorias
     })
 
-def subcatalogo(request, categoria):
-    categoria_obj = get_object_or_404(Categoria, nombre=categoria)
-    productos = Producto.objects.filter(categoria=categoria_obj)
+@pagina_publica(ambitos=lambda request, slug: [versiones.categoria(slug)])
+def subcatalogo(request, slug):
+    categoria_obj = get_object_or_404(Categoria, slug=slug)
+    productos = Producto.objects.filter(categoria=categoria_obj).only("id", "nombre", "slug", "imagen", "imagen_derivadas")
     return render(request, "catalogo/subcatalogo.html", {
         "categoria": categoria_obj,
-        "productos": productos
+        "productos": version_tarjetas(productos),
+        "duracion_tarjeta": versiones.PAGINA_DURACION,
     })
 
-def detalle_producto(request, producto):
-    producto_obj = get_object_or_404(Producto, nombre=producto)
-    categoria = producto_obj.categoria
+@pagina_publica(ambitos=lambda request, slug: [versiones.producto(slug)])
+def detalle_producto(request, slug):
+    producto_obj = get_object_or_404(Producto.objects.select_related("categoria"), slug=slug)
     return render(request, "catalogo/detalle.html", {
         "producto": producto_obj.nombre,
         "detalle": producto_obj,
-        "categoria": categoria.nombre
+        "categoria": producto_obj.categoria,
     })
 
+def subcatalogo_por_nombre(request, categoria):
+    # URL antigua con el nombre de la categoría
+    categoria_obj = get_object_or_404(Categoria.objects.only("slug"), nombre=categoria)
+    return redirect("subcatalogo", slug=categoria_obj.slug, permanent=True)
+
+def detalle_por_nombre(request, producto):
+    # URL antigua con el nombre del producto; con nombres repetidos va al más antiguo
+    producto_obj = Producto.objects.filter(nombre=producto).order_by("id").only("slug").first()
+    if producto_obj is None:
+        raise Http404("Producto no encontrado")
+    return redirect("detalle_producto", slug=producto_obj.slug, permanent=True)
+
+@pagina_publica
 def empresa(request):
     data = {
         "historia": "Dulcería Lilis nació en 1995...",
@@ -58,6 +79,7 @@ def tiene_permiso_productos(user):
     ]
 
 @login_required
+@lectura_replica
 def mantenedores(request):
     user = request.user
 
@@ -80,16 +102,9 @@ def mantenedores(request):
     usuarios_ver = user.rol == "ADMIN"
     inventario_ver = user.rol in ["ADMIN", "OPER_INVENTARIO", "AUDITOR"]
 
-    total_productos = Producto.objects.count()
-    total_proveedores = Proveedor.objects.count()
-    total_usuarios = Usuario.objects.count()
-    total_movimientos = MovimientoInventario.objects.count()
-
+    # Totales desde la caché de contadores (sin COUNT(*) por visita)
     return render(request, 'mantenedores/inicioMantenedores.html', {
-        "total_productos": total_productos,
-        "total_proveedores": total_proveedores,
-        "total_usuarios": total_usuarios,
-        "total_movimientos": total_movimientos,
+        **contadores(),
         "productos_ver": productos_ver,
         "proveedores_ver": proveedores_ver,
         "usuarios_ver": usuarios_ver,
@@ -99,7 +114,9 @@ def mantenedores(request):
 @user_passes_test(tiene_permiso_productos)
 @login_required
 def mostrar_todos_productos(request):
-    productos = Producto.objects.select_related("categoria").all()
+    productos = filtrar_productos(
+        request.GET.get("q", "").strip(), request.GET.get("categoria", "").strip()
+    )
     categorias = Categoria.objects.all()
     rol = request.user.rol
     return render(request, 'mantenedores/productos/todos_productos.html', {
@@ -110,6 +127,23 @@ def mostrar_todos_productos(request):
         'productos_eliminar': rol == "ADMIN",
     })
 
+@user_passes_test(tiene_permiso_productos)
+@login_required
+@lectura_replica
+def exportar_productos(request):
+    productos = filtrar_productos(
+        request.GET.get("q", "").strip(), request.GET.get("categoria", "").strip()
+    )
+    if en_segundo_plano(request, productos):
+        return encolar_desde_request(request, "productos")
+    return respuesta_exportacion(
+        productos,
+        COLUMNAS_EXPORTACION,
+        "productos",
+        formato=formato_solicitado(request),
+        titulo_hoja="Productos",
+    )
+
 @user_passes_test(tiene_permiso_productos)
 @login_required
 def MantenedorAgregarProducto(request):
@@ -132,10 +166,7 @@ def crear_producto(request):
         form = ProductoForm(request.POST, request.FILES)
         if form.is_valid():
             producto = form.save()
-            
-            # --- LOG AUDITORÍA ---
-            print(f"📦 [AUDITORIA] Fecha: {timezone.now()} | Usuario: {request.user.username} | Acción: CREAR_PRODUCTO | ID: {producto.id} | Nombre: {producto.nombre}")
-            # ---------------------
+            registrar("CREAR_PRODUCTO", request, entidad="producto", entidad_id=producto.id, nombre=producto.nombre)
 
             messages.success(request, "✅ Producto creado correctamente.")
             return redirect("mostrar_todos_productos")
@@ -158,10 +189,10 @@ def editar_producto(request, id):
         form = ProductoForm(request.POST, request.FILES, instance=producto)
         if form.is_valid():
             form.save()
-
-            # --- LOG AUDITORÍA ---
-            print(f"✏️ [AUDITORIA] Fecha: {timezone.now()} | Usuario: {request.user.username} | Acción: EDITAR_PRODUCTO | ID: {producto.id} | Nombre: {producto.nombre}")
-            # ---------------------
+            registrar(
+                "EDITAR_PRODUCTO", request, entidad="producto", entidad_id=producto.id,
+                nombre=producto.nombre, campos=form.changed_data,
+            )
 
             messages.success(request, "Producto actualizado.")
             return redirect("mostrar_todos_productos")
@@ -176,11 +207,7 @@ def editar_producto(request, id):
 def eliminar_producto(request, id):
     producto = get_object_or_404(Producto, id=id)
     if request.method == 'POST':
-        
-        # --- LOG AUDITORÍA ---
-        print(f"🗑️ [AUDITORIA] Fecha: {timezone.now()} | Usuario: {request.user.username} | Acción: ELIMINAR_PRODUCTO | ID: {producto.id} | Nombre: {producto.nombre}")
-        # ---------------------
-        
+        registrar("ELIMINAR_PRODUCTO", request, entidad="producto", entidad_id=producto.id, nombre=producto.nombre)
         producto.delete()
         return redirect('mostrar_todos_productos')
     return render(request, 'mantenedores/confirmar_eliminacion.html', {"producto": producto})
\ No newline at end of file
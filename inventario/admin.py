@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Bodega, MovimientoInventario
+from .models import (
+    Bodega, CapaCosto, CierreStock, DocumentoMovimiento, EventoAuditoria, MovimientoArchivado, MovimientoInventario,
+    NumeroSerie, ResumenDiario, StockBodega, StockLote, TrabajoExportacion, ValorizacionBodega,
+)
+from .stock import guardar_movimiento, eliminar_movimiento
 
 
 @admin.register(Bodega)
@@ -46,4 +50,149 @@ class MovimientoInventarioAdmin(admin.ModelAdmin):
     def save_model(self, request, obj, form, change):
         if not obj.usuario:
             obj.usuario = request.user
-        super().save_model(request, obj, form, change)
+        # El admin corrige datos: no se bloquea por stock, pero sí se bloquean
+        # las filas de stock_bodega para no pisar movimientos concurrentes.
+        guardar_movimiento(obj, validar_stock=False)
+
+    def delete_model(self, request, obj):
+        eliminar_movimiento(obj)
+
+    def delete_queryset(self, request, queryset):
+        for movimiento in queryset:
+            eliminar_movimiento(movimiento)
+
+
+@admin.register(DocumentoMovimiento)
+class DocumentoMovimientoAdmin(admin.ModelAdmin):
+    list_display = ("id", "fecha", "tipo", "doc_referencia", "proveedor", "bodega_origen", "bodega_destino", "usuario")
+    list_filter = ("tipo", "bodega_origen", "bodega_destino")
+    search_fields = ("doc_referencia", "proveedor__razon_social", "proveedor__rut_nif")
+    readonly_fields = (
+        "tipo", "fecha", "doc_referencia", "proveedor", "bodega_origen", "bodega_destino", "motivo",
+        "observaciones", "usuario", "creado_en",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(MovimientoArchivado)
+class MovimientoArchivadoAdmin(admin.ModelAdmin):
+    list_display = ("id", "fecha", "tipo", "producto", "bodega_origen", "bodega_destino", "cantidad", "usuario")
+    list_filter = ("tipo", "bodega_origen", "bodega_destino")
+    search_fields = ("producto__nombre", "producto__sku", "lote", "serie", "doc_referencia")
+    date_hierarchy = "fecha"
+    ordering = ("-fecha",)
+    list_select_related = ("producto", "bodega_origen", "bodega_destino", "usuario")
+
+    # Solo lectura: el archivo es historia cerrada
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockBodega)
+class StockBodegaAdmin(admin.ModelAdmin):
+    list_display = ("producto", "bodega", "cantidad", "actualizado_en")
+    list_filter = ("bodega",)
+    search_fields = ("producto__nombre", "producto__sku", "bodega__codigo")
+    readonly_fields = ("producto", "bodega", "cantidad", "actualizado_en")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StockLote)
+class StockLoteAdmin(admin.ModelAdmin):
+    list_display = ("producto", "bodega", "lote", "fecha_vencimiento", "cantidad")
+    list_filter = ("bodega",)
+    search_fields = ("producto__nombre", "producto__sku", "lote")
+    readonly_fields = ("producto", "bodega", "lote", "fecha_vencimiento", "cantidad", "actualizado_en")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(NumeroSerie)
+class NumeroSerieAdmin(admin.ModelAdmin):
+    list_display = ("serie", "producto", "estado", "bodega", "tipo_ultimo", "fecha_ultimo")
+    list_filter = ("estado", "bodega")
+    search_fields = ("serie", "producto__sku", "producto__nombre")
+    readonly_fields = ("producto", "serie", "bodega", "estado", "tipo_ultimo", "fecha_ultimo", "actualizado_en")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ValorizacionBodega)
+class ValorizacionBodegaAdmin(admin.ModelAdmin):
+    list_display = ("producto", "bodega", "cantidad", "costo_promedio", "valor_total")
+    list_filter = ("bodega",)
+    search_fields = ("producto__nombre", "producto__sku", "bodega__codigo")
+    readonly_fields = ("producto", "bodega", "cantidad", "costo_promedio", "valor_total", "actualizado_en")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(CapaCosto)
+class CapaCostoAdmin(admin.ModelAdmin):
+    list_display = ("producto", "bodega", "fecha", "costo_unitario", "cantidad_restante", "cantidad_inicial")
+    list_filter = ("bodega",)
+    search_fields = ("producto__nombre", "producto__sku")
+    readonly_fields = ("producto", "bodega", "fecha", "costo_unitario", "cantidad_inicial", "cantidad_restante")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(CierreStock)
+class CierreStockAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "producto", "bodega", "cantidad")
+    list_filter = ("fecha", "bodega")
+    search_fields = ("producto__nombre", "producto__sku", "bodega__codigo")
+    readonly_fields = ("fecha", "producto", "bodega", "cantidad", "creado_en")
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "producto", "bodega", "tipo", "cantidad_entrada", "cantidad_salida", "movimientos")
+    list_filter = ("tipo", "bodega")
+    search_fields = ("producto__nombre", "producto__sku")
+    date_hierarchy = "fecha"
+    readonly_fields = (
+        "fecha", "producto", "bodega", "tipo", "cantidad_entrada", "cantidad_salida", "movimientos",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(TrabajoExportacion)
+class TrabajoExportacionAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "formato", "estado", "filas_procesadas", "total_filas", "usuario", "creado_en")
+    list_filter = ("estado", "tipo", "formato")
+    search_fields = ("usuario__username",)
+    readonly_fields = ("huella", "iniciado_en", "terminado_en")
+
+
+@admin.register(EventoAuditoria)
+class EventoAuditoriaAdmin(admin.ModelAdmin):
+    list_display = ("fecha", "username", "accion", "entidad", "entidad_id", "ip")
+    list_filter = ("accion", "entidad")
+    search_fields = ("username", "entidad_id")
+    date_hierarchy = "fecha"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,69 @@
+"""
+Archivo de movimientos antiguos.
+
+Los movimientos hasta un día con cierre de stock se mueven por lotes a
+movimiento_inventario_archivo (mismo id y columnas). Los saldos no cambian:
+stock_bodega / stock_lote / valorización no se tocan, y las consultas por
+fecha parten del cierre. El listado, el Kardex, las exportaciones y las
+reconstrucciones leen el archivo solo cuando su rango llega a él (ver
+consultas.modelos_movimiento).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cierres import ultimo_cierre
+from .consultas import inicio_dia
+from .contadores import ajustar_movimientos
+from .models import CierreStock, MovimientoArchivado, MovimientoInventario
+
+
+# Se archivan los movimientos anteriores al último cierre con más de estos días
+ARCHIVO_DIAS = getattr(settings, "INVENTARIO_ARCHIVO_DIAS", 365)
+TAMANO_LOTE = 5000
+
+CAMPOS = [campo.attname for campo in MovimientoInventario._meta.concrete_fields]
+
+
+class ArchivoInvalido(Exception):
+    pass
+
+
+def cierre_archivable(dias=ARCHIVO_DIAS):
+    """Último cierre con al menos `dias` de antigüedad, o None."""
+    return ultimo_cierre(hasta=timezone.localdate() - timedelta(days=dias))
+
+
+def archivar_movimientos(hasta, tamano_lote=TAMANO_LOTE, progreso=None):
+    """
+    Mueve al archivo los movimientos hasta el final del día `hasta`, que debe
+    tener cierre de stock. Cada lote se copia y se borra en una transacción.
+    `progreso(n)` se llama tras cada lote. Devuelve el total archivado.
+    """
+    if not CierreStock.objects.filter(fecha=hasta).exists():
+        raise ArchivoInvalido(f"No hay cierre de stock del {hasta:%d-%m-%Y}; primero ejecute cerrar_stock.")
+
+    limite = inicio_dia(hasta + timedelta(days=1))
+    total = 0
+    while True:
+        with transaction.atomic():
+            filas = list(
+                MovimientoInventario.objects.select_for_update()
+                .filter(fecha__lt=limite)
+                .order_by("fecha", "id")
+                .values(*CAMPOS)[:tamano_lote]
+            )
+            if not filas:
+                break
+            MovimientoArchivado.objects.bulk_create(
+                [MovimientoArchivado(**fila) for fila in filas], batch_size=1000
+            )
+            MovimientoInventario.objects.filter(pk__in=[fila["id"] for fila in filas]).delete()
+        # El total de movimientos del inicio cuenta solo los vigentes
+        ajustar_movimientos(quitados=[fila["fecha"] for fila in filas])
+        total += len(filas)
+        if progreso:
+            progreso(total)
+    return total
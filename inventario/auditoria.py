@@ -0,0 +1,179 @@
+"""
+Auditoría sin bloquear el request.
+
+registrar() arma el EventoAuditoria y lo deja en una cola en memoria. Un
+hilo de fondo lo guarda con bulk_create cuando junta AUDITORIA_LOTE eventos
+o pasan AUDITORIA_INTERVALO segundos desde el primero pendiente. Al terminar
+el proceso (atexit) se vacía lo que quede en la cola. Con
+AUDITORIA_SINCRONA = True en settings (pruebas, scripts) cada evento se
+guarda en el momento.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .consultas import inicio_dia
+from .models import EventoAuditoria
+
+
+logger = logging.getLogger(__name__)
+
+LOTE = getattr(settings, "AUDITORIA_LOTE", 200)
+INTERVALO = getattr(settings, "AUDITORIA_INTERVALO", 2.0)
+MAXIMO_COLA = getattr(settings, "AUDITORIA_MAXIMO_COLA", 10000)
+SINCRONA = getattr(settings, "AUDITORIA_SINCRONA", False)
+
+# Acciones y entidades que registran las vistas (para los filtros de la búsqueda)
+ACCIONES = [
+    "CREAR_MOVIMIENTO", "EDITAR_MOVIMIENTO", "ELIMINAR_MOVIMIENTO", "IMPORTAR_MOVIMIENTOS", "CREAR_DOCUMENTO",
+    "CREAR_PRODUCTO", "EDITAR_PRODUCTO", "ELIMINAR_PRODUCTO",
+    "CREAR_PROVEEDOR", "EDITAR_PROVEEDOR", "ELIMINAR_PROVEEDOR",
+    "REGISTRO_PUBLICO", "CREAR_USUARIO", "EDITAR_USUARIO", "ELIMINAR_USUARIO",
+    "LOGIN_EXITOSO", "LOGIN_FALLIDO", "LOGOUT",
+]
+ENTIDADES = ["movimiento", "documento", "producto", "proveedor", "usuario", "sesion"]
+
+
+class EscritorAuditoria:
+    """Cola en memoria + hilo que la guarda por lotes."""
+
+    def __init__(self, lote=LOTE, intervalo=INTERVALO, maximo=MAXIMO_COLA):
+        self.cola = queue.Queue(maxsize=maximo)
+        self.lote = lote
+        self.intervalo = intervalo
+        self._hilo = None
+        self._candado = threading.Lock()
+        # Tomado por el hilo mientras junta y guarda un lote, para que vaciar() lo espere
+        self._escribiendo = threading.Lock()
+
+    def encolar(self, evento):
+        self._iniciar()
+        try:
+            self.cola.put_nowait(evento)
+        except queue.Full:
+            # BD caída o muy lenta: antes que perder el evento se guarda en el request
+            self.guardar([evento])
+
+    def _iniciar(self):
+        # Se arranca al primer evento (y de nuevo en cada worker tras un fork)
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._candado:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name="auditoria", daemon=True)
+                self._hilo.start()
+
+    def _juntar(self, primero):
+        """Junta los eventos que lleguen tras `primero` hasta completar el lote o el intervalo."""
+        eventos = [primero]
+        limite = time.monotonic() + self.intervalo
+        while len(eventos) < self.lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                eventos.append(self.cola.get(timeout=restante))
+            except queue.Empty:
+                break
+        return eventos
+
+    def _bucle(self):
+        while True:
+            primero = self.cola.get()
+            with self._escribiendo:
+                self.guardar(self._juntar(primero))
+
+    def guardar(self, eventos):
+        try:
+            EventoAuditoria.objects.bulk_create(eventos, batch_size=self.lote)
+        except Exception:
+            logger.exception("No se pudieron guardar %d eventos de auditoría", len(eventos))
+        finally:
+            close_old_connections()
+
+    def vaciar(self):
+        """Guarda ya todo lo pendiente (al cerrar el proceso, o en pruebas)."""
+        eventos = []
+        while True:
+            try:
+                eventos.append(self.cola.get_nowait())
+            except queue.Empty:
+                break
+        if eventos:
+            self.guardar(eventos)
+        # El lote que el hilo esté juntando o guardando en este momento
+        if self._escribiendo.acquire(timeout=self.intervalo + 5):
+            self._escribiendo.release()
+        return len(eventos)
+
+
+escritor = EscritorAuditoria()
+atexit.register(escritor.vaciar)
+
+
+def registrar(accion, request=None, usuario=None, entidad="", entidad_id=None, username=None, **detalle):
+    """
+    Encola un evento. El usuario por defecto es request.user; `username`
+    sirve para intentos sin usuario (login fallido). El resto de los
+    argumentos con nombre queda en `detalle`.
+    """
+    ip = None
+    if request is not None:
+        ip = request.META.get("REMOTE_ADDR") or None
+        if usuario is None and request.user.is_authenticated:
+            usuario = request.user
+    evento = EventoAuditoria(
+        fecha=timezone.now(),
+        usuario_id=getattr(usuario, "pk", None),
+        username=username or getattr(usuario, "username", "") or "",
+        accion=accion,
+        entidad=entidad,
+        entidad_id="" if entidad_id is None else str(entidad_id),
+        ip=ip,
+        detalle=detalle,
+    )
+    if SINCRONA:
+        escritor.guardar([evento])
+    else:
+        escritor.encolar(evento)
+    return evento
+
+
+def filtrar_eventos(qs, filtros):
+    """Filtros de la búsqueda de auditoría (cleaned_data de FiltroAuditoriaForm)."""
+    if filtros.get("usuario"):
+        valor = filtros["usuario"]
+        qs = qs.filter(Q(usuario_id=valor) if valor.isdigit() else Q(username=valor))
+    if filtros.get("accion"):
+        qs = qs.filter(accion=filtros["accion"])
+    if filtros.get("entidad"):
+        qs = qs.filter(entidad=filtros["entidad"])
+    if filtros.get("entidad_id"):
+        qs = qs.filter(entidad_id=filtros["entidad_id"])
+    if filtros.get("desde"):
+        qs = qs.filter(fecha__gte=inicio_dia(filtros["desde"]))
+    if filtros.get("hasta"):
+        qs = qs.filter(fecha__lt=inicio_dia(filtros["hasta"] + timedelta(days=1)))
+    return qs
+
+
+def evento_a_dict(evento):
+    return {
+        "id": evento.id,
+        "fecha": evento.fecha.isoformat(),
+        "usuario_id": evento.usuario_id,
+        "username": evento.username,
+        "accion": evento.accion,
+        "entidad": evento.entidad,
+        "entidad_id": evento.entidad_id,
+        "ip": evento.ip,
+        "detalle": evento.detalle,
+    }
@@ -0,0 +1,116 @@
+"""
+Autocompletar de productos, proveedores y bodegas para los formularios.
+
+Los selects de producto / proveedor ya no traen todo el catálogo: el widget
+SelectAutocompletar solo pinta la opción elegida y el navegador pide el
+resto a la vista `autocompletar` (búsqueda por prefijo con un tope de
+resultados). El formulario sigue validando el id contra el queryset del
+campo, así que un id inventado no pasa.
+
+Las respuestas quedan en caché por (entidad, texto, límite). Cada entidad
+tiene un número de versión que forma parte de la clave; las señales lo
+cambian cuando se guarda o elimina un registro, y con eso las búsquedas
+viejas dejan de usarse sin tener que borrarlas una por una.
+"""
+import hashlib
+import time
+
+from django import forms
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from catalogo.consultas import buscar_productos
+from proveedores.consultas import buscar_proveedores
+
+from .consultas import buscar_bodegas
+
+
+LIMITE_DEFECTO = 20
+LIMITE_MAXIMO = 50
+DURACION_CACHE = getattr(settings, "AUTOCOMPLETAR_DURACION_CACHE", 5 * 60)
+
+
+def _producto(p):
+    return {"id": p.pk, "texto": f"{p.sku} - {p.nombre}", "sku": p.sku, "ean_upc": p.ean_upc, "nombre": p.nombre}
+
+
+def _proveedor(p):
+    return {"id": p.pk, "texto": f"{p.razon_social} ({p.rut_nif})", "rut_nif": p.rut_nif, "razon_social": p.razon_social}
+
+
+def _bodega(b):
+    return {"id": b.pk, "texto": f"{b.codigo} - {b.nombre}", "codigo": b.codigo, "nombre": b.nombre}
+
+
+# entidad -> (búsqueda, serialización)
+ENTIDADES = {
+    "productos": (buscar_productos, _producto),
+    "proveedores": (buscar_proveedores, _proveedor),
+    "bodegas": (buscar_bodegas, _bodega),
+}
+
+
+def _clave_version(entidad):
+    return f"autocompletar:{entidad}:version"
+
+
+def version(entidad):
+    valor = cache.get(_clave_version(entidad))
+    if valor is None:
+        cache.add(_clave_version(entidad), time.time_ns(), None)
+        valor = cache.get(_clave_version(entidad))
+    return valor
+
+
+def invalidar_autocompletar(entidad):
+    # Una versión nueva (no un incremento) para no reusar claves si la anterior expiró
+    cache.set(_clave_version(entidad), time.time_ns(), None)
+
+
+def buscar(entidad, q, limite=LIMITE_DEFECTO):
+    """Lista de dicts {id, texto, ...} de `entidad` que empiezan con `q`."""
+    buscador, a_dict = ENTIDADES[entidad]
+    q = (q or "").strip()
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    resumen = hashlib.md5(q.lower().encode()).hexdigest()
+    clave = f"autocompletar:{entidad}:{version(entidad)}:{limite}:{resumen}"
+    resultados = cache.get(clave)
+    if resultados is None:
+        resultados = [a_dict(obj) for obj in buscador(q, limite)]
+        cache.set(clave, resultados, DURACION_CACHE)
+    return resultados
+
+
+class SelectAutocompletar(forms.Select):
+    """
+    Select que solo renderiza la opción vacía y la seleccionada; el resto lo
+    carga static/js/autocompletar.js desde la vista `autocompletar`.
+    """
+
+    def __init__(self, entidad, attrs=None):
+        self.entidad = entidad
+        super().__init__(attrs)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"]["data-autocompletar"] = reverse("inventario:autocompletar", args=[self.entidad])
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        valores = [v for v in value if v not in ("", None)]
+        queryset = getattr(self.choices, "queryset", None)
+        opciones = []
+        if getattr(self.choices, "field", None) is not None and self.choices.field.empty_label is not None:
+            opciones.append(("", self.choices.field.empty_label))
+        if valores and queryset is not None:
+            try:
+                seleccionados = list(queryset.filter(pk__in=valores))
+            except (TypeError, ValueError):
+                seleccionados = []
+            opciones.extend((obj.pk, self.choices.field.label_from_instance(obj)) for obj in seleccionados)
+        grupos = []
+        for indice, (valor, etiqueta) in enumerate(opciones):
+            seleccionado = str(valor) in valores
+            grupos.append((None, [self.create_option(name, valor, etiqueta, seleccionado, indice, attrs=attrs)], indice))
+        return grupos
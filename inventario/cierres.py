@@ -0,0 +1,102 @@
+"""
+Cierres de stock y consultas de stock a una fecha.
+
+El stock al final del día D se calcula como el último cierre con fecha <= D
+más los movimientos posteriores a ese cierre hasta D, en vez de sumar todo
+el historial de movimiento_inventario.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .consultas import inicio_dia, modelos_movimiento
+from .models import CierreStock
+from .stock import saldos_movimientos
+
+
+class CierreInvalido(Exception):
+    pass
+
+
+def ultimo_cierre(hasta=None):
+    """Fecha del último cierre (opcionalmente <= hasta), o None."""
+    qs = CierreStock.objects.order_by()
+    if hasta is not None:
+        qs = qs.filter(fecha__lte=hasta)
+    return qs.aggregate(ultima=Max("fecha"))["ultima"]
+
+
+def _movimientos_entre(modelo, desde, hasta, producto=None, bodega=None):
+    """Movimientos del día siguiente a `desde` (o del inicio) hasta el final de `hasta`."""
+    qs = modelo.objects.filter(fecha__lt=inicio_dia(hasta + timedelta(days=1)))
+    if desde is not None:
+        qs = qs.filter(fecha__gte=inicio_dia(desde + timedelta(days=1)))
+    if producto is not None:
+        qs = qs.filter(producto=producto)
+    if bodega is not None:
+        qs = qs.filter(Q(bodega_origen=bodega) | Q(bodega_destino=bodega))
+    return qs
+
+
+def _saldos_desde(cierre, fecha, producto=None, bodega=None):
+    """Saldos del cierre `cierre` (o cero si es None) más los movimientos hasta `fecha`."""
+    saldos = {}
+    if cierre is not None:
+        base = CierreStock.objects.order_by().filter(fecha=cierre)
+        if producto is not None:
+            base = base.filter(producto=producto)
+        if bodega is not None:
+            base = base.filter(bodega=bodega)
+        for producto_id, bodega_id, cantidad in base.values_list("producto_id", "bodega_id", "cantidad"):
+            saldos[(producto_id, bodega_id)] = cantidad
+
+    # Si el intervalo llega a movimientos ya archivados, se suman también
+    desde = cierre + timedelta(days=1) if cierre is not None else None
+    bodega_id = getattr(bodega, "pk", bodega)
+    for modelo in modelos_movimiento(desde):
+        delta = saldos_movimientos(_movimientos_entre(modelo, cierre, fecha, producto, bodega))
+        for clave, cantidad in delta.items():
+            # Una transferencia trae también la otra bodega; se descarta
+            if bodega_id is not None and clave[1] != bodega_id:
+                continue
+            saldos[clave] = saldos.get(clave, Decimal("0")) + cantidad
+
+    return {clave: cantidad for clave, cantidad in saldos.items() if cantidad}
+
+
+def saldos_a_fecha(fecha, producto=None, bodega=None):
+    """
+    Stock al final del día `fecha` por (producto_id, bodega_id), opcionalmente
+    acotado a un producto y/o bodega. Omite los pares con saldo cero.
+    """
+    return _saldos_desde(ultimo_cierre(hasta=fecha), fecha, producto, bodega)
+
+
+def stock_a_fecha(producto, bodega, fecha):
+    """Stock de un producto en una bodega al final del día `fecha`."""
+    saldos = saldos_a_fecha(fecha, producto=producto, bodega=bodega)
+    return saldos.get((getattr(producto, "pk", producto), getattr(bodega, "pk", bodega)), Decimal("0"))
+
+
+def cerrar_stock(fecha):
+    """
+    Escribe (o reescribe) el cierre del día `fecha` a partir del cierre
+    anterior más los movimientos del intervalo. Solo se cierran días ya
+    terminados. Devuelve la cantidad de filas escritas.
+    """
+    if fecha >= timezone.localdate():
+        raise CierreInvalido("Solo se pueden cerrar días ya terminados.")
+
+    anterior = ultimo_cierre(hasta=fecha - timedelta(days=1))
+    saldos = _saldos_desde(anterior, fecha)
+
+    with transaction.atomic():
+        CierreStock.objects.filter(fecha=fecha).delete()
+        CierreStock.objects.bulk_create([
+            CierreStock(fecha=fecha, producto_id=producto_id, bodega_id=bodega_id, cantidad=cantidad)
+            for (producto_id, bodega_id), cantidad in saldos.items()
+        ], batch_size=1000)
+    return len(saldos)
@@ -0,0 +1,240 @@
+import base64
+import binascii
+import heapq
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Bodega, MovimientoArchivado, MovimientoInventario
+
+
+TAMANOS_PAGINA = [5, 10, 20, 50]
+TAMANO_PAGINA_DEFECTO = 10
+
+
+def movimientos_base(modelo=MovimientoInventario):
+    return modelo.objects.select_related(
+        "producto", "proveedor", "bodega_origen", "bodega_destino", "usuario", "documento"
+    )
+
+
+def inicio_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+# ---------- Movimientos archivados ----------
+
+def frontera_archivo():
+    """Fecha del movimiento archivado más reciente, o None si no hay archivo."""
+    return MovimientoArchivado.objects.order_by().aggregate(ultima=Max("fecha"))["ultima"]
+
+
+def alcanza_archivo(desde=None):
+    """True si un rango que parte el día `desde` (o sin inicio) incluye movimientos archivados."""
+    frontera = frontera_archivo()
+    return frontera is not None and (desde is None or inicio_dia(desde) <= frontera)
+
+
+def modelos_movimiento(desde=None):
+    """Modelos a consultar para un rango que parte el día `desde` (o sin inicio)."""
+    if alcanza_archivo(desde):
+        return [MovimientoInventario, MovimientoArchivado]
+    return [MovimientoInventario]
+
+
+def movimientos_historicos(filtros):
+    """Querysets del listado / exportación: vigentes y, si el rango llega, archivados."""
+    return [
+        filtrar_movimientos(movimientos_base(modelo), filtros)
+        for modelo in modelos_movimiento(filtros.get("desde"))
+    ]
+
+
+def mezclar(fuentes, descendente=True):
+    """Une iterables ya ordenados por (fecha, id) en un solo flujo ordenado."""
+    if len(fuentes) == 1:
+        return iter(fuentes[0])
+    return heapq.merge(*fuentes, key=lambda m: (m.fecha, m.pk), reverse=descendente)
+
+
+class MovimientosExportables:
+    """
+    Vigentes + archivados como un solo iterable por fecha descendente, con
+    la interfaz que usa proyecto_lilis.exportar (count / iterator).
+    """
+
+    def __init__(self, fuentes):
+        self.fuentes = [qs.order_by("-fecha", "-id") for qs in fuentes]
+
+    def count(self):
+        return sum(qs.count() for qs in self.fuentes)
+
+    def iterator(self, chunk_size=2000):
+        return mezclar([qs.iterator(chunk_size=chunk_size) for qs in self.fuentes])
+
+
+def filtrar_movimientos(qs, filtros):
+    """
+    Aplica los filtros del listado (los mismos que usan las exportaciones).
+    `filtros` es el cleaned_data de FiltroMovimientosForm.
+    Las fechas se convierten a rangos [desde 00:00, hasta+1 00:00) para que
+    la consulta use el índice de fecha en vez de aplicar DATE() a la columna.
+    """
+    if filtros.get("tipo"):
+        qs = qs.filter(tipo=filtros["tipo"])
+    if filtros.get("producto"):
+        qs = qs.filter(producto_id=filtros["producto"])
+    if filtros.get("bodega"):
+        bodega = filtros["bodega"]
+        qs = qs.filter(Q(bodega_origen=bodega) | Q(bodega_destino=bodega))
+    if filtros.get("usuario"):
+        qs = qs.filter(usuario_id=filtros["usuario"])
+    if filtros.get("documento"):
+        qs = qs.filter(documento_id=filtros["documento"])
+    if filtros.get("desde"):
+        qs = qs.filter(fecha__gte=inicio_dia(filtros["desde"]))
+    if filtros.get("hasta"):
+        qs = qs.filter(fecha__lt=inicio_dia(filtros["hasta"] + timedelta(days=1)))
+    q = filtros.get("q")
+    if q:
+        qs = qs.filter(
+            Q(producto__nombre__icontains=q) |
+            Q(producto__sku__icontains=q) |
+            Q(proveedor__razon_social__icontains=q) |
+            Q(proveedor__rut_nif__icontains=q) |
+            Q(bodega_origen__nombre__icontains=q) |
+            Q(bodega_destino__nombre__icontains=q) |
+            Q(usuario__username__icontains=q)
+        )
+    return qs
+
+
+# ---------- Paginación keyset por (fecha, id) ----------
+
+def codificar_cursor(movimiento):
+    valor = f"{movimiento.fecha.isoformat()}|{movimiento.pk}"
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, id) o None si el cursor es inválido."""
+    if not cursor:
+        return None
+    try:
+        fecha, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(fecha), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+def aplicar_cursor(qs, despues=None, antes=None):
+    """Filtra y ordena qs a partir de un cursor (fecha, id) ya decodificado."""
+    if antes:
+        fecha, pk = antes
+        return qs.filter(Q(fecha__gt=fecha) | Q(fecha=fecha, pk__gt=pk)).order_by("fecha", "id")
+    if despues:
+        fecha, pk = despues
+        qs = qs.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, pk__lt=pk))
+    return qs.order_by("-fecha", "-id")
+
+
+def paginar_keyset(qs, tamano, despues=None, antes=None):
+    """
+    Devuelve (movimientos, cursor_siguiente, cursor_anterior) para una página
+    ordenada por fecha e id descendentes. Solo lee tamano + 1 filas sin
+    importar la profundidad de la página. `qs` puede ser una lista de
+    querysets (vigentes y archivados): se leen tamano + 1 de cada uno y se
+    mezclan.
+    """
+    despues = decodificar_cursor(despues)
+    antes = decodificar_cursor(antes) if not despues else None
+    fuentes = qs if isinstance(qs, (list, tuple)) else [qs]
+    fuentes = [aplicar_cursor(f, despues=despues, antes=antes)[:tamano + 1] for f in fuentes]
+
+    filas = list(islice(mezclar(fuentes, descendente=not antes), tamano + 1))
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if antes:
+        filas.reverse()
+
+    if not filas:
+        return filas, None, None
+
+    # Hacia atrás, "hay_mas" indica que existe una página anterior
+    if antes:
+        siguiente = codificar_cursor(filas[-1])
+        anterior = codificar_cursor(filas[0]) if hay_mas else None
+    else:
+        siguiente = codificar_cursor(filas[-1]) if hay_mas else None
+        anterior = codificar_cursor(filas[0]) if despues else None
+    return filas, siguiente, anterior
+
+
+def movimiento_a_dict(m):
+    return {
+        "id": m.id,
+        "fecha": m.fecha.isoformat(),
+        "tipo": m.tipo,
+        "tipo_display": m.get_tipo_display(),
+        "producto": {"id": m.producto_id, "sku": m.producto.sku, "nombre": m.producto.nombre},
+        "proveedor": (
+            {"id": m.proveedor_id, "rut_nif": m.proveedor.rut_nif, "razon_social": m.proveedor.razon_social}
+            if m.proveedor else None
+        ),
+        "bodega_origen": (
+            {"id": m.bodega_origen_id, "codigo": m.bodega_origen.codigo, "nombre": m.bodega_origen.nombre}
+            if m.bodega_origen else None
+        ),
+        "bodega_destino": (
+            {"id": m.bodega_destino_id, "codigo": m.bodega_destino.codigo, "nombre": m.bodega_destino.nombre}
+            if m.bodega_destino else None
+        ),
+        "cantidad": str(m.cantidad),
+        "lote": m.lote,
+        "serie": m.serie,
+        "fecha_vencimiento": m.fecha_vencimiento.isoformat() if m.fecha_vencimiento else None,
+        "doc_referencia": m.doc_referencia,
+        "documento": m.documento_id,
+        "usuario": m.usuario.username,
+        "archivado": getattr(m, "archivado", False),
+    }
+
+
+# Columnas de la exportación (mismo orden que la planilla histórica)
+COLUMNAS_EXPORTACION = [
+    ("ID", lambda m: m.id),
+    ("Fecha registro", lambda m: m.fecha),
+    ("Tipo", lambda m: m.get_tipo_display()),
+    ("Producto", lambda m: m.producto.nombre),
+    ("Proveedor (RUT/NIF)", lambda m: m.proveedor.rut_nif if m.proveedor else ""),
+    ("Bodega origen", lambda m: m.bodega_origen.nombre if m.bodega_origen else ""),
+    ("Bodega destino", lambda m: m.bodega_destino.nombre if m.bodega_destino else ""),
+    ("Cantidad", lambda m: float(m.cantidad) if m.cantidad is not None else ""),
+    ("Lote", lambda m: m.lote or ""),
+    ("Serie", lambda m: m.serie or ""),
+    ("Fecha vencimiento", lambda m: m.fecha_vencimiento),
+    ("Documento referencia", lambda m: m.doc_referencia or ""),
+    ("Motivo", lambda m: m.motivo or ""),
+    ("Observaciones", lambda m: m.observaciones or ""),
+    ("Usuario", lambda m: m.usuario.username),
+]
+
+
+def buscar_bodegas(q, limite):
+    """Bodegas cuyo código (o, si no alcanza, nombre) empieza con `q`, hasta `limite`."""
+    encontradas = {}
+    for campo in ("codigo", "nombre"):
+        faltan = limite - len(encontradas)
+        if faltan <= 0:
+            break
+        qs = (
+            Bodega.objects.filter(**{f"{campo}__istartswith": q})
+            .exclude(pk__in=list(encontradas))
+            .order_by(campo)
+            .only("codigo", "nombre")
+        )
+        for bodega in qs[:faltan]:
+            encontradas[bodega.pk] = bodega
+    return list(encontradas.values())
@@ -0,0 +1,174 @@
+"""
+Contadores del inicio de mantenedores (totales de productos, proveedores,
+usuarios y movimientos, valor del stock, productos bajo el punto de
+reorden y movimientos del día).
+
+Los totales se mantienen en la caché de forma incremental: cada alta o
+baja de producto, proveedor o usuario (señales en inventario.signals) y
+cada movimiento que inventario.stock confirma o inventario.archivo
+archiva ajusta su clave con cache.incr / cache.decr, así que mostrar el
+inicio no hace ningún COUNT(*). "Movimientos de hoy" lleva una clave por
+día. El valor del stock sale de valorizacion_bodega (una fila por
+producto/bodega, no de los movimientos) y se recalcula solo después de un
+movimiento. Los productos bajo el punto de reorden son un COUNT sobre
+stock_bodega agrupado por producto (sin armar la propuesta de reposición),
+guardado hasta el próximo movimiento o cambio de producto.
+
+Como red de seguridad (incr de la caché en BD no es atómico, y una clave
+puede expirar o perderse) todo se vuelve a contar cada
+CONTADORES_DURACION segundos, en un solo request a la vez (candado con
+cache.add); mientras tanto los demás siguen usando los valores en caché.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from accounts_lilis.models import Usuario
+from catalogo.models import Producto
+from proveedores.models import Proveedor
+
+from .consultas import inicio_dia
+from .models import MovimientoInventario
+from .reposicion import productos_bajo_punto
+from .valorizacion import valor_por_bodega
+
+
+PREFIJO = "inventario:contadores"
+CLAVE_VIGENTE = f"{PREFIJO}:vigente"
+CLAVE_CANDADO = f"{PREFIJO}:candado"
+CLAVE_CALCULADO = f"{PREFIJO}:calculado_en"
+CLAVE_VALOR = f"{PREFIJO}:valor_stock"
+CLAVE_BAJO_STOCK = f"{PREFIJO}:bajo_stock"
+
+# Totales que se ajustan con incr/decr -> modelo que se cuenta
+TOTALES = {
+    "total_productos": Producto,
+    "total_proveedores": Proveedor,
+    "total_usuarios": Usuario,
+    "total_movimientos": MovimientoInventario,
+}
+
+# Cada cuánto se vuelve a contar todo desde la BD (red de seguridad)
+DURACION = getattr(settings, "CONTADORES_DURACION", 15 * 60)
+# Las claves de los totales se conservan hasta un día como respaldo
+DURACION_RESPALDO = 24 * 60 * 60
+DURACION_CANDADO = 30
+
+
+def _clave(nombre):
+    return f"{PREFIJO}:{nombre}"
+
+
+def _clave_hoy(dia=None):
+    return f"{PREFIJO}:movimientos_hoy:{(dia or timezone.localdate()).isoformat()}"
+
+
+def _contar_hoy(dia):
+    return MovimientoInventario.objects.filter(
+        fecha__gte=inicio_dia(dia), fecha__lt=inicio_dia(dia + timedelta(days=1))
+    ).count()
+
+
+def recontar():
+    """Cuenta todos los totales desde la BD y los deja en la caché."""
+    hoy = timezone.localdate()
+    valores = {_clave(nombre): modelo.objects.count() for nombre, modelo in TOTALES.items()}
+    valores[_clave_hoy(hoy)] = _contar_hoy(hoy)
+    valores[CLAVE_CALCULADO] = timezone.now()
+    cache.set_many(valores, DURACION_RESPALDO)
+    cache.set(CLAVE_VIGENTE, True, DURACION)
+    return valores
+
+
+def _valor_stock():
+    valor = cache.get(CLAVE_VALOR)
+    if valor is None:
+        valor = sum(valor_por_bodega().values(), Decimal("0"))
+        cache.set(CLAVE_VALOR, valor, DURACION_RESPALDO)
+    return valor
+
+
+def _bajo_stock():
+    valor = cache.get(CLAVE_BAJO_STOCK)
+    if valor is None:
+        valor = productos_bajo_punto().count()
+        cache.set(CLAVE_BAJO_STOCK, valor, DURACION_RESPALDO)
+    return valor
+
+
+def contadores():
+    """Dict con todos los contadores del inicio, desde la caché."""
+    hoy = _clave_hoy()
+    claves = [_clave(nombre) for nombre in TOTALES] + [hoy, CLAVE_CALCULADO, CLAVE_VIGENTE]
+    guardado = cache.get_many(claves)
+    faltan = any(clave not in guardado for clave in claves[:-1])
+    if (faltan or not guardado.get(CLAVE_VIGENTE)) and cache.add(CLAVE_CANDADO, True, DURACION_CANDADO):
+        try:
+            guardado.update(recontar())
+        finally:
+            cache.delete(CLAVE_CANDADO)
+    elif faltan:
+        # Otro request está recontando: se completa solo lo que falta (un
+        # día nuevo es un COUNT sobre el índice de fecha, no la tabla entera)
+        for nombre, modelo in TOTALES.items():
+            if _clave(nombre) not in guardado:
+                guardado[_clave(nombre)] = modelo.objects.count()
+        if hoy not in guardado:
+            guardado[hoy] = _contar_hoy(timezone.localdate())
+            cache.add(hoy, guardado[hoy], DURACION_RESPALDO)
+
+    datos = {nombre: guardado[_clave(nombre)] for nombre in TOTALES}
+    datos.update({
+        "movimientos_hoy": guardado[hoy],
+        "valor_stock": _valor_stock(),
+        "productos_bajo_stock": _bajo_stock(),
+        "calculado_en": guardado.get(CLAVE_CALCULADO) or timezone.now(),
+    })
+    return datos
+
+
+def _ajustar(clave, delta):
+    if not delta:
+        return
+    try:
+        if delta > 0:
+            cache.incr(clave, delta)
+        else:
+            cache.decr(clave, -delta)
+    except ValueError:
+        # La clave no está en caché: el próximo contadores() la recuenta
+        pass
+
+
+def ajustar_total(nombre, delta):
+    """Suma delta al total `nombre` (una clave de TOTALES)."""
+    _ajustar(_clave(nombre), delta)
+
+
+def ajustar_movimientos(agregados=(), quitados=()):
+    """
+    Ajusta los contadores de movimientos. agregados y quitados son las
+    fechas de los movimientos que se insertaron y se borraron (una edición
+    pasa la fecha nueva y la anterior). El valor del stock y los productos
+    bajo el punto de reorden se recalculan en la próxima visita.
+    """
+    agregados, quitados = list(agregados), list(quitados)
+    ajustar_total("total_movimientos", len(agregados) - len(quitados))
+    hoy = timezone.localdate()
+    de_hoy = sum(1 for f in agregados if f and timezone.localdate(f) == hoy)
+    de_hoy -= sum(1 for f in quitados if f and timezone.localdate(f) == hoy)
+    _ajustar(_clave_hoy(hoy), de_hoy)
+    cache.delete_many([CLAVE_VALOR, CLAVE_BAJO_STOCK])
+
+
+def invalidar_bajo_stock():
+    """Cambió un punto de reorden o stock mínimo: se recuenta en la próxima visita."""
+    cache.delete(CLAVE_BAJO_STOCK)
+
+
+def invalidar_contadores():
+    """Fuerza un recuento completo (y los valores derivados) en la próxima visita al inicio."""
+    cache.delete_many([CLAVE_VIGENTE, CLAVE_VALOR, CLAVE_BAJO_STOCK])
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from catalogo.consultas import COLUMNAS_EXPORTACION as COLUMNAS_PRODUCTOS, filtrar_productos
+from proveedores.consultas import COLUMNAS_EXPORTACION as COLUMNAS_PROVEEDORES, filtrar_proveedores
+from proyecto_lilis.exportar import escribir_archivo, formato_solicitado
+from proyecto_lilis.replica import lecturas_en_primario, lecturas_en_replica
+
+from .consultas import COLUMNAS_EXPORTACION as COLUMNAS_MOVIMIENTOS, MovimientosExportables, movimientos_historicos
+from .forms import FiltroMovimientosForm
+from .models import TrabajoExportacion
+
+
+# Minutos durante los que una exportación idéntica ya terminada se reutiliza
+REUTILIZAR_MINUTOS = getattr(settings, "EXPORTACION_REUTILIZAR_MINUTOS", 10)
+# Un trabajo EN_PROCESO por más de estos minutos se da por perdido (worker
+# detenido a mitad de camino): no se reutiliza y pasa a ERROR
+MAX_MINUTOS_PROCESO = getattr(settings, "EXPORTACION_MAX_MINUTOS", 30)
+# Días que se conservan los archivos generados y sus trabajos
+RETENER_DIAS = getattr(settings, "EXPORTACION_RETENER_DIAS", 7)
+DIRECTORIO = "exportaciones"
+
+# XLSX no se transmite por partes (ver proyecto_lilis.exportar): sobre estas
+# filas se genera en segundo plano en vez de dentro del request
+XLSX_MAX_FILAS = getattr(settings, "EXPORTACION_XLSX_MAX_FILAS", 5000)
+
+# Parámetros de la URL que no son filtros
+PARAMETROS_CONTROL = ("formato", "segundo_plano", "cursor", "antes", "size")
+
+
+def _movimientos(parametros):
+    filtros = FiltroMovimientosForm(parametros).filtros()
+    return MovimientosExportables(movimientos_historicos(filtros))
+
+
+def _proveedores(parametros):
+    return filtrar_proveedores(parametros.get("q", "").strip())
+
+
+def _productos(parametros):
+    return filtrar_productos(parametros.get("q", "").strip(), parametros.get("categoria", "").strip())
+
+
+# tipo -> (queryset a partir de los filtros, columnas, nombre de archivo, hoja)
+TIPOS_EXPORTACION = {
+    "movimientos": (_movimientos, COLUMNAS_MOVIMIENTOS, "movimientos_inventario", "Movimientos"),
+    "proveedores": (_proveedores, COLUMNAS_PROVEEDORES, "proveedores", "Proveedores"),
+    "productos": (_productos, COLUMNAS_PRODUCTOS, "productos", "Productos"),
+}
+
+# Roles que pueden ver/descargar cada tipo (los mismos que el listado de origen).
+# Una exportación reutilizada la puede descargar cualquiera con acceso al tipo.
+ROLES_EXPORTACION = {
+    "movimientos": ["ADMIN", "OPER_INVENTARIO", "AUDITOR"],
+    "proveedores": ["ADMIN", "OPER_COMPRAS", "AUDITOR"],
+    "productos": ["ADMIN", "OPER_INVENTARIO", "OPER_PRODUCCION", "OPER_VENTAS", "ANALISTA_FIN", "AUDITOR"],
+}
+
+
+def puede_ver(user, trabajo):
+    return user.is_authenticated and user.rol in ROLES_EXPORTACION.get(trabajo.tipo, [])
+
+
+def calcular_huella(tipo, formato, parametros):
+    contenido = json.dumps([tipo, formato, parametros], sort_keys=True)
+    return hashlib.sha256(contenido.encode()).hexdigest()
+
+
+def solicitar_exportacion(usuario, tipo, formato, parametros):
+    """
+    Encola una exportación, o devuelve la ya existente si hay una idéntica
+    pendiente, en proceso desde hace menos de MAX_MINUTOS_PROCESO o
+    terminada hace menos de REUTILIZAR_MINUTOS.
+    """
+    parametros = {k: v for k, v in parametros.items() if k not in PARAMETROS_CONTROL and v}
+    huella = calcular_huella(tipo, formato, parametros)
+
+    vigentes = TrabajoExportacion.objects.filter(huella=huella)
+    ahora = timezone.now()
+    # Las vistas de exportación leen de la réplica, que puede no tener aún
+    # el trabajo recién encolado: los duplicados se buscan en el primario
+    with lecturas_en_primario():
+        existente = (
+            vigentes.filter(estado="PENDIENTE").first()
+            or vigentes.filter(
+                estado="EN_PROCESO",
+                iniciado_en__gte=ahora - timedelta(minutes=MAX_MINUTOS_PROCESO),
+            ).first()
+            or vigentes.filter(
+                estado="LISTO",
+                terminado_en__gte=ahora - timedelta(minutes=REUTILIZAR_MINUTOS),
+            ).first()
+        )
+    if existente:
+        return existente
+
+    return TrabajoExportacion.objects.create(
+        tipo=tipo, formato=formato, parametros=parametros, huella=huella, usuario=usuario,
+    )
+
+
+def en_segundo_plano(request, qs):
+    """
+    True si la exportación de `qs` se debe encolar: la pidió el usuario
+    (?segundo_plano=1) o es un XLSX de más de XLSX_MAX_FILAS filas. `qs`
+    puede ser un MovimientosExportables: se suman sus fuentes.
+    """
+    if request.GET.get("segundo_plano"):
+        return True
+    if formato_solicitado(request) != "xlsx":
+        return False
+    fuentes = getattr(qs, "fuentes", [qs])
+    return sum(fuente[:XLSX_MAX_FILAS + 1].count() for fuente in fuentes) > XLSX_MAX_FILAS
+
+
+def encolar_desde_request(request, tipo):
+    """Atajo para las vistas de exportación con ?segundo_plano=1."""
+    trabajo = solicitar_exportacion(
+        request.user, tipo, formato_solicitado(request), request.GET.dict()
+    )
+    return redirect("inventario:exportacion_estado", pk=trabajo.pk)
+
+
+def marcar_colgados():
+    """
+    Pasa a ERROR los trabajos EN_PROCESO hace más de MAX_MINUTOS_PROCESO (el
+    worker murió sin terminarlos). No se reencolan: si el trabajo mismo es
+    el que tumba al worker, se repetiría para siempre. Una nueva solicitud
+    idéntica crea otro trabajo. Devuelve cuántos se marcaron.
+    """
+    ahora = timezone.now()
+    return TrabajoExportacion.objects.filter(
+        estado="EN_PROCESO", iniciado_en__lt=ahora - timedelta(minutes=MAX_MINUTOS_PROCESO),
+    ).update(
+        estado="ERROR",
+        error="La exportación se interrumpió antes de terminar. Vuelve a solicitarla.",
+        terminado_en=ahora,
+    )
+
+
+def tomar_siguiente():
+    """
+    Marca como EN_PROCESO el trabajo pendiente más antiguo y lo devuelve.
+    SKIP LOCKED permite correr varios workers sin que tomen el mismo trabajo.
+    Antes descarta los trabajos colgados (marcar_colgados).
+    """
+    marcar_colgados()
+    with transaction.atomic():
+        trabajo = (
+            TrabajoExportacion.objects
+            .select_for_update(skip_locked=True)
+            .filter(estado="PENDIENTE")
+            .order_by("creado_en")
+            .first()
+        )
+        if trabajo is None:
+            return None
+        trabajo.estado = "EN_PROCESO"
+        trabajo.iniciado_en = timezone.now()
+        trabajo.save(update_fields=["estado", "iniciado_en"])
+    return trabajo
+
+
+def _almacenamiento():
+    return TrabajoExportacion._meta.get_field("archivo").storage
+
+
+def procesar(trabajo):
+    construir_qs, columnas, nombre, hoja = TIPOS_EXPORTACION[trabajo.tipo]
+
+    relativo = f"{DIRECTORIO}/{nombre}_{uuid.uuid4().hex[:12]}.{trabajo.formato}"
+    ruta = _almacenamiento().path(relativo)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    def progreso(filas):
+        TrabajoExportacion.objects.filter(pk=trabajo.pk).update(filas_procesadas=filas)
+
+    try:
+        # Las filas se leen de la réplica (si hay); el progreso se escribe en el primario
+        with lecturas_en_replica():
+            qs = construir_qs(trabajo.parametros)
+            trabajo.total_filas = qs.count()
+            trabajo.save(update_fields=["total_filas"])
+            escribir_archivo(ruta, qs, columnas, trabajo.formato, hoja, progreso=progreso)
+    except Exception as e:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        trabajo.estado = "ERROR"
+        trabajo.error = str(e)
+        trabajo.terminado_en = timezone.now()
+        trabajo.save(update_fields=["estado", "error", "terminado_en"])
+        raise
+
+    trabajo.refresh_from_db(fields=["filas_procesadas"])
+    trabajo.archivo.name = relativo
+    trabajo.estado = "LISTO"
+    trabajo.terminado_en = timezone.now()
+    trabajo.save(update_fields=["archivo", "estado", "terminado_en"])
+    return trabajo
+
+
+def limpiar_exportaciones(dias=RETENER_DIAS):
+    """
+    Borra los trabajos terminados (LISTO o ERROR) hace más de `dias` con su
+    archivo, y los archivos de la carpeta de exportaciones de esa antigüedad que
+    ningún trabajo referencia (restos de un worker detenido a mitad de
+    camino). Devuelve (trabajos, archivos) borrados.
+    """
+    limite = timezone.now() - timedelta(days=dias)
+    viejos = TrabajoExportacion.objects.filter(estado__in=["LISTO", "ERROR"], terminado_en__lt=limite)
+    archivos = 0
+    for trabajo in viejos.exclude(archivo="").exclude(archivo__isnull=True).only("id", "archivo"):
+        if trabajo.archivo.storage.exists(trabajo.archivo.name):
+            trabajo.archivo.delete(save=False)
+            archivos += 1
+    trabajos, _ = viejos.delete()
+
+    directorio = _almacenamiento().path(DIRECTORIO)
+    if os.path.isdir(directorio):
+        en_uso = set(
+            TrabajoExportacion.objects.exclude(archivo="").exclude(archivo__isnull=True)
+            .values_list("archivo", flat=True)
+        )
+        for entrada in os.scandir(directorio):
+            relativo = f"{DIRECTORIO}/{entrada.name}"
+            if (entrada.is_file() and relativo not in en_uso
+                    and entrada.stat().st_mtime < limite.timestamp()):
+                os.remove(entrada.path)
+                archivos += 1
+    return trabajos, archivos
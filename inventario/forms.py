@@ -1,14 +1,28 @@
 from django import forms
 from django.utils import timezone
-from django.db.models import Sum
 
-from .models import MovimientoInventario
+from catalogo.models import Producto
+
+from .models import Bodega, DocumentoMovimiento, MovimientoInventario, NumeroSerie
+from .auditoria import ACCIONES as ACCIONES_AUDITORIA, ENTIDADES as ENTIDADES_AUDITORIA
+from .autocompletar import SelectAutocompletar
+from .consultas import TAMANOS_PAGINA, TAMANO_PAGINA_DEFECTO
+from .stock import efectos_movimiento, stock_disponible, stock_disponible_productos, StockInsuficiente
+
+
+TAMANOS_PAGINA_KARDEX = [20, 50, 100]
+TAMANO_PAGINA_KARDEX = 50
 
 
 class MovimientoInventarioForm(forms.ModelForm):
     manejo_lote = forms.BooleanField(required=False, label="Manejo por lotes")
     manejo_serie = forms.BooleanField(required=False, label="Manejo por serie")
     manejo_vencimiento = forms.BooleanField(required=False, label="Perecible (vencimiento)")
+    asignar_fefo = forms.BooleanField(
+        required=False,
+        label="Asignar lotes automáticamente (FEFO)",
+        help_text="La salida se reparte entre los lotes que vencen primero.",
+    )
 
     cantidad = forms.DecimalField(
         min_value=1,
@@ -44,6 +58,13 @@ class MovimientoInventarioForm(forms.ModelForm):
         },
     )
 
+    series = forms.CharField(
+        required=False,
+        label="Números de serie",
+        widget=forms.Textarea(attrs={"rows": 3}),
+        help_text="Una serie por línea (o separadas por coma); se registra una línea de cantidad 1 por serie.",
+    )
+
     observaciones = forms.CharField(
         required=False,
         min_length=5,
@@ -65,6 +86,18 @@ class MovimientoInventarioForm(forms.ModelForm):
         },
     )
 
+    costo_unitario = forms.DecimalField(
+        required=False,
+        min_value=0,
+        max_digits=18,
+        decimal_places=6,
+        label="Costo unitario",
+        error_messages={
+            "min_value": "El costo unitario no puede ser negativo.",
+            "invalid": "Ingresa un costo unitario válido.",
+        },
+    )
+
     doc_referencia = forms.CharField(
         required=False,
         max_length=100,
@@ -86,6 +119,7 @@ class MovimientoInventarioForm(forms.ModelForm):
             "bodega_origen",
             "bodega_destino",
             "cantidad",
+            "costo_unitario",
             # flags
             "manejo_lote",
             "manejo_serie",
@@ -98,6 +132,11 @@ class MovimientoInventarioForm(forms.ModelForm):
             "motivo",  
             "observaciones",
         ]
+        widgets = {
+            # Se buscan por prefijo en vez de cargar todo el catálogo en el select
+            "producto": SelectAutocompletar("productos", attrs={"class": "form-select"}),
+            "proveedor": SelectAutocompletar("proveedores", attrs={"class": "form-select"}),
+        }
 
     # ---------- Validaciones individuales ----------
 
@@ -115,6 +154,34 @@ class MovimientoInventarioForm(forms.ModelForm):
                 )
         return fecha
 
+    def _lista_series(self, serie):
+        texto = self.cleaned_data.get("series") or ""
+        series = [s.strip() for s in texto.replace(",", "\n").splitlines() if s.strip()]
+        for s in series:
+            if not 3 <= len(s) <= 30:
+                self.add_error("series", f"La serie «{s}» debe tener entre 3 y 30 caracteres.")
+                return []
+        return series or ([serie] if serie else [])
+
+    def _validar_registro_series(self, campo, tipo, producto, bodega_origen, series):
+        """Consulta numero_serie antes de guardar (inventario.stock lo vuelve a validar con bloqueo)."""
+        registradas = {
+            n.serie: n for n in NumeroSerie.objects.filter(producto=producto, serie__in=series)
+        }
+        if tipo == "INGRESO":
+            repetidas = [s for s in series if s in registradas and registradas[s].estado == NumeroSerie.EN_BODEGA]
+            if repetidas:
+                self.add_error(campo, f"Series ya ingresadas en inventario: {', '.join(repetidas)}.")
+        elif tipo in ["SALIDA", "TRANSFERENCIA"] and bodega_origen:
+            ausentes = [
+                s for s in series
+                if s not in registradas
+                or registradas[s].estado != NumeroSerie.EN_BODEGA
+                or registradas[s].bodega_id != bodega_origen.pk
+            ]
+            if ausentes:
+                self.add_error(campo, f"Series que no están en la bodega origen: {', '.join(ausentes)}.")
+
     # ---------- Validaciones cruzadas ----------
 
     def clean(self):
@@ -130,6 +197,8 @@ class MovimientoInventarioForm(forms.ModelForm):
         manejo_serie = cleaned_data.get("manejo_serie")
         manejo_vencimiento = cleaned_data.get("manejo_vencimiento")
 
+        asignar_fefo = cleaned_data.get("asignar_fefo")
+
         lote = cleaned_data.get("lote")
         serie = cleaned_data.get("serie")
         fecha_vencimiento = cleaned_data.get("fecha_vencimiento")
@@ -157,15 +226,50 @@ class MovimientoInventarioForm(forms.ModelForm):
                     f"Para una {tipo.lower()} debes indicar la bodega origen."
                 )
 
+        # El costo informado solo aplica a ingresos; el resto lo valoriza el sistema
+        if tipo != "INGRESO":
+            cleaned_data["costo_unitario"] = None
+
+        # --- Asignación FEFO: solo al registrar una salida nueva ---
+        if asignar_fefo:
+            if tipo != "SALIDA":
+                self.add_error("asignar_fefo", "La asignación automática de lotes solo aplica a salidas.")
+            elif self.instance.pk:
+                self.add_error("asignar_fefo", "La asignación automática de lotes solo se usa al registrar.")
+
         # --- Validaciones ligadas a los toggles ---
 
         # Si manejo LOTE está activo, el lote se vuelve obligatorio
-        if manejo_lote and not lote:
+        # (con FEFO el lote lo elige el sistema)
+        if manejo_lote and not lote and not asignar_fefo:
             self.add_error("lote", "El lote es obligatorio si activas manejo por lote.")
 
-        # Si manejo SERIE está activo, la serie se vuelve obligatoria
-        if manejo_serie and not serie:
+        # Si manejo SERIE está activo, la serie se vuelve obligatoria (una en
+        # `serie` o varias en `series`), con una unidad por serie
+        lista_series = self._lista_series(serie) if manejo_serie else []
+        cleaned_data["lista_series"] = lista_series
+        # Campo donde se informan los errores de serie (también los de la vista al guardar)
+        campo_series = "series" if self.cleaned_data.get("series") else "serie"
+        cleaned_data["campo_series"] = campo_series
+        if len(lista_series) == 1:
+            # Una sola serie escrita en `series` se guarda en el propio movimiento
+            cleaned_data["serie"] = lista_series[0]
+        if manejo_serie and not lista_series:
             self.add_error("serie", "La serie es obligatoria si activas manejo por serie.")
+        elif lista_series:
+            if len(set(lista_series)) != len(lista_series):
+                self.add_error(campo_series, "Hay números de serie repetidos.")
+            elif len(lista_series) > 1 and self.instance.pk:
+                self.add_error("series", "Al editar un movimiento se indica una sola serie.")
+            elif len(lista_series) > 1 and asignar_fefo:
+                self.add_error("series", "La asignación FEFO no se combina con varias series.")
+            elif cantidad and cantidad != len(lista_series):
+                self.add_error(
+                    "cantidad",
+                    f"La cantidad debe coincidir con los números de serie indicados ({len(lista_series)}).",
+                )
+            elif producto and not self.instance.pk:
+                self._validar_registro_series(campo_series, tipo, producto, bodega_origen, lista_series)
 
         # Si manejo VENCIMIENTO está activo y no hay fecha, error (refuerzo)
         if manejo_vencimiento and not fecha_vencimiento:
@@ -180,35 +284,245 @@ class MovimientoInventarioForm(forms.ModelForm):
             and bodega_origen
             and tipo in ["SALIDA", "TRANSFERENCIA"]
         ):
-            # Stock que HA ENTRADO a la bodega_origen
-            ingresos_qs = MovimientoInventario.objects.filter(
-                producto=producto,
-                bodega_destino=bodega_origen,
-                tipo__in=["INGRESO", "TRANSFERENCIA"],
-            )
+            # Saldo materializado de la bodega origen (una fila de stock_bodega)
+            stock_actual = stock_disponible(producto, bodega_origen)
 
-            # Stock que HA SALIDO de la bodega_origen
-            salidas_qs = MovimientoInventario.objects.filter(
-                producto=producto,
-                bodega_origen=bodega_origen,
-                tipo__in=["SALIDA", "TRANSFERENCIA"],
-            )
-
-            # Si estamos EDITANDO un movimiento, lo excluimos del cálculo
+            # Si estamos EDITANDO un movimiento, descontamos su efecto original
             if self.instance.pk:
-                ingresos_qs = ingresos_qs.exclude(pk=self.instance.pk)
-                salidas_qs = salidas_qs.exclude(pk=self.instance.pk)
+                for producto_id, bodega_id, delta in efectos_movimiento(self.instance):
+                    if producto_id == producto.pk and bodega_id == bodega_origen.pk:
+                        stock_actual -= delta
 
-            total_ingresos = ingresos_qs.aggregate(total=Sum("cantidad"))["total"] or 0
-            total_salidas = salidas_qs.aggregate(total=Sum("cantidad"))["total"] or 0
+            if cantidad > stock_actual:
+                self.add_error("cantidad", StockInsuficiente(stock_actual, cantidad))
 
-            stock_actual = total_ingresos - total_salidas
+        return cleaned_data
 
-            if cantidad > stock_actual:
-                self.add_error(
-                    "cantidad",
-                    f"No hay stock suficiente en la bodega origen. "
-                    f"Stock disponible: {stock_actual}, solicitado: {cantidad}.",
-                )
 
+class DocumentoMovimientoForm(forms.ModelForm):
+    """Cabecera de un documento de varias líneas."""
+
+    class Meta:
+        model = DocumentoMovimiento
+        fields = ["tipo", "doc_referencia", "proveedor", "bodega_origen", "bodega_destino", "motivo", "observaciones"]
+        widgets = {
+            "proveedor": SelectAutocompletar("proveedores", attrs={"class": "form-select"}),
+            "observaciones": forms.Textarea(attrs={"rows": 2, "maxlength": 300}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        tipo = cleaned_data.get("tipo")
+        bodega_origen = cleaned_data.get("bodega_origen")
+        bodega_destino = cleaned_data.get("bodega_destino")
+
+        # Mismas reglas por tipo que MovimientoInventarioForm
+        if tipo == "TRANSFERENCIA":
+            if not bodega_origen or not bodega_destino:
+                raise forms.ValidationError("Para una transferencia debes indicar bodega origen y destino.")
+            if bodega_origen == bodega_destino:
+                raise forms.ValidationError("La bodega origen y destino no pueden ser la misma.")
+        elif tipo == "INGRESO":
+            if not bodega_destino:
+                raise forms.ValidationError("Para un ingreso debes indicar la bodega destino.")
+        elif tipo in ["SALIDA", "DEVOLUCION"]:
+            if not bodega_origen:
+                raise forms.ValidationError(f"Para una {tipo.lower()} debes indicar la bodega origen.")
         return cleaned_data
+
+
+class LineaDocumentoForm(forms.Form):
+    """Una línea (producto y cantidad) de un documento."""
+
+    producto = forms.ModelChoiceField(
+        queryset=Producto.objects.only("sku", "nombre"),
+        widget=SelectAutocompletar("productos", attrs={"class": "form-select form-select-sm"}),
+    )
+    cantidad = forms.DecimalField(
+        min_value=1,
+        max_digits=12,
+        decimal_places=0,
+        error_messages={
+            "min_value": "La cantidad debe ser un número entero mayor a cero.",
+            "invalid": "La cantidad debe ser un número entero.",
+        },
+    )
+    costo_unitario = forms.DecimalField(required=False, min_value=0, max_digits=18, decimal_places=6)
+    lote = forms.CharField(required=False, min_length=3, max_length=30)
+    serie = forms.CharField(required=False, min_length=3, max_length=30)
+    fecha_vencimiento = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        serie = cleaned_data.get("serie")
+        cantidad = cleaned_data.get("cantidad")
+        if serie and cantidad and cantidad != 1:
+            self.add_error("cantidad", "Una línea con serie corresponde a una unidad.")
+        return cleaned_data
+
+
+class BaseLineasDocumentoFormSet(forms.BaseFormSet):
+    """
+    Líneas de un documento. Con la cabecera válida, el stock de la bodega
+    origen se valida para todas las líneas con una sola consulta, sumando
+    las cantidades de un mismo producto.
+    """
+
+    def __init__(self, *args, cabecera=None, **kwargs):
+        self.cabecera = cabecera
+        super().__init__(*args, **kwargs)
+
+    def lineas(self):
+        return [f.cleaned_data for f in self.forms if f.cleaned_data and not self._should_delete_form(f)]
+
+    def clean(self):
+        if any(self.errors) or self.cabecera is None or not self.cabecera.is_valid():
+            return
+        tipo = self.cabecera.cleaned_data["tipo"]
+        bodega_origen = self.cabecera.cleaned_data.get("bodega_origen")
+
+        series = [linea["serie"] for linea in self.lineas() if linea.get("serie")]
+        if len(series) != len(set(series)):
+            raise forms.ValidationError("Hay números de serie repetidos entre las líneas.")
+
+        if tipo not in ["SALIDA", "TRANSFERENCIA"] or not bodega_origen:
+            return
+        totales = {}
+        for linea in self.lineas():
+            producto_id = linea["producto"].pk
+            totales[producto_id] = totales.get(producto_id, 0) + linea["cantidad"]
+        disponibles = stock_disponible_productos(list(totales), bodega_origen)
+        for form in self.forms:
+            linea = form.cleaned_data
+            if not linea:
+                continue
+            producto_id = linea["producto"].pk
+            if totales[producto_id] > disponibles[producto_id]:
+                form.add_error("cantidad", StockInsuficiente(disponibles[producto_id], totales[producto_id]))
+
+
+LineasDocumentoFormSet = forms.formset_factory(
+    LineaDocumentoForm,
+    formset=BaseLineasDocumentoFormSet,
+    extra=3,
+    min_num=1,
+    validate_min=True,
+    max_num=200,
+    validate_max=True,
+)
+
+
+class FiltroMovimientosForm(forms.Form):
+    """Filtros del listado de movimientos (query params, todos opcionales)."""
+
+    q = forms.CharField(required=False, max_length=100)
+    tipo = forms.ChoiceField(
+        required=False,
+        choices=[("", "Todos los tipos")] + list(MovimientoInventario.TIPO_MOVIMIENTO),
+    )
+    producto = forms.IntegerField(required=False, min_value=1)
+    bodega = forms.ModelChoiceField(
+        required=False,
+        queryset=Bodega.objects.all(),
+        empty_label="Todas las bodegas",
+    )
+    usuario = forms.IntegerField(required=False, min_value=1)
+    documento = forms.IntegerField(required=False, min_value=1)
+    desde = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    hasta = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    size = forms.TypedChoiceField(
+        required=False,
+        coerce=int,
+        empty_value=TAMANO_PAGINA_DEFECTO,
+        choices=[(n, n) for n in TAMANOS_PAGINA],
+    )
+    cursor = forms.CharField(required=False)
+    antes = forms.CharField(required=False)
+
+    def filtros(self):
+        """Filtros válidos; Django deja fuera de cleaned_data los que no lo son."""
+        self.is_valid()
+        return self.cleaned_data
+
+
+class FiltroAuditoriaForm(forms.Form):
+    """Filtros de la búsqueda de eventos de auditoría (query params, todos opcionales)."""
+
+    usuario = forms.CharField(required=False, max_length=150, help_text="ID o nombre de usuario")
+    accion = forms.ChoiceField(
+        required=False,
+        choices=[("", "Todas las acciones")] + [(a, a) for a in ACCIONES_AUDITORIA],
+    )
+    entidad = forms.ChoiceField(
+        required=False,
+        choices=[("", "Todas las entidades")] + [(e, e.capitalize()) for e in ENTIDADES_AUDITORIA],
+    )
+    entidad_id = forms.CharField(required=False, max_length=64)
+    desde = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    hasta = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    size = forms.TypedChoiceField(
+        required=False,
+        coerce=int,
+        empty_value=TAMANO_PAGINA_DEFECTO,
+        choices=[(n, n) for n in TAMANOS_PAGINA],
+    )
+    cursor = forms.CharField(required=False)
+    antes = forms.CharField(required=False)
+
+    def clean_usuario(self):
+        return self.cleaned_data["usuario"].strip()
+
+    def filtros(self):
+        self.is_valid()
+        return self.cleaned_data
+
+
+class ImportarMovimientosForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo CSV o XLSX",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv,.xlsx"}),
+    )
+    parcial = forms.BooleanField(
+        required=False,
+        label="Importar las filas válidas aunque otras tengan errores",
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data["archivo"]
+        if not archivo.name.lower().endswith((".csv", ".xlsx")):
+            raise forms.ValidationError("El archivo debe ser .csv o .xlsx.")
+        return archivo
+
+
+class StockAFechaForm(forms.Form):
+    """Parámetros de la consulta de stock a una fecha."""
+
+    fecha = forms.DateField()
+    producto = forms.IntegerField(required=False, min_value=1)
+    bodega = forms.ModelChoiceField(required=False, queryset=Bodega.objects.all())
+
+
+class KardexForm(forms.Form):
+    """Parámetros del Kardex (query params)."""
+
+    producto = forms.ModelChoiceField(
+        queryset=Producto.objects.only("sku", "nombre"),
+        empty_label="Selecciona un producto",
+        widget=SelectAutocompletar("productos", attrs={"class": "form-select"}),
+    )
+    bodega = forms.ModelChoiceField(
+        required=False,
+        queryset=Bodega.objects.all(),
+        empty_label="Todas las bodegas",
+    )
+    desde = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    hasta = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    size = forms.TypedChoiceField(
+        required=False,
+        coerce=int,
+        empty_value=TAMANO_PAGINA_KARDEX,
+        choices=[(n, n) for n in TAMANOS_PAGINA_KARDEX],
+    )
+    cursor = forms.CharField(required=False)
+    antes = forms.CharField(required=False)
@@ -0,0 +1,334 @@
+"""
+Importación masiva de movimientos desde CSV o XLSX.
+
+Columnas esperadas (encabezado en la primera fila, sin importar mayúsculas):
+tipo, sku, cantidad, bodega_origen, bodega_destino, proveedor_rut, lote,
+serie, fecha_vencimiento, doc_referencia, motivo, observaciones,
+costo_unitario (solo ingresos; si falta se usa el costo del proveedor).
+Las bodegas se indican por código y el proveedor por RUT/NIF.
+"""
+import csv
+import io
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+
+from catalogo.models import Producto
+from proveedores.models import Proveedor
+
+from .models import Bodega, MovimientoInventario, NumeroSerie, StockBodega, StockLote
+from .stock import (
+    TIPOS_SALIDA, LoteInsuficiente, SerieInvalida, StockInsuficiente, efecto_serie, efectos_lote,
+    efectos_movimiento, guardar_movimientos_lote,
+)
+
+
+COLUMNAS = [
+    "tipo", "sku", "cantidad", "bodega_origen", "bodega_destino", "proveedor_rut",
+    "lote", "serie", "fecha_vencimiento", "doc_referencia", "motivo", "observaciones",
+    "costo_unitario",
+]
+TIPOS_VALIDOS = dict(MovimientoInventario.TIPO_MOVIMIENTO)
+
+
+class ErrorImportacion(Exception):
+    """El archivo no se puede leer (formato o encabezados)."""
+
+
+def leer_filas(archivo, nombre):
+    """Devuelve la lista de filas como dicts con las claves de COLUMNAS."""
+    extension = os.path.splitext(nombre)[1].lower()
+    if extension == ".xlsx":
+        from openpyxl import load_workbook
+
+        wb = load_workbook(archivo, read_only=True, data_only=True)
+        filas = wb.active.iter_rows(values_only=True)
+    elif extension == ".csv":
+        contenido = archivo.read()
+        if isinstance(contenido, bytes):
+            contenido = contenido.decode("utf-8-sig")
+        filas = csv.reader(io.StringIO(contenido))
+    else:
+        raise ErrorImportacion("El archivo debe ser .csv o .xlsx.")
+
+    filas = iter(filas)
+    try:
+        encabezado = [str(c or "").strip().lower() for c in next(filas)]
+    except StopIteration:
+        raise ErrorImportacion("El archivo está vacío.")
+    faltantes = {"tipo", "sku", "cantidad"} - set(encabezado)
+    if faltantes:
+        raise ErrorImportacion(f"Faltan columnas obligatorias: {', '.join(sorted(faltantes))}.")
+
+    resultado = []
+    for valores in filas:
+        if not valores or all(v in (None, "") for v in valores):
+            continue
+        fila = dict(zip(encabezado, valores))
+        resultado.append({c: fila.get(c) for c in COLUMNAS})
+    return resultado
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _texto_limitado(fila, campo):
+    """
+    Texto de la celda o None, o ValueError si no cabe en la columna del
+    modelo (en MySQL estricto un valor largo abortaría el archivo completo).
+    """
+    valor = _texto(fila[campo])
+    largo = MovimientoInventario._meta.get_field(campo).max_length
+    if len(valor) > largo:
+        raise ValueError(f"El campo {campo} no puede superar los {largo} caracteres.")
+    return valor or None
+
+
+def _fecha(valor):
+    if valor in (None, ""):
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    for formato in ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(_texto(valor), formato).date()
+        except ValueError:
+            continue
+    raise ValueError("Fecha de vencimiento inválida (usa AAAA-MM-DD o DD-MM-AAAA).")
+
+
+def importar_movimientos(filas, usuario, parcial=False):
+    """
+    Valida e inserta las filas. Devuelve (creados, errores) donde errores es
+    una lista de (numero_fila, mensaje); la fila 2 es la primera de datos.
+
+    Si parcial es False y hay cualquier error no se inserta nada; si es True
+    se insertan las filas válidas y se informan las demás.
+    """
+    # --- Una consulta por tipo de entidad ---
+    skus = {_texto(f["sku"]) for f in filas}
+    codigos = {_texto(f[c]) for f in filas for c in ("bodega_origen", "bodega_destino")} - {""}
+    ruts = {_texto(f["proveedor_rut"]) for f in filas} - {""}
+
+    productos = {p.sku: p for p in Producto.objects.filter(sku__in=skus)}
+    bodegas = {b.codigo: b for b in Bodega.objects.filter(codigo__in=codigos)}
+    proveedores = {p.rut_nif: p for p in Proveedor.objects.filter(rut_nif__in=ruts)}
+
+    errores = []
+    candidatos = []
+    for numero, fila in enumerate(filas, start=2):
+        try:
+            candidatos.append((numero, _construir(fila, usuario, productos, bodegas, proveedores)))
+        except ValueError as e:
+            errores.append((numero, str(e)))
+
+    # --- Stock, lotes y series: una consulta por tabla para todo el archivo ---
+    saldos = _saldos_stock(candidatos)
+    saldos_lote = _saldos_lotes(candidatos)
+    series = _estado_series(candidatos)
+
+    # Se recorren en el orden del archivo: un ingreso puede abastecer a una
+    # salida posterior del mismo archivo. Una fila rechazada no cambia los
+    # saldos simulados.
+    validos = []
+    for numero, movimiento in candidatos:
+        cambios = efectos_movimiento(movimiento)
+        cambios_lote = efectos_lote(movimiento)
+        try:
+            _validar_saldos([((p, b), delta) for p, b, delta in cambios], saldos, StockInsuficiente)
+            _validar_saldos(
+                [((p, b, lote), delta) for p, b, lote, delta, _ in cambios_lote], saldos_lote,
+                lambda disponible, solicitado: LoteInsuficiente(movimiento.lote, disponible, solicitado),
+            )
+            serie = _validar_serie(movimiento, series)
+        except ValidationError as e:
+            errores.append((numero, e.messages[0]))
+            continue
+        for producto_id, bodega_id, delta in cambios:
+            clave = (producto_id, bodega_id)
+            saldos[clave] = saldos.get(clave, Decimal("0")) + delta
+        for producto_id, bodega_id, lote, delta, _ in cambios_lote:
+            clave = (producto_id, bodega_id, lote)
+            saldos_lote[clave] = saldos_lote.get(clave, Decimal("0")) + delta
+        if serie:
+            series[(movimiento.producto_id, movimiento.serie)] = serie
+        validos.append(movimiento)
+
+    errores.sort()
+    if errores and not parcial:
+        return [], errores
+    if not validos:
+        return [], errores
+
+    try:
+        creados = guardar_movimientos_lote(validos)
+    except (StockInsuficiente, SerieInvalida) as e:
+        # Otro operador movió stock, un lote o una serie mientras se validaba
+        # el archivo (lo demás ya se rechazó por fila)
+        return [], errores + [(None, e.messages[0])]
+    return creados, errores
+
+
+def _saldos_stock(candidatos):
+    """{(producto_id, bodega_id): cantidad} de las bodegas origen del archivo."""
+    pares = {(m.producto_id, m.bodega_origen_id) for _, m in candidatos if m.bodega_origen_id}
+    if not pares:
+        return {}
+    filas = StockBodega.objects.filter(
+        producto_id__in={p for p, _ in pares}, bodega_id__in={b for _, b in pares}
+    ).values_list("producto_id", "bodega_id", "cantidad")
+    return {(producto_id, bodega_id): cantidad for producto_id, bodega_id, cantidad in filas}
+
+
+def _saldos_lotes(candidatos):
+    """{(producto_id, bodega_id, lote): cantidad} de los lotes que salen de alguna bodega."""
+    claves = {
+        (m.producto_id, m.bodega_origen_id, m.lote)
+        for _, m in candidatos if m.bodega_origen_id and m.lote
+    }
+    if not claves:
+        return {}
+    filas = StockLote.objects.filter(
+        producto_id__in={p for p, _, _ in claves},
+        bodega_id__in={b for _, b, _ in claves},
+        lote__in={lote for _, _, lote in claves},
+    ).values_list("producto_id", "bodega_id", "lote", "cantidad")
+    return {(producto_id, bodega_id, lote): cantidad for producto_id, bodega_id, lote, cantidad in filas}
+
+
+def _estado_series(candidatos):
+    """{(producto_id, serie): (bodega_id, estado, fecha_ultimo)} según numero_serie."""
+    claves = {(m.producto_id, m.serie) for _, m in candidatos if efecto_serie(m)}
+    if not claves:
+        return {}
+    filas = NumeroSerie.objects.filter(
+        producto_id__in={p for p, _ in claves}, serie__in={s for _, s in claves}
+    ).values_list("producto_id", "serie", "bodega_id", "estado", "fecha_ultimo")
+    return {
+        (producto_id, serie): (bodega_id, estado, fecha)
+        for producto_id, serie, bodega_id, estado, fecha in filas
+    }
+
+
+def _validar_saldos(cambios, saldos, error):
+    """Lanza error(disponible, solicitado) si algún descuento (clave, delta) deja un saldo negativo."""
+    for clave, delta in cambios:
+        disponible = saldos.get(clave, Decimal("0"))
+        if delta < 0 and disponible + delta < 0:
+            raise error(disponible, -delta)
+
+
+def _validar_serie(movimiento, series):
+    """
+    Mismas reglas que stock._aplicar_series sobre el estado simulado del
+    archivo. Devuelve el estado nuevo de la serie, o None si no cambia.
+    """
+    efecto = efecto_serie(movimiento)
+    if not efecto:
+        return None
+    bodega_id, estado, fecha_ultimo = series.get(
+        (movimiento.producto_id, movimiento.serie), (None, NumeroSerie.FUERA, None)
+    )
+    if fecha_ultimo and movimiento.fecha and movimiento.fecha < fecha_ultimo:
+        # Movimiento retroactivo: no cambia la ubicación actual de la serie
+        return None
+    if movimiento.tipo in TIPOS_SALIDA:
+        if estado != NumeroSerie.EN_BODEGA or bodega_id != movimiento.bodega_origen_id:
+            raise SerieInvalida(movimiento.serie, f"La serie {movimiento.serie} no está en la bodega origen.")
+    elif estado == NumeroSerie.EN_BODEGA:
+        raise SerieInvalida(movimiento.serie, f"La serie {movimiento.serie} ya está ingresada en inventario.")
+    return (*efecto, movimiento.fecha)
+
+
+def _construir(fila, usuario, productos, bodegas, proveedores):
+    """Arma un MovimientoInventario sin guardar, o lanza ValueError con el motivo."""
+    tipo = _texto(fila["tipo"]).upper()
+    if tipo not in TIPOS_VALIDOS:
+        raise ValueError(f"Tipo '{tipo}' inválido.")
+
+    sku = _texto(fila["sku"])
+    producto = productos.get(sku)
+    if producto is None:
+        raise ValueError(f"No existe un producto con SKU '{sku}'.")
+
+    try:
+        cantidad = Decimal(_texto(fila["cantidad"]))
+    except InvalidOperation:
+        raise ValueError("La cantidad debe ser un número entero.")
+    if not cantidad.is_finite():
+        # NaN / Infinity: Decimal los acepta pero no se pueden comparar ni guardar
+        raise ValueError("La cantidad debe ser un número entero.")
+    if cantidad < 1 or cantidad != cantidad.to_integral_value():
+        raise ValueError("La cantidad debe ser un número entero mayor a cero.")
+
+    origen = destino = proveedor = None
+    codigo_origen = _texto(fila["bodega_origen"])
+    codigo_destino = _texto(fila["bodega_destino"])
+    if codigo_origen:
+        origen = bodegas.get(codigo_origen)
+        if origen is None:
+            raise ValueError(f"No existe la bodega origen '{codigo_origen}'.")
+    if codigo_destino:
+        destino = bodegas.get(codigo_destino)
+        if destino is None:
+            raise ValueError(f"No existe la bodega destino '{codigo_destino}'.")
+    rut = _texto(fila["proveedor_rut"])
+    if rut:
+        proveedor = proveedores.get(rut)
+        if proveedor is None:
+            raise ValueError(f"No existe un proveedor con RUT/NIF '{rut}'.")
+
+    # Mismas reglas por tipo que MovimientoInventarioForm
+    if tipo == "TRANSFERENCIA":
+        if not origen or not destino:
+            raise ValueError("Para una transferencia debes indicar bodega origen y destino.")
+        if origen == destino:
+            raise ValueError("La bodega origen y destino no pueden ser la misma.")
+    elif tipo == "INGRESO" and not destino:
+        raise ValueError("Para un ingreso debes indicar la bodega destino.")
+    elif tipo in ["SALIDA", "DEVOLUCION"] and not origen:
+        raise ValueError(f"Para una {tipo.lower()} debes indicar la bodega origen.")
+
+    costo_unitario = None
+    if tipo == "INGRESO" and _texto(fila["costo_unitario"]):
+        try:
+            costo_unitario = Decimal(_texto(fila["costo_unitario"]))
+        except InvalidOperation:
+            raise ValueError("El costo unitario debe ser un número.")
+        if not costo_unitario.is_finite():
+            raise ValueError("El costo unitario debe ser un número.")
+        if costo_unitario < 0:
+            raise ValueError("El costo unitario no puede ser negativo.")
+
+    lote = _texto_limitado(fila, "lote")
+    serie = _texto_limitado(fila, "serie")
+    fecha_vencimiento = _fecha(fila["fecha_vencimiento"])
+
+    return MovimientoInventario(
+        tipo=tipo,
+        producto=producto,
+        proveedor=proveedor,
+        bodega_origen=origen,
+        bodega_destino=destino,
+        cantidad=cantidad,
+        costo_unitario=costo_unitario,
+        manejo_lote=bool(lote),
+        manejo_serie=bool(serie),
+        manejo_vencimiento=bool(fecha_vencimiento),
+        lote=lote,
+        serie=serie,
+        fecha_vencimiento=fecha_vencimiento,
+        doc_referencia=_texto_limitado(fila, "doc_referencia"),
+        motivo=_texto_limitado(fila, "motivo"),
+        observaciones=_texto(fila["observaciones"]) or None,
+        usuario=usuario,
+    )
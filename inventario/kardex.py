@@ -0,0 +1,187 @@
+"""
+Kardex por producto (opcionalmente por bodega y rango de fechas).
+
+Cada movimiento lleva su cantidad con signo y el saldo acumulado, calculado
+en la base de datos con SUM(...) OVER (ORDER BY fecha, id). Las páginas van
+por keyset sobre (fecha, id) y el cursor lleva el saldo en el borde de la
+página, así que una página profunda solo suma sus propias filas.
+
+Si el rango llega a movimientos archivados se consultan ambas tablas con
+el mismo keyset y las filas se mezclan; ahí el saldo acumulado de la página
+se suma en Python (son a lo más `tamano` filas).
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When, Window
+from django.db.models.expressions import RowRange
+
+from .cierres import saldos_a_fecha
+from .consultas import inicio_dia, mezclar, modelos_movimiento, movimientos_base
+from .models import MovimientoInventario
+from .stock import TIPOS_ENTRADA, TIPOS_SALIDA
+
+
+SALT_CURSOR = "inventario.kardex"
+ORDEN = ("fecha", "id")
+
+
+def _delta(bodega=None):
+    """
+    Cantidad con signo. Con bodega: entra si llega a ella y sale si sale de
+    ella. Sin bodega (todas): las transferencias quedan en cero.
+    """
+    decimal = DecimalField(max_digits=18, decimal_places=3)
+    if bodega is not None:
+        entra = Q(tipo__in=TIPOS_ENTRADA, bodega_destino=bodega)
+        sale = Q(tipo__in=TIPOS_SALIDA, bodega_origen=bodega)
+    else:
+        entra = Q(tipo__in=TIPOS_ENTRADA, bodega_destino__isnull=False)
+        sale = Q(tipo__in=TIPOS_SALIDA, bodega_origen__isnull=False)
+    return (
+        Case(When(entra, then=F("cantidad")), default=Value(Decimal("0")), output_field=decimal)
+        - Case(When(sale, then=F("cantidad")), default=Value(Decimal("0")), output_field=decimal)
+    )
+
+
+def movimientos_kardex(producto, bodega=None, desde=None, hasta=None, modelo=MovimientoInventario):
+    qs = movimientos_base(modelo).order_by().filter(producto=producto)
+    if bodega is not None:
+        qs = qs.filter(Q(bodega_origen=bodega) | Q(bodega_destino=bodega))
+    if desde:
+        qs = qs.filter(fecha__gte=inicio_dia(desde))
+    if hasta:
+        qs = qs.filter(fecha__lt=inicio_dia(hasta + timedelta(days=1)))
+    return qs.annotate(delta=_delta(bodega))
+
+
+def saldo_inicial(producto, bodega=None, desde=None):
+    """Saldo al comenzar el día `desde` (desde el último cierre de stock)."""
+    if not desde:
+        return Decimal("0")
+    saldos = saldos_a_fecha(desde - timedelta(days=1), producto=producto, bodega=bodega)
+    return sum(saldos.values(), Decimal("0"))
+
+
+# ---------- Cursores: (fecha, id, saldo en el borde), firmados ----------
+
+def codificar_cursor(movimiento, saldo):
+    return signing.dumps([movimiento.fecha.isoformat(), movimiento.pk, str(saldo)], salt=SALT_CURSOR)
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, id, saldo) o None si el cursor es inválido."""
+    if not cursor:
+        return None
+    try:
+        fecha, pk, saldo = signing.loads(cursor, salt=SALT_CURSOR)
+        return datetime.fromisoformat(fecha), int(pk), Decimal(saldo)
+    except (signing.BadSignature, ValueError, TypeError, ArithmeticError):
+        return None
+
+
+def _despues_de(fecha, pk):
+    return Q(fecha__gt=fecha) | Q(fecha=fecha, pk__gt=pk)
+
+
+def _antes_de(fecha, pk):
+    return Q(fecha__lt=fecha) | Q(fecha=fecha, pk__lt=pk)
+
+
+def _con_saldo(fuentes, apertura):
+    """Filas del rango con saldo = apertura + suma acumulada (ventana en SQL)."""
+    if len(fuentes) > 1:
+        filas = list(mezclar([list(qs.order_by(*ORDEN)) for qs in fuentes], descendente=False))
+        acumulado = Decimal("0")
+        for fila in filas:
+            acumulado += fila.delta
+            fila.saldo = apertura + acumulado
+        return filas
+
+    filas = list(
+        fuentes[0].annotate(
+            acumulado=Window(
+                Sum("delta"),
+                order_by=[F("fecha").asc(), F("id").asc()],
+                frame=RowRange(start=None, end=0),
+            )
+        ).order_by(*ORDEN)
+    )
+    for fila in filas:
+        fila.saldo = apertura + fila.acumulado
+    return filas
+
+
+def _claves(fuentes, orden, limite):
+    """Primeras `limite` claves (fecha, id) del conjunto de fuentes en el orden pedido."""
+    claves = []
+    for qs in fuentes:
+        claves.extend(qs.order_by(*orden).values_list(*ORDEN)[:limite])
+    return sorted(claves, reverse=orden[0].startswith("-"))[:limite]
+
+
+def pagina_kardex(producto, bodega=None, desde=None, hasta=None, tamano=20, despues=None, antes=None):
+    """
+    Devuelve un dict con movimientos (cada uno con .delta y .saldo),
+    saldo_inicial (antes de la primera fila de la página), saldo_final,
+    y los cursores siguiente / anterior.
+    """
+    fuentes = [
+        movimientos_kardex(producto, bodega, desde, hasta, modelo)
+        for modelo in modelos_movimiento(desde)
+    ]
+    despues = decodificar_cursor(despues)
+    antes = decodificar_cursor(antes) if not despues else None
+
+    if antes:
+        fecha, pk, saldo_borde = antes
+        claves = _claves([qs.filter(_antes_de(fecha, pk)) for qs in fuentes], ("-fecha", "-id"), tamano + 1)
+        hay_mas = len(claves) > tamano
+        claves = claves[:tamano]
+        if not claves:
+            return _vacia(saldo_borde)
+        primera = claves[-1]
+        rango = [qs.filter(~_antes_de(*primera), _antes_de(fecha, pk)) for qs in fuentes]
+        total = sum(
+            (qs.aggregate(total=Sum("delta"))["total"] or Decimal("0") for qs in rango), Decimal("0")
+        )
+        apertura = saldo_borde - total
+        filas = _con_saldo(rango, apertura)
+        return {
+            "movimientos": filas,
+            "saldo_inicial": apertura,
+            "saldo_final": saldo_borde,
+            "siguiente": codificar_cursor(filas[-1], saldo_borde),
+            "anterior": codificar_cursor(filas[0], apertura) if hay_mas else None,
+        }
+
+    if despues:
+        fecha, pk, apertura = despues
+        rango = [qs.filter(_despues_de(fecha, pk)) for qs in fuentes]
+    else:
+        apertura = saldo_inicial(producto, bodega, desde)
+        rango = fuentes
+
+    claves = _claves(rango, ORDEN, tamano + 1)
+    hay_mas = len(claves) > tamano
+    claves = claves[:tamano]
+    if not claves:
+        return _vacia(apertura)
+    ultima = claves[-1]
+    filas = _con_saldo([qs.filter(~_despues_de(*ultima)) for qs in rango], apertura)
+    saldo_final = filas[-1].saldo
+    return {
+        "movimientos": filas,
+        "saldo_inicial": apertura,
+        "saldo_final": saldo_final,
+        "siguiente": codificar_cursor(filas[-1], saldo_final) if hay_mas else None,
+        "anterior": codificar_cursor(filas[0], apertura) if despues else None,
+    }
+
+
+def _vacia(saldo):
+    return {
+        "movimientos": [], "saldo_inicial": saldo, "saldo_final": saldo,
+        "siguiente": None, "anterior": None,
+    }
@@ -0,0 +1,44 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.archivo import ARCHIVO_DIAS, TAMANO_LOTE, ArchivoInvalido, archivar_movimientos, cierre_archivable
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a la tabla de archivo los movimientos hasta el último cierre de "
+        "stock con más de INVENTARIO_ARCHIVO_DIAS días (o hasta --hasta)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias", type=int, default=ARCHIVO_DIAS,
+            help=f"Antigüedad mínima del cierre a usar como corte (por defecto {ARCHIVO_DIAS}).",
+        )
+        parser.add_argument(
+            "--hasta", type=date.fromisoformat,
+            help="Día con cierre hasta el que archivar (AAAA-MM-DD). Ignora --dias.",
+        )
+        parser.add_argument(
+            "--lote", type=int, default=TAMANO_LOTE,
+            help=f"Movimientos por transacción (por defecto {TAMANO_LOTE}).",
+        )
+
+    def handle(self, *args, **options):
+        hasta = options["hasta"] or cierre_archivable(options["dias"])
+        if hasta is None:
+            raise CommandError(
+                f"No hay cierres de stock con más de {options['dias']} días; nada que archivar."
+            )
+
+        def progreso(total):
+            self.stdout.write(f"  {total} movimientos archivados...")
+
+        try:
+            total = archivar_movimientos(hasta, options["lote"], progreso=progreso)
+        except ArchivoInvalido as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Archivados {total} movimientos hasta el {hasta:%d-%m-%Y}."
+        ))
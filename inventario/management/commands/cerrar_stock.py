@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventario.cierres import CierreInvalido, cerrar_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda el cierre de stock por producto/bodega de un día terminado. "
+        "Programarlo a diario (por defecto cierra ayer) o con --mensual."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fecha", type=date.fromisoformat,
+            help="Día a cerrar (AAAA-MM-DD). Por defecto, ayer.",
+        )
+        parser.add_argument(
+            "--mensual", action="store_true",
+            help="Cierra el último día del mes anterior.",
+        )
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        if options["fecha"]:
+            fecha = options["fecha"]
+        elif options["mensual"]:
+            fecha = hoy.replace(day=1) - timedelta(days=1)
+        else:
+            fecha = hoy - timedelta(days=1)
+
+        try:
+            total = cerrar_stock(fecha)
+        except CierreInvalido as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Cierre {fecha:%d-%m-%Y}: {total} combinaciones producto/bodega con stock."
+        ))
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from inventario.consultas import (
+    aplicar_cursor, decodificar_cursor, filtrar_movimientos, movimientos_base, paginar_keyset,
+)
+from inventario.models import Bodega, MovimientoInventario, StockBodega
+from inventario.stock import movimientos_entrada, movimientos_salida
+
+
+class Command(BaseCommand):
+    help = "Muestra el EXPLAIN de las consultas más frecuentes sobre movimiento_inventario."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--producto", type=int, help="ID de producto de ejemplo (por defecto, el del último movimiento).")
+        parser.add_argument("--bodega", type=int, help="ID de bodega de ejemplo (por defecto, la del último movimiento).")
+        parser.add_argument("--sql", action="store_true", help="Imprime también el SQL de cada consulta.")
+        parser.add_argument(
+            "--analyze", action="store_true",
+            help="Usa EXPLAIN ANALYZE (ejecuta la consulta; MySQL 8.0.18+ / PostgreSQL).",
+        )
+
+    def _ejemplo(self, options):
+        producto_id = options["producto"]
+        bodega_id = options["bodega"]
+        if producto_id and bodega_id:
+            return producto_id, bodega_id
+        ultimo = MovimientoInventario.objects.order_by("-fecha", "-id").first()
+        if ultimo is None:
+            raise CommandError("No hay movimientos; indica --producto y --bodega.")
+        bodega_id = bodega_id or ultimo.bodega_destino_id or ultimo.bodega_origen_id
+        return producto_id or ultimo.producto_id, bodega_id
+
+    def handle(self, *args, **options):
+        producto_id, bodega_id = self._ejemplo(options)
+        bodega = Bodega.objects.filter(pk=bodega_id).first()
+        hace_30 = timezone.localdate() - timedelta(days=30)
+
+        _, cursor, _ = paginar_keyset(movimientos_base(), 10)
+
+        consultas = [
+            ("Stock: entradas a bodega", movimientos_entrada(producto_id, bodega_id).values("producto").annotate(total=Sum("cantidad"))),
+            ("Stock: salidas de bodega", movimientos_salida(producto_id, bodega_id).values("producto").annotate(total=Sum("cantidad"))),
+            ("Stock materializado (stock_bodega)", StockBodega.objects.filter(producto_id=producto_id, bodega_id=bodega_id)),
+            ("Listado: primera página", aplicar_cursor(movimientos_base())[:11]),
+            ("Listado: filtro por bodega y últimos 30 días", filtrar_movimientos(
+                movimientos_base(), {"bodega": bodega, "desde": hace_30}
+            ).order_by("-fecha", "-id")[:11]),
+            ("Listado: lotes de un producto", MovimientoInventario.objects.order_by().filter(
+                producto_id=producto_id, lote__isnull=False
+            ).values("lote").distinct()),
+            ("Vencimientos próximos", MovimientoInventario.objects.order_by("fecha_vencimiento").filter(
+                fecha_vencimiento__gte=timezone.localdate()
+            )[:50]),
+        ]
+        if cursor:
+            consultas.append(("Listado: página siguiente (keyset)", aplicar_cursor(
+                movimientos_base(), despues=decodificar_cursor(cursor)
+            )[:11]))
+
+        self.stdout.write(f"Base de datos: {connection.vendor} | producto={producto_id} bodega={bodega_id}\n")
+        for titulo, qs in consultas:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {titulo}"))
+            if options["sql"]:
+                self.stdout.write(str(qs.query))
+            try:
+                plan = qs.explain(analyze=True) if options["analyze"] else qs.explain()
+            except Exception as e:
+                plan = f"(no se pudo obtener el plan: {e})"
+            self.stdout.write(plan + "\n")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts_lilis.models import Usuario
+from inventario.importacion import ErrorImportacion, importar_movimientos, leer_filas
+
+
+class Command(BaseCommand):
+    help = "Importa movimientos de inventario desde un archivo CSV o XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta al archivo .csv o .xlsx.")
+        parser.add_argument("--usuario", required=True, help="Username que queda como autor de los movimientos.")
+        parser.add_argument(
+            "--parcial", action="store_true",
+            help="Importa las filas válidas aunque otras tengan errores.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            usuario = Usuario.objects.get(username=options["usuario"])
+        except Usuario.DoesNotExist:
+            raise CommandError(f"No existe el usuario '{options['usuario']}'.")
+
+        try:
+            with open(options["archivo"], "rb") as archivo:
+                filas = leer_filas(archivo, options["archivo"])
+        except (OSError, ErrorImportacion) as e:
+            raise CommandError(str(e))
+
+        creados, errores = importar_movimientos(filas, usuario, parcial=options["parcial"])
+
+        for fila, mensaje in errores:
+            self.stderr.write(f"Fila {fila if fila else '-'}: {mensaje}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Filas leídas: {len(filas)} | Creados: {len(creados)} | Con error: {len(errores)}"
+        ))
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventario.exportaciones import RETENER_DIAS, limpiar_exportaciones, procesar, tomar_siguiente
+
+
+# Segundos entre limpiezas de exportaciones viejas mientras el worker espera
+INTERVALO_LIMPIEZA = 60 * 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de exportaciones en segundo plano (cola en la tabla trabajo_exportacion). "
+        "También descarta trabajos colgados y borra exportaciones de más de "
+        "EXPORTACION_RETENER_DIAS días."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--una-vez", action="store_true",
+            help="Procesa los trabajos pendientes y termina, en vez de quedar escuchando.",
+        )
+        parser.add_argument(
+            "--intervalo", type=float, default=5,
+            help="Segundos de espera cuando la cola está vacía (por defecto 5).",
+        )
+        parser.add_argument(
+            "--retener-dias", type=int, default=RETENER_DIAS,
+            help=f"Días que se conservan las exportaciones generadas (por defecto {RETENER_DIAS}).",
+        )
+
+    def limpiar(self, dias):
+        trabajos, archivos = limpiar_exportaciones(dias)
+        if trabajos or archivos:
+            self.stdout.write(f"Limpieza: {trabajos} trabajos y {archivos} archivos viejos borrados.")
+
+    def handle(self, *args, **options):
+        ultima_limpieza = None
+        while True:
+            trabajo = tomar_siguiente()
+            if trabajo is None:
+                ahora = time.monotonic()
+                if ultima_limpieza is None or ahora - ultima_limpieza >= INTERVALO_LIMPIEZA:
+                    self.limpiar(options["retener_dias"])
+                    ultima_limpieza = ahora
+                if options["una_vez"]:
+                    return
+                time.sleep(options["intervalo"])
+                continue
+
+            self.stdout.write(f"Procesando exportación #{trabajo.pk} ({trabajo.tipo}.{trabajo.formato})...")
+            try:
+                procesar(trabajo)
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f"Exportación #{trabajo.pk} falló: {e}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Exportación #{trabajo.pk} lista: {trabajo.filas_procesadas} filas."
+                ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventario.stock import recalcular_stock
+
+
+class Command(BaseCommand):
+    help = "Reconstruye la tabla stock_bodega a partir del historial de movimientos."
+
+    def handle(self, *args, **options):
+        total = recalcular_stock()
+        self.stdout.write(self.style.SUCCESS(f"Stock recalculado: {total} combinaciones producto/bodega."))
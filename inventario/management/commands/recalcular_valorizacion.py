@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventario.valorizacion import CAPAS_FIFO, reconstruir_valorizacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye la valorización de inventario (costo promedio por bodega y, "
+        "si INVENTARIO_CAPAS_FIFO está activo, las capas FIFO) desde el historial."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = reconstruir_valorizacion()
+        capas = " y capas FIFO" if CAPAS_FIFO else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"Valorización{capas} recalculada: {total} combinaciones producto/bodega."
+        ))
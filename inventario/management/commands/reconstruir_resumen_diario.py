@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from inventario.resumenes import reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el resumen diario de movimientos (día, producto, bodega, tipo) "
+        "desde el historial vigente y archivado."
+    )
+
+    def handle(self, *args, **options):
+        total = reconstruir_resumen()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resumen diario reconstruido: {total} filas día/producto/bodega/tipo."
+        ))
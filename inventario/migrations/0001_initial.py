@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+        ('proveedores', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Bodega',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=10, unique=True, verbose_name='Código Bodega')),
+                ('nombre', models.CharField(max_length=100, verbose_name='Nombre Bodega')),
+                ('descripcion', models.TextField(blank=True, null=True, verbose_name='Descripción')),
+            ],
+            options={
+                'verbose_name': 'Bodega',
+                'verbose_name_plural': 'Bodegas',
+                'db_table': 'bodega',
+                'ordering': ['codigo'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('INGRESO', 'Ingreso'), ('SALIDA', 'Salida'), ('AJUSTE', 'Ajuste'), ('DEVOLUCION', 'Devolución'), ('TRANSFERENCIA', 'Transferencia')], max_length=15, verbose_name='Tipo de movimiento')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('manejo_lote', models.BooleanField(default=False)),
+                ('manejo_serie', models.BooleanField(default=False)),
+                ('manejo_vencimiento', models.BooleanField(default=False)),
+                ('cantidad', models.DecimalField(decimal_places=3, max_digits=18, verbose_name='Cantidad')),
+                ('lote', models.CharField(blank=True, max_length=50, null=True, verbose_name='Lote')),
+                ('serie', models.CharField(blank=True, max_length=50, null=True, verbose_name='Serie')),
+                ('fecha_vencimiento', models.DateField(blank=True, null=True, verbose_name='Fecha de vencimiento')),
+                ('observaciones', models.TextField(blank=True, null=True, verbose_name='Observaciones')),
+                ('doc_referencia', models.CharField(blank=True, max_length=100, null=True, verbose_name='Documento de referencia')),
+                ('motivo', models.CharField(blank=True, max_length=200, null=True, verbose_name='Motivo (ajustes / devoluciones)')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('bodega_destino', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_ingreso', to='inventario.bodega', verbose_name='Bodega destino')),
+                ('bodega_origen', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_salida', to='inventario.bodega', verbose_name='Bodega origen')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='catalogo.producto', verbose_name='Producto')),
+                ('proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='proveedores.proveedor', verbose_name='Proveedor')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_registrados', to=settings.AUTH_USER_MODEL, verbose_name='Registrado por')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Inventario',
+                'verbose_name_plural': 'Movimientos de Inventario',
+                'db_table': 'movimiento_inventario',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
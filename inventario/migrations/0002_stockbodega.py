@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def poblar_stock(apps, schema_editor):
+    db = schema_editor.connection.alias
+    MovimientoInventario = apps.get_model('inventario', 'MovimientoInventario')
+    StockBodega = apps.get_model('inventario', 'StockBodega')
+    saldos = {}
+    base = MovimientoInventario.objects.using(db).order_by()
+    entradas = (
+        base.filter(tipo__in=['INGRESO', 'TRANSFERENCIA'], bodega_destino__isnull=False)
+        .values('producto_id', 'bodega_destino_id')
+        .annotate(total=Sum('cantidad'))
+    )
+    for fila in entradas:
+        clave = (fila['producto_id'], fila['bodega_destino_id'])
+        saldos[clave] = saldos.get(clave, 0) + fila['total']
+    salidas = (
+        base.filter(tipo__in=['SALIDA', 'TRANSFERENCIA'], bodega_origen__isnull=False)
+        .values('producto_id', 'bodega_origen_id')
+        .annotate(total=Sum('cantidad'))
+    )
+    for fila in salidas:
+        clave = (fila['producto_id'], fila['bodega_origen_id'])
+        saldos[clave] = saldos.get(clave, 0) - fila['total']
+    StockBodega.objects.using(db).bulk_create([
+        StockBodega(producto_id=producto_id, bodega_id=bodega_id, cantidad=cantidad)
+        for (producto_id, bodega_id), cantidad in saldos.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+        ('inventario', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBodega',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=3, default=0, max_digits=18, verbose_name='Cantidad disponible')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_productos', to='inventario.bodega', verbose_name='Bodega')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_bodegas', to='catalogo.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Stock por Bodega',
+                'verbose_name_plural': 'Stock por Bodega',
+                'db_table': 'stock_bodega',
+                'unique_together': {('producto', 'bodega')},
+            },
+        ),
+        migrations.RunPython(poblar_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:37
+
+import django.db.models.deletion
+import inventario.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_stockbodega'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoExportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=30, verbose_name='Tipo de exportación')),
+                ('formato', models.CharField(max_length=10, verbose_name='Formato')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Filtros')),
+                ('huella', models.CharField(db_index=True, max_length=64)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En proceso'), ('LISTO', 'Listo'), ('ERROR', 'Error')], default='PENDIENTE', max_length=12, verbose_name='Estado')),
+                ('total_filas', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total de filas')),
+                ('filas_procesadas', models.PositiveIntegerField(default=0, verbose_name='Filas procesadas')),
+                ('archivo', models.FileField(blank=True, null=True, storage=inventario.models.almacenamiento_privado, upload_to='exportaciones/', verbose_name='Archivo')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Error')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportaciones', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Exportación',
+                'verbose_name_plural': 'Trabajos de Exportación',
+                'db_table': 'trabajo_exportacion',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['estado', 'creado_en'], name='trabajo_exp_estado_idx')],
+            },
+        ),
+    ]
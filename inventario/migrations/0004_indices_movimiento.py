@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+        ('inventario', '0003_trabajoexportacion'),
+        ('proveedores', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto', 'bodega_destino', 'tipo', 'cantidad'], name='mov_prod_dest_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto', 'bodega_origen', 'tipo', 'cantidad'], name='mov_prod_orig_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['fecha', 'id'], name='mov_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto', 'lote'], name='mov_prod_lote_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['fecha_vencimiento'], name='mov_vencimiento_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+        ('inventario', '0004_indices_movimiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierreStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha de cierre')),
+                ('cantidad', models.DecimalField(decimal_places=3, max_digits=18, verbose_name='Cantidad al cierre')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierres_stock', to='inventario.bodega', verbose_name='Bodega')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierres_stock', to='catalogo.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Cierre de Stock',
+                'verbose_name_plural': 'Cierres de Stock',
+                'db_table': 'cierre_stock',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['producto', 'bodega', 'fecha'], name='cierre_prod_bod_fecha_idx')],
+                'unique_together': {('fecha', 'producto', 'bodega')},
+            },
+        ),
+    ]
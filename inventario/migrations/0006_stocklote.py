@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, Sum
+
+
+def poblar_lotes(apps, schema_editor):
+    db = schema_editor.connection.alias
+    MovimientoInventario = apps.get_model('inventario', 'MovimientoInventario')
+    StockLote = apps.get_model('inventario', 'StockLote')
+    saldos = {}
+    base = MovimientoInventario.objects.using(db).order_by().filter(lote__isnull=False).exclude(lote='')
+    entradas = (
+        base.filter(tipo__in=['INGRESO', 'TRANSFERENCIA'], bodega_destino__isnull=False)
+        .values('producto_id', 'bodega_destino_id', 'lote')
+        .annotate(total=Sum('cantidad'))
+    )
+    for fila in entradas:
+        clave = (fila['producto_id'], fila['bodega_destino_id'], fila['lote'])
+        saldos[clave] = saldos.get(clave, 0) + fila['total']
+    salidas = (
+        base.filter(tipo__in=['SALIDA', 'TRANSFERENCIA'], bodega_origen__isnull=False)
+        .values('producto_id', 'bodega_origen_id', 'lote')
+        .annotate(total=Sum('cantidad'))
+    )
+    for fila in salidas:
+        clave = (fila['producto_id'], fila['bodega_origen_id'], fila['lote'])
+        saldos[clave] = saldos.get(clave, 0) - fila['total']
+    vencimientos = {
+        (fila['producto_id'], fila['lote']): fila['vence']
+        for fila in base.filter(fecha_vencimiento__isnull=False)
+        .values('producto_id', 'lote')
+        .annotate(vence=Max('fecha_vencimiento'))
+    }
+    StockLote.objects.using(db).bulk_create([
+        StockLote(producto_id=producto_id, bodega_id=bodega_id, lote=lote, cantidad=cantidad,
+                  fecha_vencimiento=vencimientos.get((producto_id, lote)))
+        for (producto_id, bodega_id, lote), cantidad in saldos.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+        ('inventario', '0005_cierrestock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lote', models.CharField(max_length=50, verbose_name='Lote')),
+                ('fecha_vencimiento', models.DateField(blank=True, null=True, verbose_name='Fecha de vencimiento')),
+                ('cantidad', models.DecimalField(decimal_places=3, default=0, max_digits=18, verbose_name='Cantidad disponible')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_lotes', to='inventario.bodega', verbose_name='Bodega')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_lotes', to='catalogo.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Stock por Lote',
+                'verbose_name_plural': 'Stock por Lote',
+                'db_table': 'stock_lote',
+                'indexes': [models.Index(fields=['producto', 'bodega', 'fecha_vencimiento', 'lote'], name='stock_lote_fefo_idx')],
+                'unique_together': {('producto', 'bodega', 'lote')},
+            },
+        ),
+        migrations.RunPython(poblar_lotes, migrations.RunPython.noop),
+    ]
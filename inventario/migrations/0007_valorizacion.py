@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+        ('inventario', '0006_stocklote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimientoinventario',
+            name='costo_unitario',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=18, null=True, verbose_name='Costo unitario'),
+        ),
+        migrations.CreateModel(
+            name='CapaCosto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha de ingreso')),
+                ('costo_unitario', models.DecimalField(decimal_places=6, max_digits=18, verbose_name='Costo unitario')),
+                ('cantidad_inicial', models.DecimalField(decimal_places=3, max_digits=18, verbose_name='Cantidad inicial')),
+                ('cantidad_restante', models.DecimalField(decimal_places=3, max_digits=18, verbose_name='Cantidad restante')),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capas_costo', to='inventario.bodega', verbose_name='Bodega')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capas_costo', to='catalogo.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Capa de Costo FIFO',
+                'verbose_name_plural': 'Capas de Costo FIFO',
+                'db_table': 'capa_costo',
+                'indexes': [models.Index(fields=['producto', 'bodega', 'fecha', 'id'], name='capa_costo_fifo_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ValorizacionBodega',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=3, default=0, max_digits=18, verbose_name='Cantidad')),
+                ('costo_promedio', models.DecimalField(decimal_places=6, default=0, max_digits=18, verbose_name='Costo promedio')),
+                ('valor_total', models.DecimalField(decimal_places=4, default=0, max_digits=20, verbose_name='Valor total')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valorizaciones', to='inventario.bodega', verbose_name='Bodega')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valorizaciones', to='catalogo.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Valorización por Bodega',
+                'verbose_name_plural': 'Valorización por Bodega',
+                'db_table': 'valorizacion_bodega',
+                'indexes': [models.Index(fields=['producto'], name='valorizacion_producto_idx')],
+                'unique_together': {('bodega', 'producto')},
+            },
+        ),
+    ]
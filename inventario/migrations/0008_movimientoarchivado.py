@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+        ('inventario', '0007_valorizacion'),
+        ('proveedores', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('INGRESO', 'Ingreso'), ('SALIDA', 'Salida'), ('AJUSTE', 'Ajuste'), ('DEVOLUCION', 'Devolución'), ('TRANSFERENCIA', 'Transferencia')], max_length=15, verbose_name='Tipo de movimiento')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha')),
+                ('manejo_lote', models.BooleanField(default=False)),
+                ('manejo_serie', models.BooleanField(default=False)),
+                ('manejo_vencimiento', models.BooleanField(default=False)),
+                ('cantidad', models.DecimalField(decimal_places=3, max_digits=18, verbose_name='Cantidad')),
+                ('lote', models.CharField(blank=True, max_length=50, null=True, verbose_name='Lote')),
+                ('serie', models.CharField(blank=True, max_length=50, null=True, verbose_name='Serie')),
+                ('fecha_vencimiento', models.DateField(blank=True, null=True, verbose_name='Fecha de vencimiento')),
+                ('observaciones', models.TextField(blank=True, null=True, verbose_name='Observaciones')),
+                ('doc_referencia', models.CharField(blank=True, max_length=100, null=True, verbose_name='Documento de referencia')),
+                ('motivo', models.CharField(blank=True, max_length=200, null=True, verbose_name='Motivo (ajustes / devoluciones)')),
+                ('costo_unitario', models.DecimalField(blank=True, decimal_places=6, max_digits=18, null=True, verbose_name='Costo unitario')),
+                ('creado_en', models.DateTimeField()),
+                ('actualizado_en', models.DateTimeField()),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+                ('bodega_destino', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_archivados_ingreso', to='inventario.bodega', verbose_name='Bodega destino')),
+                ('bodega_origen', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_archivados_salida', to='inventario.bodega', verbose_name='Bodega origen')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_archivados', to='catalogo.producto', verbose_name='Producto')),
+                ('proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_archivados', to='proveedores.proveedor', verbose_name='Proveedor')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_archivados', to=settings.AUTH_USER_MODEL, verbose_name='Registrado por')),
+            ],
+            options={
+                'verbose_name': 'Movimiento Archivado',
+                'verbose_name_plural': 'Movimientos Archivados',
+                'db_table': 'movimiento_inventario_archivo',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['producto', 'bodega_destino', 'tipo', 'cantidad'], name='mov_arch_prod_dest_tipo_idx'), models.Index(fields=['producto', 'bodega_origen', 'tipo', 'cantidad'], name='mov_arch_prod_orig_tipo_idx'), models.Index(fields=['fecha', 'id'], name='mov_arch_fecha_id_idx')],
+            },
+        ),
+    ]
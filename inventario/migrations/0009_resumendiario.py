@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def poblar_resumen(apps, schema_editor):
+    db = schema_editor.connection.alias
+    ResumenDiario = apps.get_model('inventario', 'ResumenDiario')
+    filas = {}
+    for nombre in ('MovimientoInventario', 'MovimientoArchivado'):
+        modelo = apps.get_model('inventario', nombre)
+        for campo_bodega, lado in (('bodega_destino_id', 0), ('bodega_origen_id', 1)):
+            totales = (
+                modelo.objects.using(db).order_by()
+                .filter(**{f'{campo_bodega}__isnull': False})
+                .annotate(dia=TruncDate('fecha', tzinfo=timezone.get_default_timezone()))
+                .values('dia', 'producto_id', campo_bodega, 'tipo')
+                .annotate(total=Sum('cantidad'), cantidad=Count('id'))
+            )
+            for fila in totales:
+                clave = (fila['dia'], fila['producto_id'], fila[campo_bodega], fila['tipo'])
+                neto = filas.setdefault(clave, [0, 0, 0])
+                neto[lado] += fila['total']
+                neto[2] += fila['cantidad']
+    ResumenDiario.objects.using(db).bulk_create([
+        ResumenDiario(
+            fecha=dia, producto_id=producto_id, bodega_id=bodega_id, tipo=tipo,
+            cantidad_entrada=entrada, cantidad_salida=salida, movimientos=cantidad,
+        )
+        for (dia, producto_id, bodega_id, tipo), (entrada, salida, cantidad) in filas.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0001_initial'),
+        ('inventario', '0008_movimientoarchivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Día')),
+                ('tipo', models.CharField(choices=[('INGRESO', 'Ingreso'), ('SALIDA', 'Salida'), ('AJUSTE', 'Ajuste'), ('DEVOLUCION', 'Devolución'), ('TRANSFERENCIA', 'Transferencia')], max_length=15, verbose_name='Tipo de movimiento')),
+                ('cantidad_entrada', models.DecimalField(decimal_places=3, default=0, max_digits=18, verbose_name='Cantidad entrada')),
+                ('cantidad_salida', models.DecimalField(decimal_places=3, default=0, max_digits=18, verbose_name='Cantidad salida')),
+                ('movimientos', models.PositiveIntegerField(default=0, verbose_name='Movimientos')),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='inventario.bodega', verbose_name='Bodega')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='catalogo.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Movimientos',
+                'verbose_name_plural': 'Resúmenes Diarios de Movimientos',
+                'db_table': 'resumen_movimiento_diario',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['bodega', 'tipo', 'fecha'], name='resumen_bod_tipo_fecha_idx'), models.Index(fields=['producto', 'fecha'], name='resumen_prod_fecha_idx')],
+                'unique_together': {('fecha', 'producto', 'bodega', 'tipo')},
+            },
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
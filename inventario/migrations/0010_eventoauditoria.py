@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:58
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_resumendiario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('username', models.CharField(blank=True, max_length=150, verbose_name='Nombre de usuario')),
+                ('accion', models.CharField(max_length=40, verbose_name='Acción')),
+                ('entidad', models.CharField(blank=True, max_length=40, verbose_name='Entidad')),
+                ('entidad_id', models.CharField(blank=True, max_length=64, verbose_name='ID entidad')),
+                ('ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP')),
+                ('detalle', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Detalle')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos_auditoria', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Evento de Auditoría',
+                'verbose_name_plural': 'Eventos de Auditoría',
+                'db_table': 'evento_auditoria',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha', 'id'], name='auditoria_fecha_idx'), models.Index(fields=['usuario', 'fecha'], name='auditoria_usuario_fecha_idx'), models.Index(fields=['username', 'fecha'], name='auditoria_username_fecha_idx'), models.Index(fields=['accion', 'fecha'], name='auditoria_accion_fecha_idx'), models.Index(fields=['entidad', 'entidad_id', 'fecha'], name='auditoria_entidad_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def poblar_series(apps, schema_editor):
+    NumeroSerie = apps.get_model('inventario', 'NumeroSerie')
+    db = schema_editor.connection.alias
+    ultimos = {}
+    for nombre in ('MovimientoInventario', 'MovimientoArchivado'):
+        modelo = apps.get_model('inventario', nombre)
+        movimientos = (
+            modelo.objects.using(db).filter(serie__isnull=False, tipo__in=['INGRESO', 'SALIDA', 'TRANSFERENCIA'])
+            .exclude(serie='')
+            .order_by()
+            .values('id', 'tipo', 'producto_id', 'serie', 'bodega_origen_id', 'bodega_destino_id', 'fecha')
+        )
+        for m in movimientos.iterator(chunk_size=2000):
+            if m['tipo'] in ('INGRESO', 'TRANSFERENCIA') and m['bodega_destino_id']:
+                bodega_id, estado = m['bodega_destino_id'], 'EN_BODEGA'
+            elif m['tipo'] in ('SALIDA', 'TRANSFERENCIA') and m['bodega_origen_id']:
+                bodega_id, estado = None, 'FUERA'
+            else:
+                continue
+            clave = (m['producto_id'], m['serie'])
+            actual = ultimos.get(clave)
+            if actual is None or (m['fecha'], m['id']) > actual[0]:
+                ultimos[clave] = ((m['fecha'], m['id']), m['tipo'], bodega_id, estado)
+    NumeroSerie.objects.using(db).bulk_create([
+        NumeroSerie(
+            producto_id=producto_id, serie=serie, bodega_id=bodega_id, estado=estado,
+            tipo_ultimo=tipo, fecha_ultimo=orden[0],
+        )
+        for (producto_id, serie), (orden, tipo, bodega_id, estado) in ultimos.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0002_producto_producto_nombre_idx'),
+        ('inventario', '0010_eventoauditoria'),
+        ('proveedores', '0002_proveedor_proveedor_razon_social_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumeroSerie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(max_length=50, verbose_name='Serie')),
+                ('estado', models.CharField(choices=[('EN_BODEGA', 'En bodega'), ('FUERA', 'Fuera de inventario')], default='FUERA', max_length=10, verbose_name='Estado')),
+                ('tipo_ultimo', models.CharField(blank=True, default='', max_length=15, verbose_name='Último movimiento')),
+                ('fecha_ultimo', models.DateTimeField(blank=True, null=True, verbose_name='Fecha último movimiento')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Número de Serie',
+                'verbose_name_plural': 'Números de Serie',
+                'db_table': 'numero_serie',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimientoarchivado',
+            index=models.Index(fields=['producto', 'serie', 'fecha', 'id'], name='mov_arch_prod_serie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto', 'serie', 'fecha', 'id'], name='mov_prod_serie_idx'),
+        ),
+        migrations.AddField(
+            model_name='numeroserie',
+            name='bodega',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='numeros_serie', to='inventario.bodega', verbose_name='Bodega actual'),
+        ),
+        migrations.AddField(
+            model_name='numeroserie',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='numeros_serie', to='catalogo.producto', verbose_name='Producto'),
+        ),
+        migrations.AddIndex(
+            model_name='numeroserie',
+            index=models.Index(fields=['serie'], name='numero_serie_serie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='numeroserie',
+            index=models.Index(fields=['bodega', 'estado'], name='numero_serie_bodega_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='numeroserie',
+            unique_together={('producto', 'serie')},
+        ),
+        migrations.RunPython(poblar_series, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_numeroserie'),
+        ('proveedores', '0002_proveedor_proveedor_razon_social_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoMovimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('INGRESO', 'Ingreso'), ('SALIDA', 'Salida'), ('AJUSTE', 'Ajuste'), ('DEVOLUCION', 'Devolución'), ('TRANSFERENCIA', 'Transferencia')], max_length=15, verbose_name='Tipo de movimiento')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('doc_referencia', models.CharField(blank=True, max_length=100, null=True, verbose_name='Documento de referencia')),
+                ('motivo', models.CharField(blank=True, max_length=200, null=True, verbose_name='Motivo (ajustes / devoluciones)')),
+                ('observaciones', models.TextField(blank=True, null=True, verbose_name='Observaciones')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('bodega_destino', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documentos_ingreso', to='inventario.bodega', verbose_name='Bodega destino')),
+                ('bodega_origen', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documentos_salida', to='inventario.bodega', verbose_name='Bodega origen')),
+                ('proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documentos_movimiento', to='proveedores.proveedor', verbose_name='Proveedor')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='documentos_movimiento', to=settings.AUTH_USER_MODEL, verbose_name='Registrado por')),
+            ],
+            options={
+                'verbose_name': 'Documento de Movimiento',
+                'verbose_name_plural': 'Documentos de Movimiento',
+                'db_table': 'documento_movimiento',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddField(
+            model_name='movimientoarchivado',
+            name='documento',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lineas_archivadas', to='inventario.documentomovimiento', verbose_name='Documento'),
+        ),
+        migrations.AddField(
+            model_name='movimientoinventario',
+            name='documento',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lineas', to='inventario.documentomovimiento', verbose_name='Documento'),
+        ),
+        migrations.AddIndex(
+            model_name='documentomovimiento',
+            index=models.Index(fields=['doc_referencia'], name='documento_mov_ref_idx'),
+        ),
+    ]
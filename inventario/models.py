@@ -1,3 +1,8 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
@@ -74,6 +79,14 @@ class MovimientoInventario(models.Model):
         related_name="movimientos_ingreso",
         verbose_name="Bodega destino"
     )
+    documento = models.ForeignKey(
+        "DocumentoMovimiento",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="lineas",
+        verbose_name="Documento"
+    )
 
     cantidad = models.DecimalField(
         max_digits=18,
@@ -119,6 +132,17 @@ class MovimientoInventario(models.Model):
         verbose_name="Motivo (ajustes / devoluciones)"
     )
 
+    # Costo unitario del movimiento: en ingresos lo puede informar el usuario
+    # (si no, se toma del proveedor); en salidas y transferencias lo fija la
+    # valorización con el costo promedio de la bodega origen.
+    costo_unitario = models.DecimalField(
+        max_digits=18,
+        decimal_places=6,
+        blank=True,
+        null=True,
+        verbose_name="Costo unitario"
+    )
+
     usuario = models.ForeignKey(
         Usuario,
         on_delete=models.PROTECT,
@@ -137,3 +161,599 @@ class MovimientoInventario(models.Model):
         verbose_name = "Movimiento de Inventario"
         verbose_name_plural = "Movimientos de Inventario"
         ordering = ["-fecha"]
+        indexes = [
+            # Saldo por bodega: entradas (destino) y salidas (origen). Incluyen
+            # cantidad para que SUM(cantidad) se resuelva solo con el índice.
+            models.Index(
+                fields=["producto", "bodega_destino", "tipo", "cantidad"],
+                name="mov_prod_dest_tipo_idx",
+            ),
+            models.Index(
+                fields=["producto", "bodega_origen", "tipo", "cantidad"],
+                name="mov_prod_orig_tipo_idx",
+            ),
+            # Listado / paginación keyset y filtros por rango de fechas
+            models.Index(fields=["fecha", "id"], name="mov_fecha_id_idx"),
+            # Lotes y vencimientos por producto
+            models.Index(fields=["producto", "lote"], name="mov_prod_lote_idx"),
+            models.Index(fields=["fecha_vencimiento"], name="mov_vencimiento_idx"),
+            # Historial de un número de serie (recalcular NumeroSerie al editar / eliminar)
+            models.Index(fields=["producto", "serie", "fecha", "id"], name="mov_prod_serie_idx"),
+        ]
+
+
+class DocumentoMovimiento(models.Model):
+    """
+    Cabecera de un documento de varias líneas (guía de despacho, factura,
+    traspaso). Cada línea es un MovimientoInventario con el tipo, las
+    bodegas, el proveedor y el doc_referencia del documento; se registran
+    todas juntas con inventario.stock.registrar_documento.
+    """
+
+    tipo = models.CharField(
+        max_length=15,
+        choices=MovimientoInventario.TIPO_MOVIMIENTO,
+        verbose_name="Tipo de movimiento"
+    )
+    fecha = models.DateTimeField(default=timezone.now, verbose_name="Fecha")
+    doc_referencia = models.CharField(max_length=100, blank=True, null=True, verbose_name="Documento de referencia")
+    proveedor = models.ForeignKey(
+        Proveedor,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name="documentos_movimiento",
+        verbose_name="Proveedor"
+    )
+    bodega_origen = models.ForeignKey(
+        Bodega,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name="documentos_salida",
+        verbose_name="Bodega origen"
+    )
+    bodega_destino = models.ForeignKey(
+        Bodega,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name="documentos_ingreso",
+        verbose_name="Bodega destino"
+    )
+    motivo = models.CharField(max_length=200, blank=True, null=True, verbose_name="Motivo (ajustes / devoluciones)")
+    observaciones = models.TextField(blank=True, null=True, verbose_name="Observaciones")
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.PROTECT,
+        related_name="documentos_movimiento",
+        verbose_name="Registrado por"
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.doc_referencia or self.pk}"
+
+    class Meta:
+        db_table = "documento_movimiento"
+        verbose_name = "Documento de Movimiento"
+        verbose_name_plural = "Documentos de Movimiento"
+        ordering = ["-fecha"]
+        indexes = [
+            models.Index(fields=["doc_referencia"], name="documento_mov_ref_idx"),
+        ]
+
+
+class MovimientoArchivado(models.Model):
+    """
+    Copia fría de movimiento_inventario para los movimientos ya cubiertos por
+    un cierre de stock (comando archivar_movimientos). Conserva el id
+    original y es de solo lectura; el listado, el Kardex y las exportaciones
+    la consultan solo cuando el rango pedido llega hasta la fecha archivada.
+    """
+
+    archivado = True
+    TIPO_MOVIMIENTO = MovimientoInventario.TIPO_MOVIMIENTO
+
+    id = models.BigIntegerField(primary_key=True)
+    tipo = models.CharField(max_length=15, choices=TIPO_MOVIMIENTO, verbose_name="Tipo de movimiento")
+    fecha = models.DateTimeField(verbose_name="Fecha")
+
+    manejo_lote = models.BooleanField(default=False)
+    manejo_serie = models.BooleanField(default=False)
+    manejo_vencimiento = models.BooleanField(default=False)
+
+    producto = models.ForeignKey(
+        Producto, on_delete=models.PROTECT, related_name="movimientos_archivados", verbose_name="Producto"
+    )
+    proveedor = models.ForeignKey(
+        Proveedor, on_delete=models.PROTECT, blank=True, null=True,
+        related_name="movimientos_archivados", verbose_name="Proveedor"
+    )
+    bodega_origen = models.ForeignKey(
+        Bodega, on_delete=models.PROTECT, blank=True, null=True,
+        related_name="movimientos_archivados_salida", verbose_name="Bodega origen"
+    )
+    bodega_destino = models.ForeignKey(
+        Bodega, on_delete=models.PROTECT, blank=True, null=True,
+        related_name="movimientos_archivados_ingreso", verbose_name="Bodega destino"
+    )
+    documento = models.ForeignKey(
+        "DocumentoMovimiento", on_delete=models.SET_NULL, blank=True, null=True,
+        related_name="lineas_archivadas", verbose_name="Documento"
+    )
+
+    cantidad = models.DecimalField(max_digits=18, decimal_places=3, verbose_name="Cantidad")
+    lote = models.CharField(max_length=50, blank=True, null=True, verbose_name="Lote")
+    serie = models.CharField(max_length=50, blank=True, null=True, verbose_name="Serie")
+    fecha_vencimiento = models.DateField(blank=True, null=True, verbose_name="Fecha de vencimiento")
+    observaciones = models.TextField(blank=True, null=True, verbose_name="Observaciones")
+    doc_referencia = models.CharField(max_length=100, blank=True, null=True, verbose_name="Documento de referencia")
+    motivo = models.CharField(max_length=200, blank=True, null=True, verbose_name="Motivo (ajustes / devoluciones)")
+    costo_unitario = models.DecimalField(
+        max_digits=18, decimal_places=6, blank=True, null=True, verbose_name="Costo unitario"
+    )
+
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.PROTECT, related_name="movimientos_archivados", verbose_name="Registrado por"
+    )
+
+    creado_en = models.DateTimeField()
+    actualizado_en = models.DateTimeField()
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.tipo} - {self.producto.nombre} ({self.cantidad}) [archivado]"
+
+    class Meta:
+        db_table = "movimiento_inventario_archivo"
+        verbose_name = "Movimiento Archivado"
+        verbose_name_plural = "Movimientos Archivados"
+        ordering = ["-fecha"]
+        indexes = [
+            models.Index(
+                fields=["producto", "bodega_destino", "tipo", "cantidad"],
+                name="mov_arch_prod_dest_tipo_idx",
+            ),
+            models.Index(
+                fields=["producto", "bodega_origen", "tipo", "cantidad"],
+                name="mov_arch_prod_orig_tipo_idx",
+            ),
+            models.Index(fields=["fecha", "id"], name="mov_arch_fecha_id_idx"),
+            models.Index(fields=["producto", "serie", "fecha", "id"], name="mov_arch_prod_serie_idx"),
+        ]
+
+
+class StockBodega(models.Model):
+    """
+    Saldo materializado por (producto, bodega). Lo mantiene inventario.stock
+    cada vez que se guarda o elimina un movimiento, para no tener que sumar
+    todo el historial de movimiento_inventario al validar stock.
+    """
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="stock_bodegas",
+        verbose_name="Producto"
+    )
+    bodega = models.ForeignKey(
+        Bodega,
+        on_delete=models.CASCADE,
+        related_name="stock_productos",
+        verbose_name="Bodega"
+    )
+    cantidad = models.DecimalField(
+        max_digits=18,
+        decimal_places=3,
+        default=0,
+        verbose_name="Cantidad disponible"
+    )
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.producto.nombre} @ {self.bodega.codigo}: {self.cantidad}"
+
+    class Meta:
+        db_table = "stock_bodega"
+        verbose_name = "Stock por Bodega"
+        verbose_name_plural = "Stock por Bodega"
+        unique_together = ("producto", "bodega")
+
+
+class StockLote(models.Model):
+    """
+    Saldo por lote dentro de una bodega. Lo mantiene inventario.stock junto
+    con StockBodega para los movimientos que traen lote; es la base de la
+    asignación FEFO de las salidas.
+    """
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="stock_lotes",
+        verbose_name="Producto"
+    )
+    bodega = models.ForeignKey(
+        Bodega,
+        on_delete=models.CASCADE,
+        related_name="stock_lotes",
+        verbose_name="Bodega"
+    )
+    lote = models.CharField(max_length=50, verbose_name="Lote")
+    fecha_vencimiento = models.DateField(blank=True, null=True, verbose_name="Fecha de vencimiento")
+    cantidad = models.DecimalField(
+        max_digits=18,
+        decimal_places=3,
+        default=0,
+        verbose_name="Cantidad disponible"
+    )
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.producto.nombre} @ {self.bodega.codigo} lote {self.lote}: {self.cantidad}"
+
+    class Meta:
+        db_table = "stock_lote"
+        verbose_name = "Stock por Lote"
+        verbose_name_plural = "Stock por Lote"
+        unique_together = ("producto", "bodega", "lote")
+        indexes = [
+            # Asignación FEFO: lotes de un producto en una bodega por vencimiento
+            models.Index(
+                fields=["producto", "bodega", "fecha_vencimiento", "lote"],
+                name="stock_lote_fefo_idx",
+            ),
+        ]
+
+
+class NumeroSerie(models.Model):
+    """
+    Ubicación actual de cada número de serie, uno por (producto, serie). Lo
+    mantiene inventario.stock con los movimientos que traen serie: una
+    entrada lo deja EN_BODEGA en la bodega destino y una salida lo deja
+    FUERA. Permite ubicar una serie o rechazar un ingreso duplicado sin
+    recorrer movimiento_inventario.
+    """
+
+    EN_BODEGA = "EN_BODEGA"
+    FUERA = "FUERA"
+    ESTADOS = [
+        (EN_BODEGA, "En bodega"),
+        (FUERA, "Fuera de inventario"),
+    ]
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="numeros_serie",
+        verbose_name="Producto"
+    )
+    serie = models.CharField(max_length=50, verbose_name="Serie")
+    bodega = models.ForeignKey(
+        Bodega,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="numeros_serie",
+        verbose_name="Bodega actual"
+    )
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=FUERA, verbose_name="Estado")
+    tipo_ultimo = models.CharField(max_length=15, blank=True, default="", verbose_name="Último movimiento")
+    fecha_ultimo = models.DateTimeField(blank=True, null=True, verbose_name="Fecha último movimiento")
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        donde = self.bodega.codigo if self.bodega_id else self.get_estado_display()
+        return f"{self.producto.nombre} serie {self.serie}: {donde}"
+
+    class Meta:
+        db_table = "numero_serie"
+        verbose_name = "Número de Serie"
+        verbose_name_plural = "Números de Serie"
+        unique_together = ("producto", "serie")
+        indexes = [
+            # Búsqueda por serie sin conocer el producto
+            models.Index(fields=["serie"], name="numero_serie_serie_idx"),
+            models.Index(fields=["bodega", "estado"], name="numero_serie_bodega_idx"),
+        ]
+
+
+class ValorizacionBodega(models.Model):
+    """
+    Valorización a costo promedio ponderado por (producto, bodega). Se
+    actualiza en cada movimiento desde inventario.valorizacion, así que el
+    valor del stock de una bodega es un SUM sobre pocas filas.
+    """
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="valorizaciones",
+        verbose_name="Producto"
+    )
+    bodega = models.ForeignKey(
+        Bodega,
+        on_delete=models.CASCADE,
+        related_name="valorizaciones",
+        verbose_name="Bodega"
+    )
+    cantidad = models.DecimalField(max_digits=18, decimal_places=3, default=0, verbose_name="Cantidad")
+    costo_promedio = models.DecimalField(max_digits=18, decimal_places=6, default=0, verbose_name="Costo promedio")
+    valor_total = models.DecimalField(max_digits=20, decimal_places=4, default=0, verbose_name="Valor total")
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.producto.nombre} @ {self.bodega.codigo}: {self.valor_total}"
+
+    class Meta:
+        db_table = "valorizacion_bodega"
+        verbose_name = "Valorización por Bodega"
+        verbose_name_plural = "Valorización por Bodega"
+        # bodega primero: el valor por bodega se resuelve con el prefijo del índice
+        unique_together = ("bodega", "producto")
+        indexes = [
+            models.Index(fields=["producto"], name="valorizacion_producto_idx"),
+        ]
+
+
+class CapaCosto(models.Model):
+    """
+    Capa de costo FIFO: lo que queda de un ingreso (o de una transferencia
+    recibida) a su costo original. Solo se mantiene con INVENTARIO_CAPAS_FIFO.
+    """
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="capas_costo",
+        verbose_name="Producto"
+    )
+    bodega = models.ForeignKey(
+        Bodega,
+        on_delete=models.CASCADE,
+        related_name="capas_costo",
+        verbose_name="Bodega"
+    )
+    fecha = models.DateTimeField(verbose_name="Fecha de ingreso")
+    costo_unitario = models.DecimalField(max_digits=18, decimal_places=6, verbose_name="Costo unitario")
+    cantidad_inicial = models.DecimalField(max_digits=18, decimal_places=3, verbose_name="Cantidad inicial")
+    cantidad_restante = models.DecimalField(max_digits=18, decimal_places=3, verbose_name="Cantidad restante")
+
+    def __str__(self):
+        return f"{self.producto.nombre} @ {self.bodega.codigo}: {self.cantidad_restante} x {self.costo_unitario}"
+
+    class Meta:
+        db_table = "capa_costo"
+        verbose_name = "Capa de Costo FIFO"
+        verbose_name_plural = "Capas de Costo FIFO"
+        indexes = [
+            models.Index(fields=["producto", "bodega", "fecha", "id"], name="capa_costo_fifo_idx"),
+        ]
+
+
+class CierreStock(models.Model):
+    """
+    Foto del stock por (producto, bodega) al final del día `fecha` (hora
+    local). La escribe el comando cerrar_stock; solo guarda saldos distintos
+    de cero, así que un par ausente en un cierre tenía stock 0 ese día.
+    """
+
+    fecha = models.DateField(verbose_name="Fecha de cierre")
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="cierres_stock",
+        verbose_name="Producto"
+    )
+    bodega = models.ForeignKey(
+        Bodega,
+        on_delete=models.CASCADE,
+        related_name="cierres_stock",
+        verbose_name="Bodega"
+    )
+    cantidad = models.DecimalField(
+        max_digits=18,
+        decimal_places=3,
+        verbose_name="Cantidad al cierre"
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.fecha:%d-%m-%Y} {self.producto.nombre} @ {self.bodega.codigo}: {self.cantidad}"
+
+    class Meta:
+        db_table = "cierre_stock"
+        verbose_name = "Cierre de Stock"
+        verbose_name_plural = "Cierres de Stock"
+        ordering = ["-fecha"]
+        unique_together = ("fecha", "producto", "bodega")
+        indexes = [
+            models.Index(fields=["producto", "bodega", "fecha"], name="cierre_prod_bod_fecha_idx"),
+        ]
+
+
+class ResumenDiario(models.Model):
+    """
+    Totales diarios de movimientos por (día local, producto, bodega, tipo).
+    Lo mantiene inventario.stock en cada alta, edición y eliminación de
+    movimientos; el comando reconstruir_resumen_diario lo rehace desde el
+    historial. Cada movimiento suma su cantidad como entrada en la bodega
+    destino y como salida en la bodega origen (una transferencia aparece en
+    ambas); los movimientos sin bodega no se resumen.
+    """
+
+    fecha = models.DateField(verbose_name="Día")
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="resumenes_diarios",
+        verbose_name="Producto"
+    )
+    bodega = models.ForeignKey(
+        Bodega,
+        on_delete=models.CASCADE,
+        related_name="resumenes_diarios",
+        verbose_name="Bodega"
+    )
+    tipo = models.CharField(
+        max_length=15,
+        choices=MovimientoInventario.TIPO_MOVIMIENTO,
+        verbose_name="Tipo de movimiento"
+    )
+    cantidad_entrada = models.DecimalField(
+        max_digits=18,
+        decimal_places=3,
+        default=0,
+        verbose_name="Cantidad entrada"
+    )
+    cantidad_salida = models.DecimalField(
+        max_digits=18,
+        decimal_places=3,
+        default=0,
+        verbose_name="Cantidad salida"
+    )
+    movimientos = models.PositiveIntegerField(default=0, verbose_name="Movimientos")
+
+    def __str__(self):
+        return f"{self.fecha:%d-%m-%Y} {self.tipo} {self.producto_id} @ {self.bodega_id}"
+
+    class Meta:
+        db_table = "resumen_movimiento_diario"
+        verbose_name = "Resumen Diario de Movimientos"
+        verbose_name_plural = "Resúmenes Diarios de Movimientos"
+        ordering = ["-fecha"]
+        unique_together = ("fecha", "producto", "bodega", "tipo")
+        indexes = [
+            # Reportes por bodega y tipo en un rango de días
+            models.Index(fields=["bodega", "tipo", "fecha"], name="resumen_bod_tipo_fecha_idx"),
+            models.Index(fields=["producto", "fecha"], name="resumen_prod_fecha_idx"),
+        ]
+
+
+class AlmacenamientoPrivado(FileSystemStorage):
+    """
+    Archivos bajo ARCHIVOS_PRIVADOS_ROOT, fuera de MEDIA_ROOT y sin URL
+    pública: solo se entregan por vistas que revisan permisos. La carpeta se
+    lee de settings en cada uso.
+    """
+
+    @property
+    def base_location(self):
+        return settings.ARCHIVOS_PRIVADOS_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError("Los archivos privados no tienen URL pública.")
+
+
+_almacenamiento_privado = AlmacenamientoPrivado()
+
+
+def almacenamiento_privado():
+    return _almacenamiento_privado
+
+
+class TrabajoExportacion(models.Model):
+    """
+    Exportación grande ejecutada fuera del request por el comando
+    procesar_exportaciones. El archivo queda en
+    ARCHIVOS_PRIVADOS_ROOT/exportaciones/ y se descarga solo por
+    inventario:exportacion_descargar.
+    """
+
+    ESTADOS = (
+        ("PENDIENTE", "Pendiente"),
+        ("EN_PROCESO", "En proceso"),
+        ("LISTO", "Listo"),
+        ("ERROR", "Error"),
+    )
+
+    tipo = models.CharField(max_length=30, verbose_name="Tipo de exportación")
+    formato = models.CharField(max_length=10, verbose_name="Formato")
+    parametros = models.JSONField(default=dict, blank=True, verbose_name="Filtros")
+    # sha256 de tipo + formato + filtros, para reutilizar exportaciones idénticas
+    huella = models.CharField(max_length=64, db_index=True)
+
+    estado = models.CharField(max_length=12, choices=ESTADOS, default="PENDIENTE", verbose_name="Estado")
+    total_filas = models.PositiveIntegerField(blank=True, null=True, verbose_name="Total de filas")
+    filas_procesadas = models.PositiveIntegerField(default=0, verbose_name="Filas procesadas")
+    archivo = models.FileField(
+        upload_to="exportaciones/", storage=almacenamiento_privado, blank=True, null=True, verbose_name="Archivo"
+    )
+    error = models.TextField(blank=True, null=True, verbose_name="Error")
+
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name="exportaciones",
+        verbose_name="Solicitado por"
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(blank=True, null=True)
+    terminado_en = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.tipo}.{self.formato} ({self.get_estado_display()})"
+
+    @property
+    def porcentaje(self):
+        if self.estado == "LISTO":
+            return 100
+        if not self.total_filas:
+            return 0
+        return min(100, int(self.filas_procesadas * 100 / self.total_filas))
+
+    class Meta:
+        db_table = "trabajo_exportacion"
+        verbose_name = "Trabajo de Exportación"
+        verbose_name_plural = "Trabajos de Exportación"
+        ordering = ["-creado_en"]
+        indexes = [
+            models.Index(fields=["estado", "creado_en"], name="trabajo_exp_estado_idx"),
+        ]
+
+
+class EventoAuditoria(models.Model):
+    """
+    Registro de auditoría (altas, ediciones, eliminaciones, login/logout) de
+    todas las apps. Las vistas no lo guardan directamente: lo encolan con
+    inventario.auditoria.registrar() y un hilo lo escribe por lotes.
+    """
+
+    fecha = models.DateTimeField(default=timezone.now, verbose_name="Fecha")
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="eventos_auditoria",
+        verbose_name="Usuario"
+    )
+    # Se guarda también el nombre: login fallido (sin usuario) o usuario eliminado
+    username = models.CharField(max_length=150, blank=True, verbose_name="Nombre de usuario")
+    accion = models.CharField(max_length=40, verbose_name="Acción")
+    entidad = models.CharField(max_length=40, blank=True, verbose_name="Entidad")
+    entidad_id = models.CharField(max_length=64, blank=True, verbose_name="ID entidad")
+    ip = models.GenericIPAddressField(blank=True, null=True, verbose_name="IP")
+    detalle = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name="Detalle")
+
+    def __str__(self):
+        return f"{self.fecha:%d-%m-%Y %H:%M} {self.username or '-'} {self.accion}"
+
+    class Meta:
+        db_table = "evento_auditoria"
+        verbose_name = "Evento de Auditoría"
+        verbose_name_plural = "Eventos de Auditoría"
+        ordering = ["-fecha"]
+        indexes = [
+            # Búsqueda por rango de fechas (keyset por fecha, id) y por cada filtro
+            models.Index(fields=["fecha", "id"], name="auditoria_fecha_idx"),
+            models.Index(fields=["usuario", "fecha"], name="auditoria_usuario_fecha_idx"),
+            models.Index(fields=["username", "fecha"], name="auditoria_username_fecha_idx"),
+            models.Index(fields=["accion", "fecha"], name="auditoria_accion_fecha_idx"),
+            models.Index(fields=["entidad", "entidad_id", "fecha"], name="auditoria_entidad_idx"),
+        ]
@@ -0,0 +1,148 @@
+"""
+Motor de reposición: productos con stock total (todas las bodegas) igual o
+bajo su punto de reorden, con el proveedor sugerido y la cantidad a pedir.
+
+Se resuelve con dos consultas agrupadas (productos bajo el punto con su
+stock sumado, y las ofertas de proveedor de esos productos) y el resultado
+queda en caché hasta que un movimiento toque alguno de los productos
+vigilados o cambie un producto / oferta de proveedor.
+"""
+from datetime import timedelta
+from decimal import ROUND_CEILING, Decimal
+
+from django.core.cache import cache
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from catalogo.models import Producto
+from proveedores.models import ProveedorProducto
+from proyecto_lilis.replica import lecturas_en_primario
+
+
+CLAVE_CACHE = "inventario:reposicion"
+# Tope por si alguna invalidación se pierde (p. ej. cambios directos en la BD)
+DURACION_CACHE = 60 * 60
+
+CERO = Decimal("0")
+DECIMAL = DecimalField(max_digits=18, decimal_places=3)
+
+
+def _costo_neto(oferta):
+    return oferta.costo * (1 - (oferta.descuento_pct or CERO) / 100)
+
+
+def _redondear_lote(cantidad, min_lote):
+    """Sube la cantidad al siguiente múltiplo de min_lote (al menos un lote)."""
+    if not min_lote or min_lote <= 0:
+        return cantidad
+    lotes = max((cantidad / min_lote).to_integral_value(rounding=ROUND_CEILING), 1)
+    return lotes * min_lote
+
+
+def productos_bajo_punto():
+    """Productos con stock total igual o bajo su umbral, con `umbral` y `stock` anotados."""
+    return (
+        Producto.objects.annotate(
+            umbral=Coalesce("punto_reorden", "stock_minimo", output_field=DECIMAL),
+            stock=Coalesce(Sum("stock_bodegas__cantidad"), Value(CERO), output_field=DECIMAL),
+        )
+        .filter(umbral__gt=0, stock__lte=F("umbral"))
+    )
+
+
+def calcular_propuesta():
+    """Lista de dicts con la propuesta de reposición, ordenada por SKU."""
+    productos = list(
+        productos_bajo_punto().order_by("sku")
+        .only("sku", "nombre", "stock_minimo", "stock_maximo", "punto_reorden")
+    )
+
+    ofertas = {}
+    for oferta in (
+        ProveedorProducto.objects.filter(producto__in=[p.pk for p in productos])
+        .select_related("proveedor")
+        .only("producto_id", "costo", "descuento_pct", "min_lote", "lead_time_dias", "preferente",
+              "proveedor__rut_nif", "proveedor__razon_social")
+    ):
+        ofertas.setdefault(oferta.producto_id, []).append(oferta)
+
+    hoy = timezone.localdate()
+    propuesta = []
+    for producto in productos:
+        # El preferente manda; entre iguales, el de menor costo neto
+        candidatas = ofertas.get(producto.pk, [])
+        oferta = min(candidatas, key=lambda o: (not o.preferente, _costo_neto(o))) if candidatas else None
+
+        objetivo = Decimal(producto.stock_maximo) if producto.stock_maximo else producto.umbral
+        faltante = max(objetivo - producto.stock, CERO)
+        cantidad = _redondear_lote(faltante, oferta.min_lote if oferta else None)
+        costo = _costo_neto(oferta).quantize(Decimal("0.01")) if oferta else None
+
+        propuesta.append({
+            "producto_id": producto.pk,
+            "sku": producto.sku,
+            "nombre": producto.nombre,
+            "stock": producto.stock,
+            "punto_reorden": producto.umbral,
+            "stock_maximo": producto.stock_maximo,
+            "cantidad_sugerida": cantidad,
+            "proveedor_id": oferta.proveedor_id if oferta else None,
+            "proveedor_rut": oferta.proveedor.rut_nif if oferta else None,
+            "proveedor": oferta.proveedor.razon_social if oferta else None,
+            "min_lote": oferta.min_lote if oferta else None,
+            "costo_unitario": costo,
+            "costo_total": (costo * cantidad).quantize(Decimal("0.01")) if oferta else None,
+            "llegada_estimada": hoy + timedelta(days=oferta.lead_time_dias) if oferta else None,
+        })
+    return propuesta
+
+
+def _vigilados():
+    """Ids de productos con punto de reorden o stock mínimo: solo estos afectan la propuesta."""
+    return set(
+        Producto.objects.annotate(umbral=Coalesce("punto_reorden", "stock_minimo"))
+        .filter(umbral__gt=0)
+        .values_list("pk", flat=True)
+    )
+
+
+def propuesta_reposicion():
+    """Propuesta desde la caché, o recalculada si un movimiento la invalidó."""
+    datos = cache.get(CLAVE_CACHE)
+    if datos is None:
+        # Queda en caché hasta la próxima invalidación: se calcula con el
+        # primario aunque el request lea de la réplica
+        with lecturas_en_primario():
+            datos = {"propuesta": calcular_propuesta(), "vigilados": _vigilados(), "calculado_en": timezone.now()}
+        cache.set(CLAVE_CACHE, datos, DURACION_CACHE)
+    return datos
+
+
+def invalidar_reposicion(producto_ids=None):
+    """
+    Descarta la propuesta en caché. Con producto_ids, solo si alguno está
+    vigilado (un movimiento de un producto sin punto de reorden no la cambia).
+    """
+    if producto_ids is not None:
+        datos = cache.get(CLAVE_CACHE)
+        if datos is None or not datos["vigilados"] & set(producto_ids):
+            return
+    cache.delete(CLAVE_CACHE)
+
+
+# Columnas de la exportación XLSX / CSV
+COLUMNAS_EXPORTACION = [
+    ("SKU", lambda f: f["sku"]),
+    ("Producto", lambda f: f["nombre"]),
+    ("Stock total", lambda f: float(f["stock"])),
+    ("Punto de reorden", lambda f: float(f["punto_reorden"])),
+    ("Stock máximo", lambda f: f["stock_maximo"] if f["stock_maximo"] is not None else ""),
+    ("Cantidad sugerida", lambda f: float(f["cantidad_sugerida"])),
+    ("Proveedor (RUT/NIF)", lambda f: f["proveedor_rut"] or ""),
+    ("Proveedor", lambda f: f["proveedor"] or ""),
+    ("Lote mínimo", lambda f: float(f["min_lote"]) if f["min_lote"] is not None else ""),
+    ("Costo unitario", lambda f: float(f["costo_unitario"]) if f["costo_unitario"] is not None else ""),
+    ("Costo total", lambda f: float(f["costo_total"]) if f["costo_total"] is not None else ""),
+    ("Llegada estimada", lambda f: f["llegada_estimada"] or ""),
+]
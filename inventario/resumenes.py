@@ -0,0 +1,172 @@
+"""
+Resumen diario de movimientos por (día local, producto, bodega, tipo).
+
+inventario.stock llama a actualizar_resumen() dentro de la transacción de
+cada alta, edición o eliminación, así que resumen_movimiento_diario queda al
+día sumando solo los deltas del movimiento. Los reportes por día, semana o
+mes (resumen_movimientos, unidades_por_bodega) agrupan esas filas en vez de
+recorrer movimiento_inventario. reconstruir_resumen() lo rehace desde el
+historial vigente y archivado (comando reconstruir_resumen_diario).
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import MovimientoArchivado, MovimientoInventario, ResumenDiario
+
+
+CERO = Decimal("0")
+
+# Agrupaciones de los reportes
+PERIODOS = {
+    "dia": F("fecha"),
+    "semana": TruncWeek("fecha"),
+    "mes": TruncMonth("fecha"),
+}
+DIMENSIONES = {
+    "producto": "producto_id",
+    "bodega": "bodega_id",
+    "tipo": "tipo",
+}
+
+
+def dia_local(fecha):
+    """Día de `fecha` en la zona horaria del sistema (America/Santiago)."""
+    return timezone.localtime(fecha, timezone.get_default_timezone()).date()
+
+
+def efectos_resumen(movimiento):
+    """Lista de ((dia, producto_id, bodega_id, tipo), entrada, salida) de un movimiento."""
+    if not movimiento.producto_id or movimiento.cantidad is None:
+        return []
+    dia = dia_local(movimiento.fecha)
+    cantidad = Decimal(movimiento.cantidad)
+    efectos = []
+    if movimiento.bodega_destino_id:
+        clave = (dia, movimiento.producto_id, movimiento.bodega_destino_id, movimiento.tipo)
+        efectos.append((clave, cantidad, CERO))
+    if movimiento.bodega_origen_id:
+        clave = (dia, movimiento.producto_id, movimiento.bodega_origen_id, movimiento.tipo)
+        efectos.append((clave, CERO, cantidad))
+    return efectos
+
+
+def actualizar_resumen(anteriores, nuevos):
+    """
+    Resta los movimientos `anteriores` (versión original de una edición o
+    eliminados) y suma los `nuevos`. Llamar dentro de la transacción del
+    movimiento.
+    """
+    netos = {}
+    for signo, movimientos in ((-1, anteriores), (1, nuevos)):
+        for movimiento in movimientos:
+            for clave, entrada, salida in efectos_resumen(movimiento):
+                neto = netos.setdefault(clave, [CERO, CERO, 0])
+                neto[0] += signo * entrada
+                neto[1] += signo * salida
+                neto[2] += signo
+    netos = {clave: neto for clave, neto in netos.items() if any(neto)}
+    if not netos:
+        return
+
+    claves = sorted(netos)
+    ResumenDiario.objects.bulk_create([
+        ResumenDiario(fecha=dia, producto_id=producto_id, bodega_id=bodega_id, tipo=tipo)
+        for dia, producto_id, bodega_id, tipo in claves
+    ], ignore_conflicts=True)
+    for clave in claves:
+        entrada, salida, cantidad = netos[clave]
+        dia, producto_id, bodega_id, tipo = clave
+        ResumenDiario.objects.filter(fecha=dia, producto_id=producto_id, bodega_id=bodega_id, tipo=tipo).update(
+            cantidad_entrada=F("cantidad_entrada") + entrada,
+            cantidad_salida=F("cantidad_salida") + salida,
+            movimientos=F("movimientos") + cantidad,
+        )
+    if anteriores:
+        ResumenDiario.objects.filter(movimientos=0, fecha__in={clave[0] for clave in claves}).delete()
+
+
+def _totales(modelo, campo_bodega):
+    return (
+        modelo.objects.order_by()
+        .filter(**{f"{campo_bodega}__isnull": False})
+        .annotate(dia=TruncDate("fecha", tzinfo=timezone.get_default_timezone()))
+        .values("dia", "producto_id", campo_bodega, "tipo")
+        .annotate(total=Sum("cantidad"), cantidad=Count("id"))
+    )
+
+
+def reconstruir_resumen():
+    """Rehace resumen_movimiento_diario completo. Devuelve la cantidad de filas."""
+    filas = {}
+    for modelo in (MovimientoInventario, MovimientoArchivado):
+        for campo_bodega, lado in (("bodega_destino_id", 0), ("bodega_origen_id", 1)):
+            for fila in _totales(modelo, campo_bodega):
+                clave = (fila["dia"], fila["producto_id"], fila[campo_bodega], fila["tipo"])
+                neto = filas.setdefault(clave, [CERO, CERO, 0])
+                neto[lado] += fila["total"]
+                neto[2] += fila["cantidad"]
+
+    with transaction.atomic():
+        ResumenDiario.objects.all().delete()
+        ResumenDiario.objects.bulk_create([
+            ResumenDiario(
+                fecha=dia, producto_id=producto_id, bodega_id=bodega_id, tipo=tipo,
+                cantidad_entrada=entrada, cantidad_salida=salida, movimientos=cantidad,
+            )
+            for (dia, producto_id, bodega_id, tipo), (entrada, salida, cantidad) in filas.items()
+        ], batch_size=1000)
+    return len(filas)
+
+
+# ---------- Reportes ----------
+
+def resumen_movimientos(desde, hasta, periodo="dia", por=("producto", "bodega", "tipo"),
+                        producto=None, bodega=None, tipo=None):
+    """
+    Totales entre los días `desde` y `hasta` (inclusive) agrupados por
+    `periodo` ("dia", "semana" o "mes"; semana y mes toman el primer día
+    del período) y por las dimensiones de `por`. Devuelve una lista de dicts
+    con periodo, las dimensiones pedidas (producto_id, bodega_id, tipo),
+    entrada, salida y movimientos.
+    """
+    qs = ResumenDiario.objects.order_by().filter(fecha__gte=desde, fecha__lte=hasta)
+    if producto is not None:
+        qs = qs.filter(producto=producto)
+    if bodega is not None:
+        qs = qs.filter(bodega=bodega)
+    if tipo:
+        qs = qs.filter(Q(tipo__in=tipo) if isinstance(tipo, (list, tuple, set)) else Q(tipo=tipo))
+
+    campos = [DIMENSIONES[dimension] for dimension in por]
+    return list(
+        qs.annotate(periodo=PERIODOS[periodo])
+        .values("periodo", *campos)
+        .annotate(
+            entrada=Sum("cantidad_entrada"),
+            salida=Sum("cantidad_salida"),
+            movimientos=Sum("movimientos"),
+        )
+        .order_by("periodo", *campos)
+    )
+
+
+def unidades_por_bodega(desde, hasta, tipo="INGRESO", periodo="mes"):
+    """
+    {(periodo, bodega_id): unidades} de un tipo, p. ej. unidades recibidas
+    por bodega en el mes: entradas para INGRESO, salidas para SALIDA, y
+    entradas menos salidas para el resto.
+    """
+    resultado = {}
+    for fila in resumen_movimientos(desde, hasta, periodo=periodo, por=("bodega",), tipo=tipo):
+        if tipo == "INGRESO":
+            unidades = fila["entrada"]
+        elif tipo == "SALIDA":
+            unidades = fila["salida"]
+        else:
+            unidades = fila["entrada"] - fila["salida"]
+        resultado[(fila["periodo"], fila["bodega_id"])] = unidades
+    return resultado
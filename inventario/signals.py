@@ -0,0 +1,62 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts_lilis.models import Usuario
+from catalogo.models import Producto
+from proveedores.models import Proveedor, ProveedorProducto
+
+from .autocompletar import invalidar_autocompletar
+from .contadores import ajustar_total, invalidar_bajo_stock
+from .models import Bodega
+from .reposicion import invalidar_reposicion
+
+
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=ProveedorProducto)
+def _reposicion_cambio_catalogo(sender, **kwargs):
+    # Cambió un punto de reorden, un stock máximo o una oferta de proveedor
+    invalidar_reposicion()
+
+
+@receiver([post_save, post_delete], sender=Producto)
+def _autocompletar_productos(sender, **kwargs):
+    invalidar_autocompletar("productos")
+
+
+@receiver([post_save, post_delete], sender=Proveedor)
+def _autocompletar_proveedores(sender, **kwargs):
+    invalidar_autocompletar("proveedores")
+
+
+@receiver([post_save, post_delete], sender=Bodega)
+def _autocompletar_bodegas(sender, **kwargs):
+    invalidar_autocompletar("bodegas")
+
+
+# Totales del inicio; los de movimientos los ajusta inventario.stock al confirmar
+TOTALES_POR_MODELO = {
+    Producto: "total_productos",
+    Proveedor: "total_proveedores",
+    Usuario: "total_usuarios",
+}
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_save, sender=Usuario)
+def _contadores_alta(sender, created=False, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: ajustar_total(TOTALES_POR_MODELO[sender], 1))
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Proveedor)
+@receiver(post_delete, sender=Usuario)
+def _contadores_baja(sender, **kwargs):
+    transaction.on_commit(lambda: ajustar_total(TOTALES_POR_MODELO[sender], -1))
+
+
+@receiver([post_save, post_delete], sender=Producto)
+def _contadores_bajo_stock(sender, **kwargs):
+    transaction.on_commit(invalidar_bajo_stock)
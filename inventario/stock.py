@@ -0,0 +1,683 @@
+import copy
+import time
+from decimal import Decimal
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, transaction
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+from .models import CierreStock, MovimientoArchivado, MovimientoInventario, NumeroSerie, StockBodega, StockLote
+from .contadores import ajustar_movimientos
+from .reposicion import invalidar_reposicion
+from .resumenes import actualizar_resumen
+from .valorizacion import productos_atrasados, revalorizar_productos, valorizar
+
+
+# Tipos que mueven stock (mismo criterio que la validación original del form):
+# entran a bodega_destino INGRESO/TRANSFERENCIA, salen de bodega_origen
+# SALIDA/TRANSFERENCIA.
+TIPOS_ENTRADA = ["INGRESO", "TRANSFERENCIA"]
+TIPOS_SALIDA = ["SALIDA", "TRANSFERENCIA"]
+
+REINTENTOS_BLOQUEO = 3
+
+
+def efectos(tipo, producto_id, bodega_origen_id, bodega_destino_id, cantidad):
+    """Devuelve la lista de (producto_id, bodega_id, delta) que aplica un movimiento."""
+    cambios = []
+    if not producto_id or cantidad is None:
+        return cambios
+    cantidad = Decimal(cantidad)
+    if tipo in TIPOS_SALIDA and bodega_origen_id:
+        cambios.append((producto_id, bodega_origen_id, -cantidad))
+    if tipo in TIPOS_ENTRADA and bodega_destino_id:
+        cambios.append((producto_id, bodega_destino_id, cantidad))
+    return cambios
+
+
+def efectos_movimiento(movimiento):
+    return efectos(
+        movimiento.tipo,
+        movimiento.producto_id,
+        movimiento.bodega_origen_id,
+        movimiento.bodega_destino_id,
+        movimiento.cantidad,
+    )
+
+
+def efectos_lote(movimiento):
+    """
+    Igual que efectos_movimiento pero por lote: (producto_id, bodega_id, lote,
+    delta, fecha_vencimiento). Vacío si el movimiento no trae lote.
+    """
+    if not movimiento.lote:
+        return []
+    return [
+        (producto_id, bodega_id, movimiento.lote, delta, movimiento.fecha_vencimiento)
+        for producto_id, bodega_id, delta in efectos_movimiento(movimiento)
+    ]
+
+
+def efecto_serie(movimiento):
+    """
+    (bodega_id, estado) en que el movimiento deja su número de serie, o None
+    si no trae serie o no mueve stock.
+    """
+    if not movimiento.serie or not movimiento.producto_id:
+        return None
+    if movimiento.tipo in TIPOS_ENTRADA and movimiento.bodega_destino_id:
+        return movimiento.bodega_destino_id, NumeroSerie.EN_BODEGA
+    if movimiento.tipo in TIPOS_SALIDA and movimiento.bodega_origen_id:
+        return None, NumeroSerie.FUERA
+    return None
+
+
+def stock_disponible(producto, bodega):
+    """Stock actual de un producto en una bodega (una sola fila indexada)."""
+    cantidad = (
+        StockBodega.objects
+        .filter(producto=producto, bodega=bodega)
+        .values_list("cantidad", flat=True)
+        .first()
+    )
+    return cantidad if cantidad is not None else Decimal("0")
+
+
+def stock_disponible_productos(productos, bodega):
+    """{producto_id: cantidad} en la bodega para varios productos, en una sola consulta."""
+    disponibles = dict(
+        StockBodega.objects.filter(producto_id__in=productos, bodega=bodega)
+        .values_list("producto_id", "cantidad")
+    )
+    return {producto_id: disponibles.get(producto_id, Decimal("0")) for producto_id in productos}
+
+
+def movimientos_entrada(producto_id, bodega_id, modelo=MovimientoInventario):
+    # order_by() vacío: Meta.ordering ("-fecha") solo agrega un ORDER BY inútil
+    return modelo.objects.order_by().filter(
+        producto_id=producto_id, bodega_destino_id=bodega_id, tipo__in=TIPOS_ENTRADA
+    )
+
+
+def movimientos_salida(producto_id, bodega_id, modelo=MovimientoInventario):
+    return modelo.objects.order_by().filter(
+        producto_id=producto_id, bodega_origen_id=bodega_id, tipo__in=TIPOS_SALIDA
+    )
+
+
+def stock_por_movimientos(producto_id, bodega_id):
+    """
+    Stock calculado desde el historial, vigente y archivado (para auditar
+    stock_bodega). Las sumas se resuelven con los índices compuestos de
+    cada tabla.
+    """
+    total = Decimal("0")
+    for modelo in (MovimientoInventario, MovimientoArchivado):
+        entradas = movimientos_entrada(producto_id, bodega_id, modelo).aggregate(total=Sum("cantidad"))["total"]
+        salidas = movimientos_salida(producto_id, bodega_id, modelo).aggregate(total=Sum("cantidad"))["total"]
+        total += (entradas or Decimal("0")) - (salidas or Decimal("0"))
+    return total
+
+
+class StockInsuficiente(ValidationError):
+    """El movimiento dejaría negativo el stock de una bodega."""
+
+    def __init__(self, disponible, solicitado):
+        self.disponible = disponible
+        self.solicitado = solicitado
+        super().__init__(
+            f"No hay stock suficiente en la bodega origen. "
+            f"Stock disponible: {disponible}, solicitado: {solicitado}."
+        )
+
+
+class LoteInsuficiente(StockInsuficiente):
+    """El movimiento dejaría negativo el saldo de un lote."""
+
+    def __init__(self, lote, disponible, solicitado):
+        self.lote = lote
+        self.disponible = disponible
+        self.solicitado = solicitado
+        donde = f"del lote {lote}" if lote else "en lotes vigentes"
+        ValidationError.__init__(
+            self,
+            f"No hay stock suficiente {donde} en la bodega origen. "
+            f"Stock disponible: {disponible}, solicitado: {solicitado}."
+        )
+
+
+class SerieInvalida(ValidationError):
+    """Ingreso de una serie que ya está en bodega, o salida de una que no está en la bodega origen."""
+
+    def __init__(self, serie, mensaje):
+        self.serie = serie
+        super().__init__(mensaje)
+
+
+def _bloquear(claves):
+    """
+    Bloquea (SELECT ... FOR UPDATE) las filas de stock_bodega de cada
+    (producto_id, bodega_id), creándolas si no existen. Las filas se leen
+    ordenadas por el índice único, así que dos movimientos cruzados las
+    bloquean en el mismo orden y no se bloquean mutuamente; movimientos de
+    otros productos/bodegas no esperan nunca. Son dos consultas sin importar
+    cuántos pares toque el lote.
+    """
+    claves = sorted(set(claves))
+    if not claves:
+        return {}
+    StockBodega.objects.bulk_create(
+        [StockBodega(producto_id=producto_id, bodega_id=bodega_id) for producto_id, bodega_id in claves],
+        ignore_conflicts=True,
+    )
+    condicion = Q()
+    for producto_id, bodega_id in claves:
+        condicion |= Q(producto_id=producto_id, bodega_id=bodega_id)
+    filas = (
+        StockBodega.objects.select_for_update()
+        .filter(condicion)
+        .order_by("producto_id", "bodega_id")
+    )
+    return {(fila.producto_id, fila.bodega_id): fila for fila in filas}
+
+
+def _aplicar(anteriores, nuevos, validar_stock):
+    filas = _bloquear([(p, b) for p, b, _ in anteriores + nuevos])
+
+    netos = {}
+    for producto_id, bodega_id, delta in anteriores:
+        netos[(producto_id, bodega_id)] = netos.get((producto_id, bodega_id), 0) - delta
+    for producto_id, bodega_id, delta in nuevos:
+        netos[(producto_id, bodega_id)] = netos.get((producto_id, bodega_id), 0) + delta
+
+    for clave, neto in netos.items():
+        if not neto:
+            continue
+        fila = filas[clave]
+        # Solo se rechaza lo que descuenta stock; un ingreso nunca falla
+        if validar_stock and neto < 0 and fila.cantidad + neto < 0:
+            raise StockInsuficiente(fila.cantidad, -neto)
+        fila.cantidad += neto
+        fila.save(update_fields=["cantidad", "actualizado_en"])
+
+
+def _invalidar_cierres(*fechas):
+    """
+    Un movimiento con fecha igual o anterior a un cierre cambia ese cierre y
+    todos los siguientes: se descartan para que stock_a_fecha use el cierre
+    previo (cerrar_stock los vuelve a generar).
+    """
+    fechas = [timezone.localdate(f) for f in fechas if f]
+    if fechas:
+        CierreStock.objects.filter(fecha__gte=min(fechas)).delete()
+
+
+def _bloquear_lotes(claves, vencimientos):
+    """Como _bloquear, para las filas de stock_lote de cada (producto_id, bodega_id, lote)."""
+    claves = sorted(set(claves))
+    if not claves:
+        return {}
+    StockLote.objects.bulk_create([
+        StockLote(producto_id=producto_id, bodega_id=bodega_id, lote=lote,
+                  fecha_vencimiento=vencimientos.get((producto_id, lote)))
+        for producto_id, bodega_id, lote in claves
+    ], ignore_conflicts=True)
+    condicion = Q()
+    for producto_id, bodega_id, lote in claves:
+        condicion |= Q(producto_id=producto_id, bodega_id=bodega_id, lote=lote)
+    filas = (
+        StockLote.objects.select_for_update()
+        .filter(condicion)
+        .order_by("producto_id", "bodega_id", "lote")
+    )
+    return {(fila.producto_id, fila.bodega_id, fila.lote): fila for fila in filas}
+
+
+def _aplicar_lotes(anteriores, nuevos, validar_stock):
+    """
+    Mismo esquema que _aplicar sobre stock_lote. Se llama siempre después de
+    _aplicar, así que los lotes se bloquean con la fila de stock_bodega ya
+    tomada y el orden de bloqueo es el mismo en todos los caminos.
+    """
+    vencimientos = {(p, lote): venc for p, _, lote, _, venc in nuevos if venc}
+    filas = _bloquear_lotes([(p, b, lote) for p, b, lote, _, _ in anteriores + nuevos], vencimientos)
+
+    netos = {}
+    for producto_id, bodega_id, lote, delta, _ in anteriores:
+        netos[(producto_id, bodega_id, lote)] = netos.get((producto_id, bodega_id, lote), 0) - delta
+    for producto_id, bodega_id, lote, delta, _ in nuevos:
+        netos[(producto_id, bodega_id, lote)] = netos.get((producto_id, bodega_id, lote), 0) + delta
+
+    for clave, neto in netos.items():
+        fila = filas[clave]
+        vencimiento = vencimientos.get((clave[0], clave[2]))
+        if not neto and (fila.fecha_vencimiento or not vencimiento):
+            continue
+        if validar_stock and neto < 0 and fila.cantidad + neto < 0:
+            raise LoteInsuficiente(fila.lote, fila.cantidad, -neto)
+        fila.cantidad += neto
+        if vencimiento and not fila.fecha_vencimiento:
+            fila.fecha_vencimiento = vencimiento
+        fila.save(update_fields=["cantidad", "fecha_vencimiento", "actualizado_en"])
+
+
+def _bloquear_series(claves):
+    """Como _bloquear, para las filas de numero_serie de cada (producto_id, serie)."""
+    claves = sorted(set(claves))
+    if not claves:
+        return {}
+    NumeroSerie.objects.bulk_create(
+        [NumeroSerie(producto_id=producto_id, serie=serie) for producto_id, serie in claves],
+        ignore_conflicts=True,
+    )
+    condicion = Q()
+    for producto_id, serie in claves:
+        condicion |= Q(producto_id=producto_id, serie=serie)
+    filas = (
+        NumeroSerie.objects.select_for_update()
+        .filter(condicion)
+        .order_by("producto_id", "serie")
+    )
+    return {(fila.producto_id, fila.serie): fila for fila in filas}
+
+
+def _ultimo_con_serie(producto_id, serie, excluir):
+    """Último movimiento (vigente o archivado) que mueve la serie, sin contar los ids de `excluir`."""
+    candidatos = []
+    for modelo in (MovimientoInventario, MovimientoArchivado):
+        ultimo = (
+            modelo.objects.filter(producto_id=producto_id, serie=serie, tipo__in=TIPOS_ENTRADA + TIPOS_SALIDA)
+            .exclude(pk__in=excluir)
+            .order_by("-fecha", "-id")
+            .only("tipo", "producto_id", "serie", "bodega_origen_id", "bodega_destino_id", "fecha")
+            .first()
+        )
+        if ultimo is not None and efecto_serie(ultimo):
+            candidatos.append(ultimo)
+    return max(candidatos, key=lambda m: (m.fecha, m.id), default=None)
+
+
+def _marcar_serie(fila, movimiento):
+    if movimiento is None:
+        fila.bodega_id, fila.estado, fila.tipo_ultimo, fila.fecha_ultimo = None, NumeroSerie.FUERA, "", None
+        return
+    fila.bodega_id, fila.estado = efecto_serie(movimiento)
+    fila.tipo_ultimo = movimiento.tipo
+    fila.fecha_ultimo = movimiento.fecha
+
+
+def _aplicar_series(anteriores, nuevos, validar_stock):
+    """
+    Actualiza numero_serie con los movimientos `nuevos` después de quitar
+    los `anteriores` (edición o eliminación). Al quitar, la serie vuelve al
+    estado de su movimiento previo (una consulta por serie sobre
+    mov_prod_serie_idx). Un movimiento con fecha anterior al último
+    registrado para la serie no cambia su ubicación actual.
+    """
+    anteriores = [m for m in anteriores if efecto_serie(m)]
+    nuevos = [m for m in nuevos if efecto_serie(m)]
+    filas = _bloquear_series([(m.producto_id, m.serie) for m in anteriores + nuevos])
+    if not filas:
+        return
+
+    excluir = [m.pk for m in anteriores if m.pk]
+    for clave in {(m.producto_id, m.serie) for m in anteriores}:
+        _marcar_serie(filas[clave], _ultimo_con_serie(*clave, excluir))
+
+    for movimiento in nuevos:
+        fila = filas[(movimiento.producto_id, movimiento.serie)]
+        if fila.fecha_ultimo and movimiento.fecha < fila.fecha_ultimo:
+            continue
+        if validar_stock:
+            if movimiento.tipo in TIPOS_SALIDA:
+                if fila.estado != NumeroSerie.EN_BODEGA or fila.bodega_id != movimiento.bodega_origen_id:
+                    raise SerieInvalida(movimiento.serie, f"La serie {movimiento.serie} no está en la bodega origen.")
+            elif fila.estado == NumeroSerie.EN_BODEGA:
+                raise SerieInvalida(movimiento.serie, f"La serie {movimiento.serie} ya está ingresada en inventario.")
+        _marcar_serie(fila, movimiento)
+
+    for fila in filas.values():
+        if fila.fecha_ultimo is None:
+            # Serie sin movimientos (nueva rechazada o último movimiento eliminado)
+            fila.delete()
+        else:
+            fila.save()
+
+
+def _al_confirmar(productos, agregados=(), quitados=()):
+    """
+    Tareas que dependen del stock y solo deben correr si la transacción se
+    confirma. agregados y quitados son los movimientos insertados y borrados
+    (para los contadores del inicio; las fechas se leen al confirmar).
+    """
+    productos = set(productos)
+    agregados, quitados = list(agregados), list(quitados)
+    transaction.on_commit(lambda: invalidar_reposicion(productos))
+    transaction.on_commit(lambda: ajustar_movimientos(
+        [m.fecha for m in agregados], [m.fecha for m in quitados]
+    ))
+
+
+def _con_reintentos(funcion):
+    """
+    Reintenta la transacción si la BD la aborta por deadlock o timeout de
+    bloqueo. Dentro de una transacción externa (p. ej. el admin) no se puede
+    reintentar, así que el error se propaga tal cual.
+    """
+    @wraps(funcion)
+    def _envoltura(*args, **kwargs):
+        for intento in range(1, REINTENTOS_BLOQUEO + 1):
+            try:
+                return funcion(*args, **kwargs)
+            except OperationalError:
+                if transaction.get_connection().in_atomic_block or intento == REINTENTOS_BLOQUEO:
+                    raise
+                time.sleep(0.05 * intento)
+    return _envoltura
+
+
+@_con_reintentos
+def guardar_movimiento(movimiento, validar_stock=True):
+    """
+    Guarda (crea o edita) un movimiento y actualiza StockBodega en la misma
+    transacción. Al editar se revierte primero el efecto del registro original.
+    La validación de stock se repite aquí con las filas bloqueadas, así que dos
+    salidas simultáneas no pueden dejar la bodega en negativo: la segunda
+    recibe StockInsuficiente.
+    """
+    with transaction.atomic():
+        anteriores = anteriores_lote = []
+        anterior = None
+        if movimiento.pk:
+            anterior = (
+                MovimientoInventario.objects.select_for_update()
+                .filter(pk=movimiento.pk).first()
+            )
+            if anterior is not None:
+                anteriores = efectos_movimiento(anterior)
+                anteriores_lote = efectos_lote(anterior)
+                _invalidar_cierres(anterior.fecha)
+        _aplicar(anteriores, efectos_movimiento(movimiento), validar_stock)
+        _aplicar_lotes(anteriores_lote, efectos_lote(movimiento), validar_stock)
+        _aplicar_series([anterior] if anterior is not None else [], [movimiento], validar_stock)
+        _invalidar_cierres(movimiento.fecha)
+        actualizar_resumen([anterior] if anterior is not None else [], [movimiento])
+        _al_confirmar(
+            {movimiento.producto_id} | ({anterior.producto_id} if anterior else set()),
+            agregados=[movimiento], quitados=[anterior] if anterior is not None else [],
+        )
+        if movimiento.pk:
+            if (anterior is not None and anterior.tipo != movimiento.tipo
+                    and movimiento.costo_unitario == anterior.costo_unitario):
+                # El costo guardado era del tipo anterior; se vuelve a resolver
+                movimiento.costo_unitario = None
+            movimiento.save()
+            # Una edición cambia la historia de costos: se revaloriza el producto
+            productos = {movimiento.producto_id}
+            if anterior is not None:
+                productos.add(anterior.producto_id)
+            revalorizar_productos(productos)
+        elif productos_atrasados([movimiento]):
+            # Fechado antes del último movimiento del producto: las salidas
+            # posteriores cambian de costo, se revaloriza el producto completo
+            movimiento.save()
+            revalorizar_productos({movimiento.producto_id})
+            movimiento.refresh_from_db(fields=["costo_unitario"])
+        else:
+            valorizar([movimiento])
+            movimiento.save()
+    return movimiento
+
+
+@_con_reintentos
+def guardar_movimientos_lote(movimientos, validar_stock=True):
+    """
+    Inserta movimientos nuevos con bulk_create en una sola transacción,
+    bloqueando una vez cada (producto, bodega) afectado y validando el neto
+    del lote completo.
+    """
+    with transaction.atomic():
+        nuevos = [cambio for m in movimientos for cambio in efectos_movimiento(m)]
+        _aplicar([], nuevos, validar_stock)
+        _aplicar_lotes([], [cambio for m in movimientos for cambio in efectos_lote(m)], validar_stock)
+        _aplicar_series([], movimientos, validar_stock)
+        _invalidar_cierres(*(m.fecha for m in movimientos))
+        actualizar_resumen([], movimientos)
+        atrasados = productos_atrasados(movimientos)
+        valorizar([m for m in movimientos if m.producto_id not in atrasados])
+        _al_confirmar((m.producto_id for m in movimientos), agregados=movimientos)
+        creados = MovimientoInventario.objects.bulk_create(movimientos, batch_size=500)
+        if atrasados:
+            revalorizar_productos(atrasados)
+        return creados
+
+
+@_con_reintentos
+def eliminar_movimiento(movimiento):
+    with transaction.atomic():
+        _aplicar(efectos_movimiento(movimiento), [], validar_stock=False)
+        _aplicar_lotes(efectos_lote(movimiento), [], validar_stock=False)
+        _aplicar_series([movimiento], [], validar_stock=False)
+        _invalidar_cierres(movimiento.fecha)
+        actualizar_resumen([movimiento], [])
+        movimiento.delete()
+        revalorizar_productos({movimiento.producto_id})
+        _al_confirmar({movimiento.producto_id}, quitados=[movimiento])
+
+
+def lotes_fefo(producto, bodega, incluir_vencidos=False):
+    """
+    Lotes con saldo de un producto en una bodega, el que vence primero
+    adelante y los sin vencimiento al final. Una consulta sobre
+    stock_lote_fefo_idx.
+    """
+    qs = StockLote.objects.filter(producto=producto, bodega=bodega, cantidad__gt=0)
+    if not incluir_vencidos:
+        qs = qs.filter(Q(fecha_vencimiento__isnull=True) | Q(fecha_vencimiento__gte=timezone.localdate()))
+    return qs.order_by(F("fecha_vencimiento").asc(nulls_last=True), "lote")
+
+
+def asignar_fefo(producto, bodega, cantidad, incluir_vencidos=False):
+    """
+    Reparte `cantidad` entre los lotes de la bodega por orden FEFO. Devuelve
+    [(StockLote, cantidad_asignada), ...] o lanza LoteInsuficiente si los
+    lotes vigentes no alcanzan. Dentro de una transacción, bloquear antes la
+    fila de stock_bodega del par para que la asignación no cambie.
+    """
+    pendiente = Decimal(cantidad)
+    asignacion = []
+    disponible = Decimal("0")
+    for fila in lotes_fefo(producto, bodega, incluir_vencidos):
+        disponible += fila.cantidad
+        tomado = min(fila.cantidad, pendiente)
+        asignacion.append((fila, tomado))
+        pendiente -= tomado
+        if not pendiente:
+            return asignacion
+    raise LoteInsuficiente(None, disponible, Decimal(cantidad))
+
+
+@_con_reintentos
+def registrar_salida_fefo(movimiento, incluir_vencidos=False):
+    """
+    Registra una SALIDA sin lote partiéndola en una línea por lote asignado
+    (FEFO). `movimiento` no se guarda: sirve de plantilla para las líneas, que
+    comparten documento, motivo y usuario. Devuelve las líneas creadas.
+    """
+    with transaction.atomic():
+        _bloquear([(movimiento.producto_id, movimiento.bodega_origen_id)])
+        asignacion = asignar_fefo(
+            movimiento.producto_id, movimiento.bodega_origen_id, movimiento.cantidad, incluir_vencidos
+        )
+        lineas = []
+        for fila, cantidad in asignacion:
+            linea = copy.copy(movimiento)
+            linea.pk = None
+            linea.cantidad = cantidad
+            linea.lote = fila.lote
+            linea.fecha_vencimiento = fila.fecha_vencimiento
+            linea.manejo_lote = True
+            linea.manejo_vencimiento = bool(fila.fecha_vencimiento)
+            lineas.append(linea)
+        return guardar_movimientos_lote(lineas)
+
+
+def registrar_series(movimiento, series):
+    """
+    Registra un movimiento de varias unidades con número de serie como una
+    línea de cantidad 1 por serie, con las mismas reglas que
+    registrar_salida_fefo. Devuelve las líneas creadas.
+    """
+    lineas = []
+    for serie in series:
+        linea = copy.copy(movimiento)
+        linea.pk = None
+        linea.cantidad = Decimal("1")
+        linea.serie = serie
+        linea.manejo_serie = True
+        lineas.append(linea)
+    return guardar_movimientos_lote(lineas)
+
+
+def ultimas_series():
+    """{(producto_id, serie): último movimiento que la mueve} sobre el historial vigente y archivado."""
+    ultimos = {}
+    for modelo in (MovimientoInventario, MovimientoArchivado):
+        movimientos = (
+            modelo.objects.filter(serie__isnull=False, tipo__in=TIPOS_ENTRADA + TIPOS_SALIDA)
+            .exclude(serie="")
+            .order_by()
+            .only("tipo", "producto_id", "serie", "bodega_origen_id", "bodega_destino_id", "fecha")
+        )
+        for movimiento in movimientos.iterator(chunk_size=2000):
+            if not efecto_serie(movimiento):
+                continue
+            clave = (movimiento.producto_id, movimiento.serie)
+            actual = ultimos.get(clave)
+            if actual is None or (movimiento.fecha, movimiento.id) > (actual.fecha, actual.id):
+                ultimos[clave] = movimiento
+    return ultimos
+
+
+@_con_reintentos
+def registrar_documento(documento, lineas):
+    """
+    Guarda la cabecera y sus líneas en una sola transacción. Las líneas
+    toman tipo, fecha, bodegas, proveedor, doc_referencia, motivo y usuario
+    de la cabecera y se insertan con guardar_movimientos_lote (un bloqueo
+    por producto/bodega y validación del neto de todo el documento).
+    Devuelve las líneas leídas de nuevo desde la BD: en MySQL bulk_create
+    no asigna los id.
+    """
+    with transaction.atomic():
+        documento.save()
+        for linea in lineas:
+            linea.documento = documento
+            linea.tipo = documento.tipo
+            linea.fecha = documento.fecha
+            linea.proveedor_id = documento.proveedor_id
+            linea.bodega_origen_id = documento.bodega_origen_id
+            linea.bodega_destino_id = documento.bodega_destino_id
+            linea.doc_referencia = documento.doc_referencia
+            linea.motivo = documento.motivo
+            linea.usuario_id = documento.usuario_id
+        guardar_movimientos_lote(lineas)
+        return list(documento.lineas.order_by("id"))
+
+
+def saldos_movimientos(movimientos):
+    """
+    Suma neta por (producto_id, bodega_id) de un queryset de movimientos,
+    con dos consultas agrupadas (entradas y salidas).
+    """
+    saldos = {}
+    base = movimientos.order_by()
+
+    entradas = (
+        base.filter(tipo__in=TIPOS_ENTRADA, bodega_destino__isnull=False)
+        .values("producto_id", "bodega_destino_id")
+        .annotate(total=Sum("cantidad"))
+    )
+    for fila in entradas:
+        clave = (fila["producto_id"], fila["bodega_destino_id"])
+        saldos[clave] = saldos.get(clave, Decimal("0")) + fila["total"]
+
+    salidas = (
+        base.filter(tipo__in=TIPOS_SALIDA, bodega_origen__isnull=False)
+        .values("producto_id", "bodega_origen_id")
+        .annotate(total=Sum("cantidad"))
+    )
+    for fila in salidas:
+        clave = (fila["producto_id"], fila["bodega_origen_id"])
+        saldos[clave] = saldos.get(clave, Decimal("0")) - fila["total"]
+    return saldos
+
+
+def saldos_lotes(movimientos):
+    """Como saldos_movimientos, por (producto_id, bodega_id, lote)."""
+    saldos = {}
+    base = movimientos.order_by().filter(lote__isnull=False).exclude(lote="")
+
+    entradas = (
+        base.filter(tipo__in=TIPOS_ENTRADA, bodega_destino__isnull=False)
+        .values("producto_id", "bodega_destino_id", "lote")
+        .annotate(total=Sum("cantidad"))
+    )
+    for fila in entradas:
+        clave = (fila["producto_id"], fila["bodega_destino_id"], fila["lote"])
+        saldos[clave] = saldos.get(clave, Decimal("0")) + fila["total"]
+
+    salidas = (
+        base.filter(tipo__in=TIPOS_SALIDA, bodega_origen__isnull=False)
+        .values("producto_id", "bodega_origen_id", "lote")
+        .annotate(total=Sum("cantidad"))
+    )
+    for fila in salidas:
+        clave = (fila["producto_id"], fila["bodega_origen_id"], fila["lote"])
+        saldos[clave] = saldos.get(clave, Decimal("0")) - fila["total"]
+    return saldos
+
+
+def recalcular_stock():
+    """
+    Reconstruye StockBodega, StockLote y NumeroSerie completos a partir del
+    historial de movimientos (vigentes y archivados).
+    """
+    saldos, lotes, vencimientos = {}, {}, {}
+    for modelo in (MovimientoInventario, MovimientoArchivado):
+        movimientos = modelo.objects.all()
+        for clave, cantidad in saldos_movimientos(movimientos).items():
+            saldos[clave] = saldos.get(clave, Decimal("0")) + cantidad
+        for clave, cantidad in saldos_lotes(movimientos).items():
+            lotes[clave] = lotes.get(clave, Decimal("0")) + cantidad
+        for fila in (
+            movimientos.order_by()
+            .filter(lote__isnull=False, fecha_vencimiento__isnull=False)
+            .values("producto_id", "lote")
+            .annotate(vence=Max("fecha_vencimiento"))
+        ):
+            clave = (fila["producto_id"], fila["lote"])
+            vencimientos[clave] = max(fila["vence"], vencimientos.get(clave, fila["vence"]))
+
+    with transaction.atomic():
+        StockBodega.objects.all().delete()
+        StockBodega.objects.bulk_create([
+            StockBodega(producto_id=producto_id, bodega_id=bodega_id, cantidad=cantidad)
+            for (producto_id, bodega_id), cantidad in saldos.items()
+        ], batch_size=1000)
+        StockLote.objects.all().delete()
+        StockLote.objects.bulk_create([
+            StockLote(producto_id=producto_id, bodega_id=bodega_id, lote=lote, cantidad=cantidad,
+                      fecha_vencimiento=vencimientos.get((producto_id, lote)))
+            for (producto_id, bodega_id, lote), cantidad in lotes.items()
+        ], batch_size=1000)
+        NumeroSerie.objects.all().delete()
+        series = []
+        for movimiento in ultimas_series().values():
+            fila = NumeroSerie(producto_id=movimiento.producto_id, serie=movimiento.serie)
+            _marcar_serie(fila, movimiento)
+            series.append(fila)
+        NumeroSerie.objects.bulk_create(series, batch_size=1000)
+    return len(saldos)
@@ -1,3 +1,1107 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Sum
+from django.db import connection
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts_lilis.models import Usuario
+from catalogo.models import Categoria, Producto
+from proveedores.models import Proveedor, ProveedorProducto
+from proyecto_lilis import replica
+from proyecto_lilis.exportar import respuesta_exportacion
+
+from . import auditoria
+from .archivo import ArchivoInvalido, archivar_movimientos
+from .autocompletar import buscar
+from .cierres import CierreInvalido, cerrar_stock, stock_a_fecha
+from .consultas import COLUMNAS_EXPORTACION, inicio_dia, movimientos_base
+from .contadores import contadores
+from .exportaciones import (
+    MAX_MINUTOS_PROCESO, RETENER_DIAS, limpiar_exportaciones, procesar, solicitar_exportacion,
+    tomar_siguiente,
+)
+from .forms import MovimientoInventarioForm
+from .importacion import COLUMNAS, ErrorImportacion, importar_movimientos, leer_filas
+from .kardex import pagina_kardex
+from .models import (
+    Bodega, CierreStock, DocumentoMovimiento, MovimientoInventario, StockBodega, StockLote, TrabajoExportacion,
+    EventoAuditoria, MovimientoArchivado, NumeroSerie, ResumenDiario, ValorizacionBodega,
+)
+from .reposicion import propuesta_reposicion
+from .resumenes import dia_local, reconstruir_resumen, unidades_por_bodega
+from .stock import (
+    LoteInsuficiente, SerieInvalida, StockInsuficiente, eliminar_movimiento, guardar_movimiento,
+    guardar_movimientos_lote, movimientos_entrada, recalcular_stock, registrar_documento, registrar_salida_fefo,
+    stock_por_movimientos,
+)
+
+
+class InventarioTestCase(TestCase):
+    """Datos mínimos: un usuario, un producto y dos bodegas."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # La auditoría se guarda en el momento, sin el hilo de fondo (otra conexión)
+        sincrona = mock.patch("inventario.auditoria.SINCRONA", True)
+        sincrona.start()
+        cls.addClassCleanup(sincrona.stop)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user(
+            username="operador", email="operador@lilis.cl", password="clave-segura-123", rol="ADMIN"
+        )
+        cls.categoria = Categoria.objects.create(nombre="Pruebas")
+        cls.producto = Producto.objects.create(sku="P-001", nombre="Producto de prueba", categoria=cls.categoria)
+        cls.central = Bodega.objects.create(codigo="B01", nombre="Central")
+        cls.sucursal = Bodega.objects.create(codigo="B02", nombre="Sucursal")
+
+    def movimiento(self, tipo, cantidad, origen=None, destino=None, **campos):
+        campos.setdefault("producto", self.producto)
+        return MovimientoInventario(
+            tipo=tipo, cantidad=Decimal(cantidad), bodega_origen=origen, bodega_destino=destino,
+            usuario=self.usuario, **campos,
+        )
+
+    def ingreso(self, cantidad, bodega=None, **campos):
+        return guardar_movimiento(self.movimiento("INGRESO", cantidad, destino=bodega or self.central, **campos))
+
+    def stock(self, bodega, producto=None):
+        fila = StockBodega.objects.filter(producto=producto or self.producto, bodega=bodega).first()
+        return fila.cantidad if fila else Decimal("0")
+
+
+class StockBodegaTests(InventarioTestCase):
+    def test_crear_editar_y_eliminar_ajustan_el_saldo(self):
+        ingreso = self.ingreso(10)
+        self.assertEqual(self.stock(self.central), 10)
+
+        transferencia = guardar_movimiento(
+            self.movimiento("TRANSFERENCIA", 4, origen=self.central, destino=self.sucursal)
+        )
+        self.assertEqual(self.stock(self.central), 6)
+        self.assertEqual(self.stock(self.sucursal), 4)
+
+        # Editar revierte el efecto anterior antes de aplicar el nuevo
+        ingreso.cantidad = Decimal("15")
+        guardar_movimiento(ingreso)
+        self.assertEqual(self.stock(self.central), 11)
+
+        eliminar_movimiento(transferencia)
+        self.assertEqual(self.stock(self.central), 15)
+        self.assertEqual(self.stock(self.sucursal), 0)
+
+    def test_editar_cambiando_la_bodega_mueve_el_saldo(self):
+        ingreso = self.ingreso(8)
+        ingreso.bodega_destino = self.sucursal
+        guardar_movimiento(ingreso)
+        self.assertEqual(self.stock(self.central), 0)
+        self.assertEqual(self.stock(self.sucursal), 8)
+
+    def test_recalcular_stock_reconstruye_desde_los_movimientos(self):
+        self.ingreso(10)
+        guardar_movimiento(self.movimiento("SALIDA", 3, origen=self.central))
+        StockBodega.objects.update(cantidad=Decimal("999"))
+
+        recalcular_stock()
+        self.assertEqual(self.stock(self.central), 7)
+
+    def test_salida_mayor_al_stock_se_rechaza(self):
+        self.ingreso(5)
+        with self.assertRaises(StockInsuficiente) as error:
+            guardar_movimiento(self.movimiento("SALIDA", 8, origen=self.central))
+        self.assertEqual(error.exception.disponible, 5)
+        self.assertEqual(self.stock(self.central), 5)
+        self.assertEqual(MovimientoInventario.objects.count(), 1)
+
+    def test_editar_una_salida_por_sobre_el_stock_se_rechaza(self):
+        self.ingreso(5)
+        salida = guardar_movimiento(self.movimiento("SALIDA", 3, origen=self.central))
+        salida.cantidad = Decimal("6")
+        with self.assertRaises(StockInsuficiente):
+            guardar_movimiento(salida)
+        self.assertEqual(self.stock(self.central), 2)
+        salida.refresh_from_db()
+        self.assertEqual(salida.cantidad, 3)
+
+    def test_sin_validar_stock_se_permite_el_saldo_negativo(self):
+        # Camino de corrección del admin: toma los bloqueos pero no valida
+        guardar_movimiento(self.movimiento("SALIDA", 2, origen=self.central), validar_stock=False)
+        self.assertEqual(self.stock(self.central), -2)
+
+
+class ListadoMovimientosTests(InventarioTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        base = timezone.now() - timedelta(days=5)
+        # Dos movimientos por instante: el id desempata el orden
+        cls.movimientos = MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(
+                tipo="INGRESO" if i % 3 else "SALIDA", producto=cls.producto, cantidad=1,
+                bodega_destino=cls.central, bodega_origen=cls.central, usuario=cls.usuario,
+                fecha=base + timedelta(days=i // 2),
+            )
+            for i in range(7)
+        ])
+        cls.esperados = [
+            m.pk for m in MovimientoInventario.objects.order_by("-fecha", "-id")
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse("inventario:movimientos_listar")
+
+    def pagina(self, **params):
+        respuesta = self.client.get(self.url, {"formato": "json", "size": 5, **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def ids(self, datos):
+        return [fila["id"] for fila in datos["resultados"]]
+
+    def test_cursores_recorren_todas_las_filas_sin_repetir(self):
+        primera = self.pagina()
+        self.assertEqual(self.ids(primera), self.esperados[:5])
+        self.assertIsNone(primera["anterior"])
+
+        segunda = self.pagina(cursor=primera["siguiente"])
+        self.assertEqual(self.ids(segunda), self.esperados[5:])
+        self.assertIsNone(segunda["siguiente"])
+
+        # Volver atrás desde la segunda página entrega la primera
+        self.assertEqual(self.ids(self.pagina(antes=segunda["anterior"])), self.esperados[:5])
+
+    def test_filtros_por_tipo_y_rango_de_fechas(self):
+        salidas = self.pagina(tipo="SALIDA")
+        self.assertEqual(
+            self.ids(salidas),
+            list(MovimientoInventario.objects.filter(tipo="SALIDA").order_by("-fecha", "-id")
+                 .values_list("pk", flat=True)),
+        )
+        hoy = timezone.localdate()
+        recientes = self.pagina(desde=(hoy - timedelta(days=3)).isoformat(), size=10)
+        self.assertEqual(
+            self.ids(recientes),
+            list(MovimientoInventario.objects.filter(fecha__date__gte=hoy - timedelta(days=3))
+                 .order_by("-fecha", "-id").values_list("pk", flat=True)),
+        )
+
+    def test_cursor_invalido_vuelve_a_la_primera_pagina(self):
+        self.assertEqual(self.ids(self.pagina(cursor="no-es-un-cursor")), self.esperados[:5])
+
+
+class MotorExportacionTests(InventarioTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(
+                tipo="INGRESO", producto=cls.producto, cantidad=i + 1, bodega_destino=cls.central,
+                usuario=cls.usuario, lote=f"L-{i}", fecha=timezone.now() - timedelta(hours=i),
+            )
+            for i in range(5)
+        ])
+
+    def exportar(self, formato):
+        qs = movimientos_base().order_by("id")
+        return respuesta_exportacion(qs, COLUMNAS_EXPORTACION, "movimientos", formato, chunk_size=2)
+
+    def test_csv_se_transmite_por_filas(self):
+        respuesta = self.exportar("csv")
+        self.assertTrue(respuesta.streaming)
+        self.assertIn('filename="movimientos.csv"', respuesta["Content-Disposition"])
+        contenido = b"".join(respuesta.streaming_content).decode("utf-8")
+        self.assertTrue(contenido.startswith("\ufeff"))
+        lineas = list(csv.reader(io.StringIO(contenido[1:])))
+        self.assertEqual(lineas[0], [titulo for titulo, _ in COLUMNAS_EXPORTACION])
+        self.assertEqual([fila[8] for fila in lineas[1:]], [f"L-{i}" for i in range(5)])
+
+    def test_ndjson_entrega_un_objeto_por_linea(self):
+        respuesta = self.exportar("ndjson")
+        lineas = b"".join(respuesta.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lineas), 5)
+        primera = json.loads(lineas[0])
+        self.assertEqual(primera["Lote"], "L-0")
+        self.assertEqual(primera["Bodega destino"], "Central")
+
+    def test_xlsx_tiene_encabezado_y_todas_las_filas(self):
+        from openpyxl import load_workbook
+
+        respuesta = self.exportar("xlsx")
+        libro = load_workbook(io.BytesIO(b"".join(respuesta.streaming_content)), read_only=True)
+        filas = list(libro.active.iter_rows(values_only=True))
+        self.assertEqual(filas[0][0], "ID")
+        self.assertEqual(len(filas), 6)
+
+
+@override_settings(ARCHIVOS_PRIVADOS_ROOT=tempfile.mkdtemp(prefix="lilis-privado-"))
+class TrabajosExportacionTests(InventarioTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(
+                tipo="INGRESO", producto=cls.producto, cantidad=1, bodega_destino=cls.central,
+                usuario=cls.usuario,
+            )
+            for _ in range(3)
+        ])
+
+    def tearDown(self):
+        shutil.rmtree(settings.ARCHIVOS_PRIVADOS_ROOT, ignore_errors=True)
+
+    def test_solicitud_identica_reutiliza_el_trabajo(self):
+        primero = solicitar_exportacion(self.usuario, "movimientos", "csv", {"tipo": "INGRESO", "size": "10"})
+        segundo = solicitar_exportacion(self.usuario, "movimientos", "csv", {"tipo": "INGRESO"})
+        otro = solicitar_exportacion(self.usuario, "movimientos", "xlsx", {"tipo": "INGRESO"})
+        self.assertEqual(primero.pk, segundo.pk)
+        self.assertNotEqual(primero.pk, otro.pk)
+
+    def test_trabajo_colgado_no_se_reutiliza_y_pasa_a_error(self):
+        colgado = solicitar_exportacion(self.usuario, "movimientos", "csv", {})
+        TrabajoExportacion.objects.filter(pk=colgado.pk).update(
+            estado="EN_PROCESO", iniciado_en=timezone.now() - timedelta(minutes=MAX_MINUTOS_PROCESO + 1),
+        )
+        nuevo = solicitar_exportacion(self.usuario, "movimientos", "csv", {})
+        self.assertNotEqual(nuevo.pk, colgado.pk)
+
+        self.assertEqual(tomar_siguiente().pk, nuevo.pk)
+        colgado.refresh_from_db()
+        self.assertEqual(colgado.estado, "ERROR")
+
+    def test_archivo_queda_fuera_de_media_y_se_descarga_con_permiso(self):
+        solicitar_exportacion(self.usuario, "movimientos", "csv", {})
+        trabajo = procesar(tomar_siguiente())
+        ruta = trabajo.archivo.path
+        self.assertTrue(ruta.startswith(os.path.abspath(settings.ARCHIVOS_PRIVADOS_ROOT)))
+        self.assertFalse(ruta.startswith(os.path.abspath(settings.MEDIA_ROOT)))
+        self.assertEqual(trabajo.filas_procesadas, 3)
+
+        url = reverse("inventario:exportacion_descargar", args=[trabajo.pk])
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(b"".join(respuesta.streaming_content).decode("utf-8-sig").splitlines()), 4)
+
+        ventas = Usuario.objects.create_user(
+            username="ventas", email="ventas@lilis.cl", password="clave-segura-123", rol="OPER_VENTAS"
+        )
+        self.client.force_login(ventas)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_xlsx_grande_se_envia_a_segundo_plano(self):
+        self.client.force_login(self.usuario)
+        url = reverse("inventario:movimientos_exportar_excel")
+        with mock.patch("inventario.exportaciones.XLSX_MAX_FILAS", 2):
+            respuesta = self.client.get(url, {"formato": "xlsx"})
+            trabajo = TrabajoExportacion.objects.get()
+            self.assertRedirects(
+                respuesta, reverse("inventario:exportacion_estado", args=[trabajo.pk]),
+                fetch_redirect_response=False,
+            )
+            # CSV se transmite directo aunque sea grande
+            self.assertTrue(self.client.get(url, {"formato": "csv"}).streaming)
+
+    def test_limpieza_borra_trabajos_y_archivos_viejos(self):
+        solicitar_exportacion(self.usuario, "movimientos", "csv", {})
+        trabajo = procesar(tomar_siguiente())
+        ruta = trabajo.archivo.path
+        TrabajoExportacion.objects.filter(pk=trabajo.pk).update(
+            terminado_en=timezone.now() - timedelta(days=RETENER_DIAS + 1)
+        )
+        self.assertEqual(limpiar_exportaciones(), (1, 1))
+        self.assertFalse(os.path.exists(ruta))
+
+
+class IndicesMovimientoTests(InventarioTestCase):
+    def test_stock_por_movimientos_coincide_con_stock_bodega(self):
+        self.ingreso(10)
+        guardar_movimiento(self.movimiento("TRANSFERENCIA", 4, origen=self.central, destino=self.sucursal))
+        self.assertEqual(stock_por_movimientos(self.producto.pk, self.central.pk), self.stock(self.central))
+        self.assertEqual(stock_por_movimientos(self.producto.pk, self.sucursal.pk), 4)
+
+    def test_suma_de_entradas_usa_el_indice_compuesto(self):
+        plan = movimientos_entrada(self.producto.pk, self.central.pk).values("producto").annotate(
+            total=Sum("cantidad")
+        ).explain()
+        self.assertIn("mov_prod_dest_tipo_idx", plan)
+
+    def test_explicar_consultas_muestra_cada_plan(self):
+        self.ingreso(3)
+        salida = io.StringIO()
+        call_command("explicar_consultas", stdout=salida)
+        self.assertIn("== Stock: entradas a bodega", salida.getvalue())
+        self.assertIn("== Listado: primera página", salida.getvalue())
+
+
+class ImportacionTests(InventarioTestCase):
+    def fila(self, tipo, cantidad, origen="", destino="", **campos):
+        fila = dict.fromkeys(COLUMNAS, "")
+        fila.update(tipo=tipo, sku=self.producto.sku, cantidad=str(cantidad),
+                    bodega_origen=origen, bodega_destino=destino, **campos)
+        return fila
+
+    def filas(self):
+        return [
+            self.fila("INGRESO", 10, destino="B01"),
+            self.fila("SALIDA", 4, origen="B01"),
+            self.fila("SALIDA", 20, origen="B01"),
+            self.fila("INGRESO", 3, destino="NO-EXISTE"),
+            self.fila("TRANSFERENCIA", 2, origen="B01", destino="B02"),
+        ]
+
+    def test_con_errores_no_importa_nada(self):
+        creados, errores = importar_movimientos(self.filas(), self.usuario)
+        self.assertEqual(creados, [])
+        self.assertEqual([numero for numero, _ in errores], [4, 5])
+        self.assertFalse(MovimientoInventario.objects.exists())
+
+    def test_parcial_importa_las_filas_validas(self):
+        creados, errores = importar_movimientos(self.filas(), self.usuario, parcial=True)
+        self.assertEqual(len(creados), 3)
+        self.assertEqual([numero for numero, _ in errores], [4, 5])
+        self.assertEqual(self.stock(self.central), 4)
+        self.assertEqual(self.stock(self.sucursal), 2)
+
+    def test_cantidades_no_finitas_y_textos_largos_son_errores_de_fila(self):
+        filas = [
+            self.fila("INGRESO", "NaN", destino="B01"),
+            self.fila("INGRESO", "Infinity", destino="B01"),
+            self.fila("INGRESO", 1, destino="B01", lote="L" * 51),
+            self.fila("INGRESO", 1, destino="B01", motivo="m" * 201),
+            self.fila("INGRESO", 1, destino="B01", lote="L" * 50),
+        ]
+        creados, errores = importar_movimientos(filas, self.usuario, parcial=True)
+        self.assertEqual([numero for numero, _ in errores], [2, 3, 4, 5])
+        self.assertIn("lote", errores[2][1])
+        self.assertEqual(len(creados), 1)
+
+    def test_leer_csv_con_encabezados_en_mayusculas(self):
+        archivo = io.BytesIO("\ufeffTIPO,SKU,Cantidad,bodega_destino\nINGRESO,P-001,5,B01\n,,,\n".encode("utf-8"))
+        filas = leer_filas(archivo, "movimientos.csv")
+        self.assertEqual(len(filas), 1)
+        self.assertEqual((filas[0]["tipo"], filas[0]["cantidad"], filas[0]["lote"]), ("INGRESO", "5", None))
+
+    def test_archivo_sin_columnas_obligatorias(self):
+        with self.assertRaises(ErrorImportacion):
+            leer_filas(io.BytesIO(b"tipo,sku\nINGRESO,P-001\n"), "movimientos.csv")
+
+
+class CierreStockTests(InventarioTestCase):
+    def setUp(self):
+        hoy = timezone.localdate()
+        self.hace_tres = timezone.now() - timedelta(days=3)
+        self.dia_cierre = hoy - timedelta(days=2)
+        self.ayer = hoy - timedelta(days=1)
+        self.ingreso(20, fecha=self.hace_tres)
+        guardar_movimiento(self.movimiento("SALIDA", 5, origen=self.central, fecha=self.hace_tres))
+        self.de_ayer = self.ingreso(7, fecha=timezone.now() - timedelta(days=1))
+
+    def test_stock_a_fecha_parte_del_cierre(self):
+        self.assertEqual(cerrar_stock(self.dia_cierre), 1)
+        self.assertEqual(CierreStock.objects.get(fecha=self.dia_cierre).cantidad, 15)
+        # El historial anterior al cierre ya no se lee
+        MovimientoInventario.objects.filter(fecha__lt=inicio_dia(self.ayer)).update(cantidad=1000)
+
+        self.assertEqual(stock_a_fecha(self.producto, self.central, self.dia_cierre), 15)
+        self.assertEqual(stock_a_fecha(self.producto, self.central, self.ayer), 22)
+        self.assertEqual(stock_a_fecha(self.producto, self.central, self.dia_cierre - timedelta(days=1)), 0)
+
+    def test_movimiento_anterior_al_cierre_lo_descarta(self):
+        cerrar_stock(self.dia_cierre)
+        cerrar_stock(self.ayer)
+        self.ingreso(1, fecha=self.hace_tres)
+        self.assertFalse(CierreStock.objects.exists())
+        self.assertEqual(stock_a_fecha(self.producto, self.central, self.dia_cierre), 16)
+
+        cerrar_stock(self.dia_cierre)
+        eliminar_movimiento(self.de_ayer)
+        self.assertEqual(list(CierreStock.objects.values_list("fecha", flat=True)), [self.dia_cierre])
+
+    def test_no_se_cierra_el_dia_en_curso(self):
+        with self.assertRaises(CierreInvalido):
+            cerrar_stock(timezone.localdate())
+
+    def test_vista_stock_a_fecha(self):
+        cerrar_stock(self.dia_cierre)
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(
+            reverse("inventario:stock_a_fecha"), {"fecha": self.ayer.isoformat(), "bodega": self.central.pk}
+        )
+        datos = respuesta.json()
+        self.assertEqual(datos["cierre_base"], self.dia_cierre.isoformat())
+        self.assertEqual([fila["cantidad"] for fila in datos["resultados"]], ["22.000"])
+
+
+class FefoTests(InventarioTestCase):
+    def setUp(self):
+        hoy = timezone.localdate()
+        self.ingreso(5, lote="L-LEJANO", fecha_vencimiento=hoy + timedelta(days=30), manejo_lote=True)
+        self.ingreso(4, lote="L-PROXIMO", fecha_vencimiento=hoy + timedelta(days=10), manejo_lote=True)
+        self.ingreso(3, lote="L-VENCIDO", fecha_vencimiento=hoy - timedelta(days=1), manejo_lote=True)
+
+    def test_salida_se_reparte_por_vencimiento(self):
+        lineas = registrar_salida_fefo(self.movimiento("SALIDA", 6, origen=self.central))
+        self.assertEqual(
+            [(linea.lote, linea.cantidad) for linea in lineas],
+            [("L-PROXIMO", Decimal("4")), ("L-LEJANO", Decimal("2"))],
+        )
+        saldos = dict(StockLote.objects.values_list("lote", "cantidad"))
+        self.assertEqual(saldos, {"L-PROXIMO": 0, "L-LEJANO": 3, "L-VENCIDO": 3})
+        self.assertEqual(self.stock(self.central), 6)
+
+    def test_lotes_vencidos_no_alcanzan_para_la_salida(self):
+        with self.assertRaises(LoteInsuficiente) as error:
+            registrar_salida_fefo(self.movimiento("SALIDA", 10, origen=self.central))
+        self.assertEqual(error.exception.disponible, 9)
+        self.assertEqual(self.stock(self.central), 12)
+
+    def test_salida_mayor_al_saldo_del_lote_se_rechaza(self):
+        with self.assertRaises(LoteInsuficiente):
+            guardar_movimiento(self.movimiento("SALIDA", 5, origen=self.central, lote="L-PROXIMO"))
+        self.assertEqual(StockLote.objects.get(lote="L-PROXIMO").cantidad, 4)
+
+    def test_importacion_rechaza_por_fila_el_lote_sin_saldo(self):
+        fila = dict.fromkeys(COLUMNAS, "")
+        fila.update(tipo="SALIDA", sku=self.producto.sku, bodega_origen="B01")
+        filas = [
+            {**fila, "cantidad": "3", "lote": "L-PROXIMO"},
+            {**fila, "cantidad": "3", "lote": "L-PROXIMO"},
+            {**fila, "cantidad": "1", "lote": "L-PROXIMO"},
+        ]
+        creados, errores = importar_movimientos(filas, self.usuario, parcial=True)
+        self.assertEqual(len(creados), 2)
+        self.assertEqual([numero for numero, _ in errores], [3])
+        self.assertIn("lote L-PROXIMO", errores[0][1])
+        self.assertEqual(StockLote.objects.get(lote="L-PROXIMO").cantidad, 0)
+
+
+class KardexTests(InventarioTestCase):
+    def setUp(self):
+        inicio = timezone.now() - timedelta(days=4)
+        # +10, -3, +5 (transferencia a sucursal: -2 en central), -1, +4, -6
+        pasos = [
+            ("INGRESO", 10, None, self.central),
+            ("SALIDA", 3, self.central, None),
+            ("INGRESO", 5, None, self.central),
+            ("TRANSFERENCIA", 2, self.central, self.sucursal),
+            ("SALIDA", 1, self.central, None),
+            ("INGRESO", 4, None, self.central),
+            ("SALIDA", 6, self.central, None),
+        ]
+        for i, (tipo, cantidad, origen, destino) in enumerate(pasos):
+            guardar_movimiento(self.movimiento(
+                tipo, cantidad, origen=origen, destino=destino, fecha=inicio + timedelta(hours=12 * i)
+            ))
+        self.saldos = [10, 7, 12, 10, 9, 13, 7]
+
+    def test_saldo_acumulado_se_mantiene_entre_paginas(self):
+        saldos = []
+        pagina = pagina_kardex(self.producto, self.central, tamano=3)
+        self.assertEqual(pagina["saldo_inicial"], 0)
+        paginas = [pagina]
+        while pagina["siguiente"]:
+            pagina = pagina_kardex(self.producto, self.central, tamano=3, despues=pagina["siguiente"])
+            paginas.append(pagina)
+        for pagina in paginas:
+            saldos += [fila.saldo for fila in pagina["movimientos"]]
+        self.assertEqual(saldos, self.saldos)
+        self.assertEqual(len(paginas), 3)
+
+        # Hacia atrás desde la última página se recupera la anterior con sus saldos
+        atras = pagina_kardex(self.producto, self.central, tamano=3, antes=paginas[-1]["anterior"])
+        self.assertEqual([fila.saldo for fila in atras["movimientos"]], self.saldos[3:6])
+        self.assertEqual(atras["saldo_inicial"], self.saldos[2])
+
+    def test_desde_parte_del_saldo_anterior(self):
+        desde = timezone.localdate(timezone.now() - timedelta(days=2))
+        pagina = pagina_kardex(self.producto, self.central, desde=desde, tamano=10)
+        primera = MovimientoInventario.objects.filter(fecha__gte=inicio_dia(desde)).count()
+        self.assertEqual([fila.saldo for fila in pagina["movimientos"]], self.saldos[-primera:])
+        self.assertEqual(pagina["saldo_inicial"], self.saldos[-primera - 1])
+
+    def test_sin_bodega_las_transferencias_no_cambian_el_saldo(self):
+        pagina = pagina_kardex(self.producto, tamano=10)
+        self.assertEqual(pagina["saldo_final"], self.stock(self.central) + self.stock(self.sucursal))
+
+    def test_cursor_adulterado_se_ignora(self):
+        pagina = pagina_kardex(self.producto, self.central, tamano=3)
+        adulterado = pagina["siguiente"][:-2] + "xx"
+        self.assertEqual(
+            [f.pk for f in pagina_kardex(self.producto, self.central, tamano=3, despues=adulterado)["movimientos"]],
+            [f.pk for f in pagina["movimientos"]],
+        )
+
+
+class CostoPromedioTests(InventarioTestCase):
+    def valorizacion(self):
+        return ValorizacionBodega.objects.get(producto=self.producto, bodega=self.central)
+
+    def test_promedio_ponderado(self):
+        self.ingreso(10, costo_unitario=Decimal("100"))
+        self.ingreso(30, costo_unitario=Decimal("200"))
+        fila = self.valorizacion()
+        self.assertEqual(fila.cantidad, 40)
+        self.assertEqual(fila.costo_promedio, Decimal("175"))
+        self.assertEqual(fila.valor_total, Decimal("7000"))
+
+    def test_editar_un_ingreso_revaloriza_el_historial(self):
+        primero = self.ingreso(10, costo_unitario=Decimal("100"))
+        self.ingreso(10, costo_unitario=Decimal("200"))
+        salida = guardar_movimiento(self.movimiento("SALIDA", 5, origen=self.central))
+        self.assertEqual(salida.costo_unitario, Decimal("150"))
+
+        primero.costo_unitario = Decimal("300")
+        guardar_movimiento(primero)
+
+        salida.refresh_from_db()
+        self.assertEqual(salida.costo_unitario, Decimal("250"))
+        fila = self.valorizacion()
+        self.assertEqual(fila.cantidad, 15)
+        self.assertEqual(fila.costo_promedio, Decimal("250"))
+
+    def test_eliminar_un_ingreso_revaloriza_el_historial(self):
+        primero = self.ingreso(10, costo_unitario=Decimal("100"))
+        self.ingreso(10, costo_unitario=Decimal("200"))
+        eliminar_movimiento(primero)
+        fila = self.valorizacion()
+        self.assertEqual(fila.cantidad, 10)
+        self.assertEqual(fila.costo_promedio, Decimal("200"))
+
+    def test_ingreso_con_fecha_anterior_revaloriza_las_salidas_posteriores(self):
+        ahora = timezone.now()
+        self.ingreso(10, costo_unitario=Decimal("100"), fecha=ahora - timedelta(days=2))
+        salida = guardar_movimiento(
+            self.movimiento("SALIDA", 5, origen=self.central, fecha=ahora - timedelta(days=1))
+        )
+        self.assertEqual(salida.costo_unitario, Decimal("100"))
+
+        self.ingreso(10, costo_unitario=Decimal("400"), fecha=ahora - timedelta(days=3))
+
+        salida.refresh_from_db()
+        self.assertEqual(salida.costo_unitario, Decimal("250"))
+        fila = self.valorizacion()
+        self.assertEqual(fila.cantidad, 15)
+        self.assertEqual(fila.costo_promedio, Decimal("250"))
+
+    def test_lote_con_fecha_anterior_revaloriza_el_producto(self):
+        ahora = timezone.now()
+        self.ingreso(10, costo_unitario=Decimal("100"), fecha=ahora - timedelta(days=1))
+        salida = guardar_movimiento(self.movimiento("SALIDA", 10, origen=self.central, fecha=ahora))
+
+        guardar_movimientos_lote([
+            self.movimiento("INGRESO", 10, destino=self.central, costo_unitario=Decimal("300"),
+                            fecha=ahora - timedelta(days=2)),
+        ])
+
+        salida.refresh_from_db()
+        self.assertEqual(salida.costo_unitario, Decimal("200"))
+        fila = self.valorizacion()
+        self.assertEqual(fila.cantidad, 10)
+        self.assertEqual(fila.costo_promedio, Decimal("200"))
+
+
+class ReposicionTests(InventarioTestCase):
+    def setUp(self):
+        cache.clear()
+        self.producto.punto_reorden = 10
+        self.producto.stock_maximo = 50
+        self.producto.save()
+        self.preferente = self.oferta("11.111.111-1", Decimal("120"), min_lote=20, preferente=True)
+        self.oferta("22.222.222-2", Decimal("100"), min_lote=12)
+
+    def oferta(self, rut, costo, **campos):
+        proveedor = Proveedor.objects.create(
+            rut_nif=rut, razon_social=f"Proveedor {rut}", email="compras@lilis.cl",
+            condiciones_pago="30", moneda="CLP",
+        )
+        return ProveedorProducto.objects.create(proveedor=proveedor, producto=self.producto, costo=costo, **campos)
+
+    def test_propuesta_con_proveedor_preferente_y_lote_minimo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingreso(5)
+        propuesta = propuesta_reposicion()["propuesta"]
+        self.assertEqual(len(propuesta), 1)
+        fila = propuesta[0]
+        self.assertEqual(fila["stock"], 5)
+        self.assertEqual(fila["proveedor_id"], self.preferente.proveedor_id)
+        # Faltan 45 para el stock máximo: se sube a tres lotes de 20
+        self.assertEqual(fila["cantidad_sugerida"], 60)
+        self.assertEqual(fila["costo_total"], Decimal("7200.00"))
+
+    def test_sin_preferente_gana_el_menor_costo_neto(self):
+        self.preferente.preferente = False
+        self.preferente.descuento_pct = Decimal("25")
+        self.preferente.save()
+        fila = propuesta_reposicion()["propuesta"][0]
+        self.assertEqual(fila["proveedor_id"], self.preferente.proveedor_id)
+        self.assertEqual(fila["costo_unitario"], Decimal("90.00"))
+
+    def test_movimiento_de_producto_vigilado_invalida_la_cache(self):
+        self.assertEqual(len(propuesta_reposicion()["propuesta"]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingreso(30)
+        self.assertEqual(propuesta_reposicion()["propuesta"], [])
+
+    def test_movimiento_de_producto_no_vigilado_conserva_la_cache(self):
+        otro = Producto.objects.create(sku="P-002", nombre="Sin punto de reorden", categoria=self.categoria)
+        calculado_en = propuesta_reposicion()["calculado_en"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingreso(3, producto=otro)
+        self.assertEqual(propuesta_reposicion()["calculado_en"], calculado_en)
+
+
+class ArchivoTests(InventarioTestCase):
+    def setUp(self):
+        ahora = timezone.now()
+        self.hace_tres = (ahora - timedelta(days=3)).replace(hour=12)
+        self.dia_cierre = timezone.localdate() - timedelta(days=2)
+        self.antiguo_ingreso = self.ingreso(20, fecha=self.hace_tres)
+        self.antigua_salida = guardar_movimiento(
+            self.movimiento("SALIDA", 5, origen=self.central, fecha=self.hace_tres + timedelta(hours=1))
+        )
+        self.reciente = self.ingreso(7, fecha=ahora)
+
+    def test_archivar_exige_cierre(self):
+        with self.assertRaises(ArchivoInvalido):
+            archivar_movimientos(self.dia_cierre)
+        self.assertEqual(MovimientoInventario.objects.count(), 3)
+
+    def test_archivar_conserva_el_stock_a_fecha(self):
+        cerrar_stock(self.dia_cierre)
+        archivados = archivar_movimientos(self.dia_cierre, tamano_lote=1)
+
+        self.assertEqual(archivados, 2)
+        self.assertEqual(list(MovimientoInventario.objects.values_list("pk", flat=True)), [self.reciente.pk])
+        self.assertEqual(
+            set(MovimientoArchivado.objects.values_list("pk", flat=True)),
+            {self.antiguo_ingreso.pk, self.antigua_salida.pk},
+        )
+        self.assertEqual(stock_a_fecha(self.producto, self.central, self.dia_cierre), 15)
+        self.assertEqual(stock_a_fecha(self.producto, self.central, timezone.localdate()), 22)
+        self.assertEqual(self.stock(self.central), 22)
+        self.assertEqual(stock_por_movimientos(self.producto.pk, self.central.pk), 22)
+
+    def test_listado_incluye_archivados_solo_si_el_rango_llega(self):
+        cerrar_stock(self.dia_cierre)
+        archivar_movimientos(self.dia_cierre)
+        self.client.force_login(self.usuario)
+        url = reverse("inventario:movimientos_listar")
+
+        respuesta = self.client.get(url, {"formato": "json"})
+        ids = [fila["id"] for fila in respuesta.json()["resultados"]]
+        self.assertEqual(ids, [self.reciente.pk, self.antigua_salida.pk, self.antiguo_ingreso.pk])
+
+        desde = (timezone.localdate() - timedelta(days=1)).isoformat()
+        respuesta = self.client.get(url, {"formato": "json", "desde": desde})
+        ids = [fila["id"] for fila in respuesta.json()["resultados"]]
+        self.assertEqual(ids, [self.reciente.pk])
+
+    def test_kardex_cruza_vigentes_y_archivados(self):
+        cerrar_stock(self.dia_cierre)
+        archivar_movimientos(self.dia_cierre)
+        pagina = pagina_kardex(self.producto, self.central, tamano=2)
+        siguiente = pagina_kardex(self.producto, self.central, tamano=2, despues=pagina["siguiente"])
+
+        filas = pagina["movimientos"] + siguiente["movimientos"]
+        self.assertEqual(
+            [f.pk for f in filas], [self.antiguo_ingreso.pk, self.antigua_salida.pk, self.reciente.pk]
+        )
+        self.assertEqual([f.saldo for f in filas], [20, 15, 22])
+
+
+class ResumenDiarioTests(InventarioTestCase):
+    def filas(self):
+        return {
+            (f.bodega_id, f.tipo): (f.cantidad_entrada, f.cantidad_salida, f.movimientos)
+            for f in ResumenDiario.objects.filter(producto=self.producto)
+        }
+
+    def test_alta_suma_y_transferencia_aparece_en_ambas_bodegas(self):
+        self.ingreso(10)
+        self.ingreso(5)
+        guardar_movimiento(self.movimiento("TRANSFERENCIA", 4, origen=self.central, destino=self.sucursal))
+        self.assertEqual(self.filas(), {
+            (self.central.pk, "INGRESO"): (15, 0, 2),
+            (self.central.pk, "TRANSFERENCIA"): (0, 4, 1),
+            (self.sucursal.pk, "TRANSFERENCIA"): (4, 0, 1),
+        })
+
+    def test_edicion_mueve_el_delta_y_eliminacion_borra_la_fila(self):
+        movimiento = self.ingreso(10)
+        movimiento.cantidad = Decimal("6")
+        movimiento.bodega_destino = self.sucursal
+        guardar_movimiento(movimiento)
+        self.assertEqual(self.filas(), {(self.sucursal.pk, "INGRESO"): (6, 0, 1)})
+
+        eliminar_movimiento(movimiento)
+        self.assertFalse(ResumenDiario.objects.exists())
+
+    def test_reconstruir_coincide_con_el_incremental(self):
+        ayer = timezone.now() - timedelta(days=1)
+        self.ingreso(10, fecha=ayer)
+        guardar_movimiento(self.movimiento("SALIDA", 3, origen=self.central))
+        guardar_movimientos_lote([self.movimiento("INGRESO", 2, destino=self.sucursal)])
+        incremental = sorted(ResumenDiario.objects.values_list(
+            "fecha", "bodega_id", "tipo", "cantidad_entrada", "cantidad_salida", "movimientos"
+        ))
+
+        self.assertEqual(reconstruir_resumen(), 3)
+        self.assertEqual(sorted(ResumenDiario.objects.values_list(
+            "fecha", "bodega_id", "tipo", "cantidad_entrada", "cantidad_salida", "movimientos"
+        )), incremental)
+
+    def test_unidades_por_bodega_agrupa_por_mes(self):
+        self.ingreso(10)
+        self.ingreso(4, bodega=self.sucursal)
+        guardar_movimiento(self.movimiento("SALIDA", 3, origen=self.central))
+        hoy = dia_local(timezone.now())
+        mes = hoy.replace(day=1)
+        self.assertEqual(
+            unidades_por_bodega(mes, hoy), {(mes, self.central.pk): 10, (mes, self.sucursal.pk): 4}
+        )
+        self.assertEqual(unidades_por_bodega(mes, hoy, tipo="SALIDA"), {(mes, self.central.pk): 3})
+
+
+class AuditoriaTests(InventarioTestCase):
+    def evento(self, accion="LOGOUT"):
+        return EventoAuditoria(fecha=timezone.now(), username="operador", accion=accion, entidad="sesion")
+
+    def test_el_escritor_junta_lotes_y_vaciar_guarda_lo_pendiente(self):
+        escritor = auditoria.EscritorAuditoria(lote=3, intervalo=0.01)
+        for _ in range(5):
+            escritor.cola.put(self.evento())
+
+        lote = escritor._juntar(escritor.cola.get())
+        self.assertEqual(len(lote), 3)
+        escritor.guardar(lote)
+        self.assertEqual(escritor.vaciar(), 2)
+        self.assertEqual(EventoAuditoria.objects.count(), 5)
+
+    def test_con_la_cola_llena_el_evento_se_guarda_en_el_momento(self):
+        escritor = auditoria.EscritorAuditoria(maximo=1)
+        with mock.patch.object(escritor, "_iniciar"):
+            escritor.encolar(self.evento())
+            escritor.encolar(self.evento("LOGIN_FALLIDO"))
+        self.assertEqual(list(EventoAuditoria.objects.values_list("accion", flat=True)), ["LOGIN_FALLIDO"])
+        self.assertEqual(escritor.vaciar(), 1)
+
+    def test_vistas_registran_y_la_busqueda_filtra(self):
+        self.client.post(
+            reverse("accounts_lilis:login"), {"username": "operador", "password": "incorrecta"},
+            REMOTE_ADDR="10.0.0.7",
+        )
+        self.client.force_login(self.usuario)
+        self.client.post(reverse("inventario:movimiento_crear"), {
+            "tipo": "INGRESO", "producto": self.producto.pk, "bodega_destino": self.central.pk,
+            "cantidad": "4",
+        })
+
+        fallido = EventoAuditoria.objects.get(accion="LOGIN_FALLIDO")
+        self.assertEqual((fallido.username, fallido.ip), ("operador", "10.0.0.7"))
+        movimiento = MovimientoInventario.objects.get()
+        respuesta = self.client.get(
+            reverse("inventario:auditoria"), {"formato": "json", "entidad": "movimiento"}
+        )
+        resultados = respuesta.json()["resultados"]
+        self.assertEqual(len(resultados), 1)
+        self.assertEqual(resultados[0]["accion"], "CREAR_MOVIMIENTO")
+        self.assertEqual(resultados[0]["entidad_id"], str(movimiento.pk))
+        self.assertEqual(resultados[0]["username"], "operador")
+
+
+class AutocompletarTests(InventarioTestCase):
+    def setUp(self):
+        cache.clear()
+        Producto.objects.create(sku="CH-010", nombre="Chocolate amargo", categoria=self.categoria)
+        Producto.objects.create(sku="CA-001", nombre="Chicle menta", categoria=self.categoria)
+        self.client.force_login(self.usuario)
+
+    def textos(self, entidad, q, **params):
+        respuesta = self.client.get(reverse("inventario:autocompletar", args=[entidad]), {"q": q, **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return [fila["texto"] for fila in respuesta.json()["resultados"]]
+
+    def test_busca_por_prefijo_de_sku_y_luego_de_nombre(self):
+        self.assertEqual(self.textos("productos", "ch"), ["CH-010 - Chocolate amargo", "CA-001 - Chicle menta"])
+        self.assertEqual(self.textos("productos", "ch", limite=1), ["CH-010 - Chocolate amargo"])
+        self.assertEqual(self.textos("bodegas", "b0"), ["B01 - Central", "B02 - Sucursal"])
+        self.assertEqual(self.textos("productos", "amargo"), [])
+
+    def test_un_registro_nuevo_invalida_las_busquedas_en_cache(self):
+        self.assertEqual(buscar("bodegas", "sur"), [])
+        Bodega.objects.create(codigo="B03", nombre="Sur")
+        self.assertEqual([b["codigo"] for b in buscar("bodegas", "sur")], ["B03"])
+
+    def test_entidad_desconocida(self):
+        respuesta = self.client.get(reverse("inventario:autocompletar", args=["usuarios"]), {"q": "op"})
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_el_select_solo_trae_la_opcion_elegida(self):
+        html = str(MovimientoInventarioForm(initial={"producto": self.producto.pk})["producto"])
+        self.assertIn('data-autocompletar="/inventario/autocompletar/productos/"', html)
+        self.assertIn("Producto de prueba", html)
+        self.assertNotIn("Chocolate", html)
+
+
+class SeriesTests(InventarioTestCase):
+    def serie(self, tipo, serie, origen=None, destino=None):
+        return self.movimiento(tipo, 1, origen=origen, destino=destino, serie=serie, manejo_serie=True)
+
+    def crear(self, **datos):
+        self.client.force_login(self.usuario)
+        datos = {"producto": self.producto.pk, "manejo_serie": "on", **datos}
+        return self.client.post(reverse("inventario:movimiento_crear"), datos)
+
+    def test_ingreso_duplicado_de_una_serie_se_rechaza(self):
+        guardar_movimiento(self.serie("INGRESO", "SN-1", destino=self.central))
+        with self.assertRaises(SerieInvalida):
+            guardar_movimiento(self.serie("INGRESO", "SN-1", destino=self.sucursal))
+        fila = NumeroSerie.objects.get(producto=self.producto, serie="SN-1")
+        self.assertEqual((fila.estado, fila.bodega), (NumeroSerie.EN_BODEGA, self.central))
+        self.assertEqual(self.stock(self.sucursal), 0)
+
+    def test_serie_que_salio_puede_volver_a_ingresar(self):
+        guardar_movimiento(self.serie("INGRESO", "SN-1", destino=self.central))
+        guardar_movimiento(self.serie("SALIDA", "SN-1", origen=self.central))
+        guardar_movimiento(self.serie("INGRESO", "SN-1", destino=self.sucursal))
+        fila = NumeroSerie.objects.get(producto=self.producto, serie="SN-1")
+        self.assertEqual((fila.estado, fila.bodega), (NumeroSerie.EN_BODEGA, self.sucursal))
+
+    def test_una_sola_serie_en_la_lista_se_guarda_en_el_movimiento(self):
+        respuesta = self.crear(tipo="INGRESO", bodega_destino=self.central.pk, cantidad="1", series="SN-7")
+        self.assertEqual(respuesta.status_code, 302)
+        movimiento = MovimientoInventario.objects.get()
+        self.assertEqual(movimiento.serie, "SN-7")
+        fila = NumeroSerie.objects.get(producto=self.producto, serie="SN-7")
+        self.assertEqual((fila.estado, fila.bodega), (NumeroSerie.EN_BODEGA, self.central))
+
+    def test_varias_series_crean_una_linea_por_serie(self):
+        respuesta = self.crear(
+            tipo="INGRESO", bodega_destino=self.central.pk, cantidad="3", series="SN-1, SN-2\nSN-3"
+        )
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(
+            sorted(MovimientoInventario.objects.values_list("serie", "cantidad")),
+            [("SN-1", 1), ("SN-2", 1), ("SN-3", 1)],
+        )
+        self.assertEqual(self.stock(self.central), 3)
+
+    def test_serie_ya_ingresada_marca_el_campo_usado(self):
+        guardar_movimiento(self.serie("INGRESO", "SN-1", destino=self.central))
+        respuesta = self.crear(tipo="INGRESO", bodega_destino=self.central.pk, cantidad="1", series="SN-1")
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("series", respuesta.context["form"].errors)
+        self.assertEqual(MovimientoInventario.objects.count(), 1)
+
+    def test_importacion_valida_las_series_fila_por_fila(self):
+        fila = dict.fromkeys(COLUMNAS, "")
+        fila.update(tipo="INGRESO", sku=self.producto.sku, cantidad="1", bodega_destino="B01", serie="SN-9")
+        segunda = dict(fila, bodega_destino="B02")
+        creados, errores = importar_movimientos([fila, segunda], self.usuario, parcial=True)
+        self.assertEqual(len(creados), 1)
+        self.assertEqual([numero for numero, _ in errores], [3])
+        fila = NumeroSerie.objects.get(producto=self.producto, serie="SN-9")
+        self.assertEqual(fila.bodega, self.central)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ContadoresTests(InventarioTestCase):
+    def setUp(self):
+        cache.clear()
+        self.producto.punto_reorden = 10
+        self.producto.save()
+
+    def test_los_movimientos_ajustan_los_totales_sin_contar(self):
+        self.ingreso(3)
+        inicial = contadores()
+        self.assertEqual((inicial["total_movimientos"], inicial["movimientos_hoy"]), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingreso(2)
+            movimiento = self.ingreso(4)
+        with self.captureOnCommitCallbacks(execute=True):
+            eliminar_movimiento(movimiento)
+        with CaptureQueriesContext(connection) as consultas:
+            datos = contadores()
+        self.assertEqual((datos["total_movimientos"], datos["movimientos_hoy"]), (2, 2))
+        self.assertFalse([q for q in consultas.captured_queries if "movimiento_inventario" in q["sql"]])
+
+    def test_bajo_stock_no_arma_la_propuesta_de_reposicion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingreso(5)
+        with mock.patch("inventario.reposicion.calcular_propuesta") as propuesta:
+            self.assertEqual(contadores()["productos_bajo_stock"], 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ingreso(10)
+            self.assertEqual(contadores()["productos_bajo_stock"], 0)
+        propuesta.assert_not_called()
+
+    def test_cambiar_el_punto_de_reorden_recuenta_bajo_stock(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingreso(15)
+        self.assertEqual(contadores()["productos_bajo_stock"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.punto_reorden = 20
+            self.producto.save()
+        self.assertEqual(contadores()["productos_bajo_stock"], 1)
+
+
+class DocumentoTests(InventarioTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.otro = Producto.objects.create(sku="P-002", nombre="Otro producto", categoria=cls.categoria)
+
+    def lineas(self, *cantidades):
+        return [
+            MovimientoInventario(producto=producto, cantidad=Decimal(cantidad))
+            for producto, cantidad in cantidades
+        ]
+
+    def datos(self, lineas, **cabecera):
+        datos = {
+            "lineas-TOTAL_FORMS": str(len(lineas)), "lineas-INITIAL_FORMS": "0",
+            "lineas-MIN_NUM_FORMS": "1", "lineas-MAX_NUM_FORMS": "200",
+            **cabecera,
+        }
+        for i, (producto, cantidad) in enumerate(lineas):
+            datos[f"lineas-{i}-producto"] = producto.pk
+            datos[f"lineas-{i}-cantidad"] = str(cantidad)
+        return datos
+
+    def test_registrar_documento_copia_la_cabecera_y_devuelve_las_lineas(self):
+        documento = DocumentoMovimiento(
+            tipo="INGRESO", bodega_destino=self.central, doc_referencia="FAC-1", usuario=self.usuario
+        )
+        creadas = registrar_documento(documento, self.lineas((self.producto, 4), (self.otro, 6)))
+
+        self.assertEqual(len(creadas), 2)
+        self.assertTrue(all(linea.pk for linea in creadas))
+        self.assertEqual({(l.tipo, l.doc_referencia, l.fecha, l.usuario_id) for l in creadas},
+                         {("INGRESO", "FAC-1", documento.fecha, self.usuario.pk)})
+        self.assertEqual(self.stock(self.central), 4)
+        self.assertEqual(self.stock(self.central, self.otro), 6)
+
+    def test_el_neto_del_documento_se_valida_entero(self):
+        self.ingreso(5)
+        documento = DocumentoMovimiento(tipo="SALIDA", bodega_origen=self.central, usuario=self.usuario)
+        with self.assertRaises(StockInsuficiente):
+            registrar_documento(documento, self.lineas((self.producto, 3), (self.producto, 3)))
+        self.assertFalse(DocumentoMovimiento.objects.exists())
+        self.assertEqual(self.stock(self.central), 5)
+
+    def test_vista_suma_las_lineas_del_mismo_producto(self):
+        self.ingreso(5)
+        self.client.force_login(self.usuario)
+        url = reverse("inventario:documento_crear")
+
+        respuesta = self.client.post(url, self.datos(
+            [(self.producto, 3), (self.producto, 3)], tipo="SALIDA", bodega_origen=self.central.pk,
+        ))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.context["lineas_formset"].errors[0])
+
+        respuesta = self.client.post(url, self.datos(
+            [(self.producto, 3), (self.producto, 2)], tipo="SALIDA", bodega_origen=self.central.pk,
+        ))
+        documento = DocumentoMovimiento.objects.get()
+        self.assertRedirects(
+            respuesta, f"{reverse('inventario:movimientos_listar')}?documento={documento.pk}",
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(documento.lineas.count(), 2)
+        self.assertEqual(self.stock(self.central), 0)
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = replica.ReplicaRouter()
+        configurada = mock.patch("proyecto_lilis.replica.replica_configurada", return_value=True)
+        configurada.start()
+        self.addCleanup(configurada.stop)
+
+    def test_solo_lee_de_la_replica_dentro_del_contexto(self):
+        self.assertIsNone(self.router.db_for_read(MovimientoInventario))
+        with replica.lecturas_en_replica():
+            self.assertEqual(self.router.db_for_read(MovimientoInventario), "replica")
+            self.assertEqual(self.router.db_for_write(MovimientoInventario), "default")
+            # La sesión y lo que queda en caché se leen del primario
+            self.assertIsNone(self.router.db_for_read(Session))
+            with replica.lecturas_en_primario():
+                self.assertIsNone(self.router.db_for_read(MovimientoInventario))
+            self.assertEqual(self.router.db_for_read(MovimientoInventario), "replica")
+
+    def test_sin_replica_configurada_todo_va_al_primario(self):
+        with mock.patch("proyecto_lilis.replica.replica_configurada", return_value=False):
+            with replica.lecturas_en_replica():
+                self.assertIsNone(self.router.db_for_read(MovimientoInventario))
+
+    def test_el_decorador_cubre_la_vista_y_el_streaming(self):
+        vistos = []
+
+        def partes():
+            for parte in ("a", "b"):
+                vistos.append(self.router.db_for_read(MovimientoInventario))
+                yield parte
+
+        @replica.lectura_replica
+        def vista(request):
+            vistos.append(self.router.db_for_read(MovimientoInventario))
+            return StreamingHttpResponse(partes())
+
+        respuesta = vista(RequestFactory().get("/"))
+        self.assertEqual(b"".join(respuesta.streaming_content), b"ab")
+        self.assertEqual(vistos, ["replica", "replica", "replica"])
+        self.assertIsNone(self.router.db_for_read(MovimientoInventario))
+
+    def test_auditor_lee_de_la_replica_solo_en_get(self):
+        vistos = []
+
+        def respuesta(request):
+            vistos.append(self.router.db_for_read(MovimientoInventario))
+            return HttpResponse()
+
+        middleware = replica.ReplicaAuditorMiddleware(respuesta)
+        for metodo in ("get", "post"):
+            request = getattr(RequestFactory(), metodo)("/")
+            request.user = mock.Mock(rol="AUDITOR")
+            middleware(request)
+        self.assertEqual(vistos, ["replica", None])
+
+
+class ExportacionReplicaTests(InventarioTestCase):
+    def test_los_duplicados_se_buscan_en_el_primario(self):
+        en_replica = []
+        original = replica.ReplicaRouter.db_for_read
+
+        def registrar_lectura(router, model, **hints):
+            if model is TrabajoExportacion:
+                en_replica.append(replica._en_replica.get())
+            return original(router, model, **hints)
+
+        with mock.patch.object(replica.ReplicaRouter, "db_for_read", registrar_lectura):
+            with replica.lecturas_en_replica():
+                primero = solicitar_exportacion(self.usuario, "movimientos", "csv", {})
+                segundo = solicitar_exportacion(self.usuario, "movimientos", "csv", {})
+        self.assertEqual(primero.pk, segundo.pk)
+        self.assertTrue(en_replica)
+        self.assertNotIn(True, en_replica)
@@ -8,5 +8,16 @@ urlpatterns = [
     path("movimientos/nuevo/", views.movimiento_crear, name="movimiento_crear"),
     path("movimientos/<int:pk>/editar/", views.movimiento_editar, name="movimiento_editar"),
     path("movimientos/<int:pk>/eliminar/", views.movimiento_eliminar, name="movimiento_eliminar"),
+    path("movimientos/documento/", views.documento_crear, name="documento_crear"),
+    path("movimientos/importar/", views.movimientos_importar, name="movimientos_importar"),
     path("movimientos/exportar-excel/", views.exportar_movimientos_excel, name="movimientos_exportar_excel"),
+    path("kardex/", views.kardex, name="kardex"),
+    path("autocompletar/<str:entidad>/", views.autocompletar, name="autocompletar"),
+    path("reposicion/", views.reposicion, name="reposicion"),
+    path("auditoria/", views.auditoria, name="auditoria"),
+    path("valorizacion/", views.valorizacion_bodegas, name="valorizacion_bodegas"),
+    path("series/", views.buscar_serie, name="buscar_serie"),
+    path("stock/a-fecha/", views.stock_a_fecha, name="stock_a_fecha"),
+    path("exportaciones/<int:pk>/", views.exportacion_estado, name="exportacion_estado"),
+    path("exportaciones/<int:pk>/descargar/", views.exportacion_descargar, name="exportacion_descargar"),
 ]
@@ -0,0 +1,315 @@
+"""
+Valorización de inventario a costo promedio ponderado por bodega y, con
+INVENTARIO_CAPAS_FIFO = True en settings, también por capas FIFO.
+
+inventario.stock llama a valorizar() con cada movimiento nuevo dentro de la
+misma transacción, así que ValorizacionBodega queda al día sin recorrer el
+historial. Editar o eliminar un movimiento, o registrar uno con fecha
+anterior al último del producto, cambia la historia: ahí se revaloriza
+completo solo el producto afectado. reconstruir_valorizacion()
+rehace todo (comando recalcular_valorizacion).
+
+Costo de un INGRESO: el costo_unitario informado en el movimiento; si no,
+ProveedorProducto.costo menos descuento_pct del proveedor del movimiento (o
+del preferente / más barato); si no, Producto.costo_estandar; si no, el
+promedio vigente de la bodega. Salidas y transferencias salen al promedio
+de la bodega origen, que queda guardado en el movimiento.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Max, Q, Sum
+
+from catalogo.models import Producto
+from proveedores.models import ProveedorProducto
+
+from .consultas import mezclar
+from .models import CapaCosto, MovimientoArchivado, MovimientoInventario, ValorizacionBodega
+
+
+CAPAS_FIFO = getattr(settings, "INVENTARIO_CAPAS_FIFO", False)
+
+CERO = Decimal("0")
+SEIS_DECIMALES = Decimal("0.000001")
+CUATRO_DECIMALES = Decimal("0.0001")
+
+
+class _CostosProveedor:
+    """Costos de compra por producto, una consulta por producto (o todos de una vez)."""
+
+    def __init__(self, precargar=False):
+        self._ofertas = {}
+        self._estandar = {}
+        if precargar:
+            self._ofertas = defaultdict(list)
+            for oferta in ProveedorProducto.objects.order_by():
+                self._ofertas[oferta.producto_id].append(oferta)
+            self._estandar = dict(Producto.objects.values_list("pk", "costo_estandar"))
+
+    def _cargar(self, producto_id):
+        if producto_id not in self._ofertas:
+            self._ofertas[producto_id] = list(ProveedorProducto.objects.filter(producto_id=producto_id))
+            self._estandar[producto_id] = (
+                Producto.objects.filter(pk=producto_id).values_list("costo_estandar", flat=True).first()
+            )
+        return self._ofertas[producto_id]
+
+    def ingreso(self, movimiento, promedio_actual):
+        if movimiento.costo_unitario is not None:
+            return movimiento.costo_unitario
+        ofertas = self._cargar(movimiento.producto_id)
+        oferta = next((o for o in ofertas if o.proveedor_id == movimiento.proveedor_id), None)
+        if oferta is None and ofertas:
+            oferta = min(ofertas, key=lambda o: (not o.preferente, o.costo))
+        if oferta is not None:
+            descuento = (oferta.descuento_pct or CERO) / 100
+            return (oferta.costo * (1 - descuento)).quantize(SEIS_DECIMALES)
+        estandar = self._estandar.get(movimiento.producto_id)
+        if estandar is not None:
+            return estandar
+        return promedio_actual
+
+
+class _Libro:
+    """Estado de valorización de un conjunto de (producto, bodega) mientras se aplican movimientos."""
+
+    def __init__(self, saldos, capas, costos):
+        self.saldos = saldos
+        self.capas = capas
+        self.costos = costos
+        self.capas_nuevas = []
+        self.capas_tocadas = {}
+        self.capas_agotadas = []
+
+    def _fila(self, clave):
+        if clave not in self.saldos:
+            self.saldos[clave] = ValorizacionBodega(producto_id=clave[0], bodega_id=clave[1])
+        return self.saldos[clave]
+
+    def _entrar(self, clave, cantidad, costo, fecha, capas=None):
+        fila = self._fila(clave)
+        if fila.cantidad <= 0:
+            fila.costo_promedio = costo
+        else:
+            fila.costo_promedio = (
+                (fila.cantidad * fila.costo_promedio + cantidad * costo) / (fila.cantidad + cantidad)
+            ).quantize(SEIS_DECIMALES)
+        fila.cantidad += cantidad
+        fila.valor_total = (fila.cantidad * fila.costo_promedio).quantize(CUATRO_DECIMALES)
+
+        if CAPAS_FIFO:
+            for costo_capa, cantidad_capa in capas or [(costo, cantidad)]:
+                capa = CapaCosto(
+                    producto_id=clave[0], bodega_id=clave[1], fecha=fecha, costo_unitario=costo_capa,
+                    cantidad_inicial=cantidad_capa, cantidad_restante=cantidad_capa,
+                )
+                self.capas.setdefault(clave, []).append(capa)
+                self.capas_nuevas.append(capa)
+
+    def _salir(self, clave, cantidad):
+        """Descuenta al costo promedio; devuelve (costo, capas FIFO consumidas)."""
+        fila = self._fila(clave)
+        costo = fila.costo_promedio
+        fila.cantidad -= cantidad
+        fila.valor_total = (fila.cantidad * fila.costo_promedio).quantize(CUATRO_DECIMALES)
+
+        consumidas = []
+        if CAPAS_FIFO:
+            pendiente = cantidad
+            capas = self.capas.get(clave, [])
+            while pendiente and capas:
+                capa = capas[0]
+                tomado = min(capa.cantidad_restante, pendiente)
+                capa.cantidad_restante -= tomado
+                pendiente -= tomado
+                consumidas.append((capa.costo_unitario, tomado))
+                if capa.cantidad_restante <= 0:
+                    capas.pop(0)
+                    if capa.pk:
+                        self.capas_agotadas.append(capa.pk)
+                elif capa.pk:
+                    self.capas_tocadas[capa.pk] = capa
+            if pendiente:
+                # Stock negativo (movimientos sin validar): el resto sale al promedio
+                consumidas.append((costo, pendiente))
+        return costo, consumidas
+
+    def aplicar(self, movimiento):
+        cantidad = Decimal(movimiento.cantidad)
+        producto_id = movimiento.producto_id
+        if movimiento.tipo == "INGRESO" and movimiento.bodega_destino_id:
+            clave = (producto_id, movimiento.bodega_destino_id)
+            costo = self.costos.ingreso(movimiento, self._fila(clave).costo_promedio)
+            movimiento.costo_unitario = costo
+            self._entrar(clave, cantidad, costo, movimiento.fecha)
+        elif movimiento.tipo == "SALIDA" and movimiento.bodega_origen_id:
+            costo, _ = self._salir((producto_id, movimiento.bodega_origen_id), cantidad)
+            movimiento.costo_unitario = costo
+        elif movimiento.tipo == "TRANSFERENCIA" and movimiento.bodega_origen_id and movimiento.bodega_destino_id:
+            # El costo viaja con la mercadería: mismo promedio (y mismas capas) que en origen
+            costo, consumidas = self._salir((producto_id, movimiento.bodega_origen_id), cantidad)
+            movimiento.costo_unitario = costo
+            self._entrar(
+                (producto_id, movimiento.bodega_destino_id), cantidad, costo, movimiento.fecha, consumidas
+            )
+
+    def guardar(self):
+        existentes = [fila for fila in self.saldos.values() if fila.pk]
+        nuevas = [fila for fila in self.saldos.values() if not fila.pk]
+        ValorizacionBodega.objects.bulk_update(
+            existentes, ["cantidad", "costo_promedio", "valor_total"], batch_size=500
+        )
+        ValorizacionBodega.objects.bulk_create(nuevas, batch_size=500)
+
+        if CAPAS_FIFO:
+            CapaCosto.objects.filter(pk__in=self.capas_agotadas).delete()
+            CapaCosto.objects.bulk_update(
+                [capa for capa in self.capas_tocadas.values() if capa.cantidad_restante > 0],
+                ["cantidad_restante"], batch_size=500,
+            )
+            CapaCosto.objects.bulk_create(
+                [capa for capa in self.capas_nuevas if capa.cantidad_restante > 0], batch_size=500
+            )
+
+        actualizar_costo_producto({producto_id for producto_id, _ in self.saldos})
+
+
+def _claves(movimientos):
+    claves = set()
+    for m in movimientos:
+        if m.bodega_origen_id:
+            claves.add((m.producto_id, m.bodega_origen_id))
+        if m.bodega_destino_id:
+            claves.add((m.producto_id, m.bodega_destino_id))
+    return sorted(claves)
+
+
+def productos_atrasados(movimientos):
+    """
+    Productos con algún movimiento nuevo fechado antes del último ya
+    registrado. Aplicarlo sobre la valorización actual le daría el promedio
+    de hoy y no el de su fecha, y las salidas posteriores quedarían con el
+    costo antiguo: esos productos se revalorizan completos al guardar.
+    """
+    primeras = {}
+    for m in movimientos:
+        if m.producto_id and (m.producto_id not in primeras or m.fecha < primeras[m.producto_id]):
+            primeras[m.producto_id] = m.fecha
+    if not primeras:
+        return set()
+    atrasados = set()
+    # Si todo el historial de un producto está archivado, su último movimiento está allá
+    for modelo in (MovimientoInventario, MovimientoArchivado):
+        ultimas = (
+            modelo.objects.order_by()
+            .filter(producto_id__in=primeras)
+            .values("producto_id")
+            .annotate(ultima=Max("fecha"))
+        )
+        atrasados |= {fila["producto_id"] for fila in ultimas if primeras[fila["producto_id"]] < fila["ultima"]}
+    return atrasados
+
+
+def valorizar(movimientos):
+    """
+    Aplica movimientos nuevos (aún sin guardar) a la valorización y deja el
+    costo_unitario en cada uno. Llamar dentro de la transacción del
+    movimiento, con las filas de stock_bodega ya bloqueadas.
+    """
+    claves = _claves(movimientos)
+    if not claves:
+        return
+    condicion = Q()
+    for producto_id, bodega_id in claves:
+        condicion |= Q(producto_id=producto_id, bodega_id=bodega_id)
+
+    saldos = {
+        (fila.producto_id, fila.bodega_id): fila
+        for fila in ValorizacionBodega.objects.select_for_update().filter(condicion).order_by("bodega_id", "producto_id")
+    }
+    capas = {}
+    if CAPAS_FIFO:
+        for capa in (
+            CapaCosto.objects.select_for_update()
+            .filter(condicion, cantidad_restante__gt=0)
+            .order_by("producto_id", "bodega_id", "fecha", "id")
+        ):
+            capas.setdefault((capa.producto_id, capa.bodega_id), []).append(capa)
+
+    libro = _Libro(saldos, capas, _CostosProveedor())
+    for movimiento in sorted(movimientos, key=lambda m: m.fecha):
+        libro.aplicar(movimiento)
+    libro.guardar()
+
+
+def _guardar_costos(cambios):
+    for modelo in (MovimientoInventario, MovimientoArchivado):
+        modelo.objects.bulk_update([m for m in cambios if isinstance(m, modelo)], ["costo_unitario"])
+
+
+def _rehacer(filtro, costos):
+    """
+    Recorre en orden el historial vigente y archivado que cumple `filtro`
+    y deja la valorización que resulta.
+    """
+    libro = _Libro({}, {}, costos)
+    fuentes = [
+        modelo.objects.filter(filtro).order_by("fecha", "id").iterator(chunk_size=2000)
+        for modelo in (MovimientoInventario, MovimientoArchivado)
+    ]
+    cambios = []
+    for movimiento in mezclar(fuentes, descendente=False):
+        anterior = movimiento.costo_unitario
+        libro.aplicar(movimiento)
+        if movimiento.costo_unitario != anterior:
+            cambios.append(movimiento)
+        if len(cambios) >= 1000:
+            _guardar_costos(cambios)
+            cambios = []
+    _guardar_costos(cambios)
+    return libro
+
+
+def revalorizar_productos(producto_ids):
+    """Rehace la valorización de unos productos desde su historial (tras editar o eliminar)."""
+    producto_ids = set(producto_ids)
+    ValorizacionBodega.objects.filter(producto_id__in=producto_ids).delete()
+    CapaCosto.objects.filter(producto_id__in=producto_ids).delete()
+    _rehacer(Q(producto_id__in=producto_ids), _CostosProveedor()).guardar()
+
+
+def reconstruir_valorizacion():
+    """Rehace ValorizacionBodega (y las capas FIFO) desde todo el historial."""
+    ValorizacionBodega.objects.all().delete()
+    CapaCosto.objects.all().delete()
+    libro = _rehacer(Q(), _CostosProveedor(precargar=True))
+    libro.guardar()
+    return len(libro.saldos)
+
+
+def actualizar_costo_producto(producto_ids):
+    """Producto.costo_promedio = valor total / cantidad total en todas las bodegas con stock."""
+    totales = {
+        fila["producto_id"]: fila
+        for fila in ValorizacionBodega.objects.order_by()
+        .filter(producto_id__in=producto_ids, cantidad__gt=0)
+        .values("producto_id")
+        .annotate(cantidad=Sum("cantidad"), valor=Sum("valor_total"))
+    }
+    for producto_id in producto_ids:
+        fila = totales.get(producto_id)
+        if fila is None:
+            continue
+        costo = (fila["valor"] / fila["cantidad"]).quantize(Decimal("0.01"))
+        Producto.objects.filter(pk=producto_id).update(costo_promedio=costo)
+
+
+def valor_por_bodega():
+    """{bodega_id: valor total del stock} con un SUM agrupado sobre valorizacion_bodega."""
+    return dict(
+        ValorizacionBodega.objects.order_by()
+        .values("bodega_id")
+        .annotate(valor=Sum("valor_total"))
+        .values_list("bodega_id", "valor")
+    )
@@ -1,22 +1,70 @@
+import os
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
-from openpyxl import Workbook
-from .models import MovimientoInventario
-from .forms import MovimientoInventarioForm
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
+from .models import Bodega, EventoAuditoria, MovimientoInventario, NumeroSerie, TrabajoExportacion
+from .auditoria import evento_a_dict, filtrar_eventos, registrar
+from .autocompletar import ENTIDADES as ENTIDADES_AUTOCOMPLETAR, LIMITE_DEFECTO as LIMITE_AUTOCOMPLETAR, buscar
+from .exportaciones import en_segundo_plano, encolar_desde_request, puede_ver
+from .forms import (
+    DocumentoMovimientoForm, FiltroAuditoriaForm, FiltroMovimientosForm, ImportarMovimientosForm, KardexForm,
+    LineasDocumentoFormSet, MovimientoInventarioForm, StockAFechaForm,
+)
+from .kardex import pagina_kardex
+from .valorizacion import valor_por_bodega
+from .reposicion import COLUMNAS_EXPORTACION as COLUMNAS_REPOSICION, propuesta_reposicion
+from .cierres import saldos_a_fecha, ultimo_cierre
+from .importacion import ErrorImportacion, importar_movimientos, leer_filas
+from .consultas import (
+    COLUMNAS_EXPORTACION, TAMANO_PAGINA_DEFECTO, MovimientosExportables, movimiento_a_dict,
+    movimientos_historicos, paginar_keyset,
+)
+from .stock import (
+    guardar_movimiento, eliminar_movimiento, registrar_documento, registrar_salida_fefo, registrar_series, SerieInvalida,
+    StockInsuficiente,
+)
 from accounts_lilis.permisos import permisos_por_rol, role_required
+from proyecto_lilis.exportar import FORMATOS, formato_solicitado, respuesta_exportacion
+from proyecto_lilis.replica import lectura_replica
 from django.utils import timezone
+from catalogo.models import Producto
 
 @login_required
 @role_required("ADMIN", "OPER_INVENTARIO", "AUDITOR")
 def movimientos_listar(request):
-    movimientos = MovimientoInventario.objects.select_related(
-        "producto", "proveedor", "bodega_origen", "bodega_destino", "usuario"
-    ).all()
+    filtro_form = FiltroMovimientosForm(request.GET)
+    filtros = filtro_form.filtros()
+    tamano = filtros.get("size") or TAMANO_PAGINA_DEFECTO
+
+    # Los archivados solo se consultan si el rango de fechas llega a ellos
+    fuentes = movimientos_historicos(filtros)
+    movimientos, siguiente, anterior = paginar_keyset(
+        fuentes, tamano, despues=filtros.get("cursor"), antes=filtros.get("antes")
+    )
+
+    if request.GET.get("formato") == "json":
+        return JsonResponse({
+            "resultados": [movimiento_a_dict(m) for m in movimientos],
+            "siguiente": siguiente,
+            "anterior": anterior,
+        })
+
+    # Query string sin cursores, para armar los links de página
+    params = request.GET.copy()
+    for clave in ("cursor", "antes", "formato"):
+        params.pop(clave, None)
+
     permisos = permisos_por_rol(request.user)
     return render(request, "mantenedores/inventario/movimientos_listar.html", {
-        "movimientos": movimientos, "permisos": permisos,
+        "movimientos": movimientos,
+        "permisos": permisos,
+        "filtro_form": filtro_form,
+        "cursor_siguiente": siguiente,
+        "cursor_anterior": anterior,
+        "query_filtros": params.urlencode(),
     })
 
 @login_required
@@ -27,14 +75,35 @@ def movimiento_crear(request):
         if form.is_valid():
             movimiento = form.save(commit=False)
             movimiento.usuario = request.user
-            movimiento.save()
-
-            # --- LOG AUDITORÍA ---
-            print(f"🚛 [AUDITORIA] Fecha: {timezone.now()} | Usuario: {request.user.username} | Acción: CREAR_MOVIMIENTO | ID: {movimiento.id} | Producto: {movimiento.producto.nombre} | Cant: {movimiento.cantidad}")
-            # ---------------------
+            try:
+                series = form.cleaned_data.get("lista_series") or []
+                if form.cleaned_data.get("asignar_fefo"):
+                    lineas = registrar_salida_fefo(movimiento)
+                elif len(series) > 1:
+                    lineas = registrar_series(movimiento, series)
+                else:
+                    lineas = [guardar_movimiento(movimiento)]
+            except StockInsuficiente as e:
+                # Otro operador consumió el stock entre la validación y el guardado
+                # (o, con FEFO, los lotes vigentes no alcanzan)
+                form.add_error("cantidad", e)
+            except SerieInvalida as e:
+                form.add_error(form.cleaned_data["campo_series"], e)
+            else:
+                for linea in lineas:
+                    registrar(
+                        "CREAR_MOVIMIENTO", request, entidad="movimiento", entidad_id=linea.id,
+                        tipo=linea.tipo, producto=linea.producto.nombre, cantidad=linea.cantidad,
+                        lote=linea.lote, serie=linea.serie,
+                    )
 
-            messages.success(request, "✅ Movimiento de inventario registrado correctamente.")
-            return redirect("inventario:movimientos_listar")
+                if len(series) > 1:
+                    messages.success(request, f"✅ Movimiento registrado en {len(lineas)} líneas, una por serie.")
+                elif len(lineas) > 1:
+                    messages.success(request, f"✅ Salida registrada en {len(lineas)} líneas por lote (FEFO).")
+                else:
+                    messages.success(request, "✅ Movimiento de inventario registrado correctamente.")
+                return redirect("inventario:movimientos_listar")
         messages.error(request, "❌ Revisa los errores del formulario.")
     else:
         form = MovimientoInventarioForm()
@@ -43,6 +112,53 @@ def movimiento_crear(request):
         "form": form, "permisos": permisos,
     })
 
+@login_required
+@role_required("ADMIN", "OPER_INVENTARIO")
+def documento_crear(request):
+    """Registra un documento (cabecera + líneas) en una sola transacción."""
+    if request.method == "POST":
+        form = DocumentoMovimientoForm(request.POST)
+        lineas_formset = LineasDocumentoFormSet(request.POST, prefix="lineas", cabecera=form)
+        if form.is_valid() and lineas_formset.is_valid():
+            documento = form.save(commit=False)
+            documento.usuario = request.user
+            ingreso = documento.tipo == "INGRESO"
+            lineas = [
+                MovimientoInventario(
+                    producto=linea["producto"],
+                    cantidad=linea["cantidad"],
+                    costo_unitario=linea.get("costo_unitario") if ingreso else None,
+                    lote=linea.get("lote") or None,
+                    serie=linea.get("serie") or None,
+                    fecha_vencimiento=linea.get("fecha_vencimiento"),
+                    manejo_lote=bool(linea.get("lote")),
+                    manejo_serie=bool(linea.get("serie")),
+                    manejo_vencimiento=bool(linea.get("fecha_vencimiento")),
+                    observaciones=documento.observaciones,
+                )
+                for linea in lineas_formset.lineas()
+            ]
+            try:
+                creadas = registrar_documento(documento, lineas)
+            except (StockInsuficiente, SerieInvalida) as e:
+                # Otro operador consumió el stock (o la serie) mientras se validaba
+                form.add_error(None, e)
+            else:
+                registrar(
+                    "CREAR_DOCUMENTO", request, entidad="documento", entidad_id=documento.pk,
+                    tipo=documento.tipo, doc_referencia=documento.doc_referencia,
+                    lineas=[linea.id for linea in creadas],
+                )
+                messages.success(request, f"✅ Documento registrado con {len(creadas)} líneas.")
+                return redirect(f"{reverse('inventario:movimientos_listar')}?documento={documento.pk}")
+        messages.error(request, "❌ Revisa los errores del documento.")
+    else:
+        form = DocumentoMovimientoForm()
+        lineas_formset = LineasDocumentoFormSet(prefix="lineas", cabecera=form)
+    return render(request, "mantenedores/inventario/documento_form.html", {
+        "form": form, "lineas_formset": lineas_formset, "permisos": permisos_por_rol(request.user),
+    })
+
 @login_required
 @role_required("ADMIN", "OPER_INVENTARIO")
 def movimiento_editar(request, pk):
@@ -53,14 +169,20 @@ def movimiento_editar(request, pk):
         if form.is_valid():
             movimiento_editado = form.save(commit=False)
             movimiento_editado.fecha = fecha_original 
-            movimiento_editado.save()
-
-            # --- LOG AUDITORÍA ---
-            print(f"📝 [AUDITORIA] Fecha: {timezone.now()} | Usuario: {request.user.username} | Acción: EDITAR_MOVIMIENTO | ID: {pk}")
-            # ---------------------
+            try:
+                guardar_movimiento(movimiento_editado)
+            except StockInsuficiente as e:
+                form.add_error("cantidad", e)
+            except SerieInvalida as e:
+                form.add_error(form.cleaned_data["campo_series"], e)
+            else:
+                registrar(
+                    "EDITAR_MOVIMIENTO", request, entidad="movimiento", entidad_id=pk,
+                    campos=form.changed_data,
+                )
 
-            messages.success(request, "✅ Movimiento de inventario actualizado correctamente.")
-            return redirect("inventario:movimientos_listar")
+                messages.success(request, "✅ Movimiento de inventario actualizado correctamente.")
+                return redirect("inventario:movimientos_listar")
         messages.error(request, "❌ Revisa los errores del formulario.")
     else:
         form = MovimientoInventarioForm(instance=movimiento)
@@ -74,12 +196,11 @@ def movimiento_editar(request, pk):
 def movimiento_eliminar(request, pk):
     movimiento = get_object_or_404(MovimientoInventario, pk=pk)
     if request.method == "POST":
-        
-        # --- LOG AUDITORÍA ---
-        print(f"❌ [AUDITORIA] Fecha: {timezone.now()} | Usuario: {request.user.username} | Acción: ELIMINAR_MOVIMIENTO | ID: {pk} | Tipo: {movimiento.tipo}")
-        # ---------------------
-
-        movimiento.delete()
+        eliminar_movimiento(movimiento)
+        registrar(
+            "ELIMINAR_MOVIMIENTO", request, entidad="movimiento", entidad_id=pk,
+            tipo=movimiento.tipo, producto_id=movimiento.producto_id, cantidad=movimiento.cantidad,
+        )
         messages.success(request, "✅ Movimiento de inventario eliminado correctamente.")
         return redirect("inventario:movimientos_listar")
     permisos = permisos_por_rol(request.user)
@@ -87,43 +208,277 @@ def movimiento_eliminar(request, pk):
         "movimiento": movimiento, "permisos": permisos,
     })
 
+@login_required
+@role_required("ADMIN", "OPER_INVENTARIO")
+def movimientos_importar(request):
+    resultado = None
+    if request.method == "POST":
+        form = ImportarMovimientosForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data["archivo"]
+            try:
+                filas = leer_filas(archivo, archivo.name)
+            except ErrorImportacion as e:
+                form.add_error("archivo", str(e))
+            else:
+                creados, errores = importar_movimientos(
+                    filas, request.user, parcial=form.cleaned_data["parcial"]
+                )
+                resultado = {"total": len(filas), "creados": len(creados), "errores": errores}
+
+                registrar(
+                    "IMPORTAR_MOVIMIENTOS", request, entidad="movimiento",
+                    archivo=archivo.name, creados=len(creados), errores=len(errores),
+                )
+
+                if creados:
+                    messages.success(request, f"✅ Se importaron {len(creados)} movimientos.")
+                if errores:
+                    messages.error(
+                        request,
+                        "❌ El archivo tiene errores; no se importó ninguna fila." if not creados
+                        else f"❌ {len(errores)} filas con errores no se importaron.",
+                    )
+    else:
+        form = ImportarMovimientosForm()
+    permisos = permisos_por_rol(request.user)
+    return render(request, "mantenedores/inventario/movimientos_importar.html", {
+        "form": form, "resultado": resultado, "permisos": permisos,
+    })
+
+@login_required
+@role_required("ADMIN", "OPER_INVENTARIO", "AUDITOR")
+@lectura_replica
+def kardex(request):
+    form = KardexForm(request.GET or None)
+    pagina = None
+    if form.is_valid():
+        datos = form.cleaned_data
+        pagina = pagina_kardex(
+            datos["producto"], bodega=datos["bodega"], desde=datos["desde"], hasta=datos["hasta"],
+            tamano=datos["size"], despues=datos["cursor"], antes=datos["antes"],
+        )
+
+    if request.GET.get("formato") == "json":
+        if pagina is None:
+            return JsonResponse({"errores": form.errors}, status=400)
+        return JsonResponse({
+            "saldo_inicial": str(pagina["saldo_inicial"]),
+            "saldo_final": str(pagina["saldo_final"]),
+            "resultados": [
+                {**movimiento_a_dict(m), "cantidad_signo": str(m.delta), "saldo": str(m.saldo)}
+                for m in pagina["movimientos"]
+            ],
+            "siguiente": pagina["siguiente"],
+            "anterior": pagina["anterior"],
+        })
+
+    params = request.GET.copy()
+    for clave in ("cursor", "antes", "formato"):
+        params.pop(clave, None)
+
+    return render(request, "mantenedores/inventario/kardex.html", {
+        "form": form,
+        "pagina": pagina,
+        "query_filtros": params.urlencode(),
+        "permisos": permisos_por_rol(request.user),
+    })
+
+@login_required
+@role_required("ADMIN", "OPER_INVENTARIO", "AUDITOR")
+def autocompletar(request, entidad):
+    """JSON con hasta ?limite= productos / proveedores / bodegas que empiezan con ?q=."""
+    if entidad not in ENTIDADES_AUTOCOMPLETAR:
+        raise Http404("Entidad no encontrada")
+    try:
+        limite = int(request.GET.get("limite", LIMITE_AUTOCOMPLETAR))
+    except ValueError:
+        limite = LIMITE_AUTOCOMPLETAR
+    return JsonResponse({"resultados": buscar(entidad, request.GET.get("q", ""), limite)})
+
+@login_required
+@role_required("ADMIN", "AUDITOR")
+@lectura_replica
+def auditoria(request):
+    filtro_form = FiltroAuditoriaForm(request.GET)
+    filtros = filtro_form.filtros()
+    tamano = filtros.get("size") or TAMANO_PAGINA_DEFECTO
+
+    qs = filtrar_eventos(EventoAuditoria.objects.all(), filtros)
+    eventos, siguiente, anterior = paginar_keyset(
+        qs, tamano, despues=filtros.get("cursor"), antes=filtros.get("antes")
+    )
+
+    if request.GET.get("formato") == "json":
+        return JsonResponse({
+            "resultados": [evento_a_dict(e) for e in eventos],
+            "siguiente": siguiente,
+            "anterior": anterior,
+        })
+
+    params = request.GET.copy()
+    for clave in ("cursor", "antes", "formato"):
+        params.pop(clave, None)
+
+    return render(request, "mantenedores/inventario/auditoria.html", {
+        "eventos": eventos,
+        "filtro_form": filtro_form,
+        "cursor_siguiente": siguiente,
+        "cursor_anterior": anterior,
+        "query_filtros": params.urlencode(),
+        "permisos": permisos_por_rol(request.user),
+    })
+
+@login_required
+@role_required("ADMIN", "OPER_COMPRAS", "OPER_INVENTARIO", "ANALISTA_FIN")
+def reposicion(request):
+    datos = propuesta_reposicion()
+    formato = request.GET.get("formato")
+    if formato == "json":
+        return JsonResponse({
+            "calculado_en": datos["calculado_en"],
+            "resultados": datos["propuesta"],
+        })
+    if formato in FORMATOS:
+        return respuesta_exportacion(
+            datos["propuesta"], COLUMNAS_REPOSICION, "propuesta_reposicion",
+            formato=formato, titulo_hoja="Reposición",
+        )
+    return render(request, "mantenedores/inventario/reposicion.html", {
+        "propuesta": datos["propuesta"],
+        "calculado_en": datos["calculado_en"],
+        "permisos": permisos_por_rol(request.user),
+    })
+
+@login_required
+@role_required("ADMIN", "ANALISTA_FIN", "AUDITOR")
+@lectura_replica
+def valorizacion_bodegas(request):
+    """JSON con el valor del stock por bodega (costo promedio ponderado)."""
+    valores = valor_por_bodega()
+    bodegas = Bodega.objects.in_bulk(valores)
+    return JsonResponse({
+        "resultados": [
+            {"bodega": {"id": b.pk, "codigo": b.codigo, "nombre": b.nombre}, "valor": str(valores[b.pk])}
+            for b in sorted(bodegas.values(), key=lambda b: b.codigo)
+        ],
+        "total": str(sum(valores.values(), 0)),
+    })
+
+@login_required
+@role_required("ADMIN", "OPER_INVENTARIO", "AUDITOR")
+@lectura_replica
+def stock_a_fecha(request):
+    """JSON con el stock por producto/bodega al final del día ?fecha=AAAA-MM-DD."""
+    form = StockAFechaForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errores": form.errors}, status=400)
+    fecha = form.cleaned_data["fecha"]
+    saldos = saldos_a_fecha(
+        fecha, producto=form.cleaned_data["producto"], bodega=form.cleaned_data["bodega"]
+    )
+
+    productos = Producto.objects.only("sku", "nombre").in_bulk({p for p, _ in saldos})
+    bodegas = Bodega.objects.in_bulk({b for _, b in saldos})
+    resultados = []
+    for (producto_id, bodega_id), cantidad in sorted(saldos.items()):
+        producto, bodega = productos[producto_id], bodegas[bodega_id]
+        resultados.append({
+            "producto": {"id": producto.pk, "sku": producto.sku, "nombre": producto.nombre},
+            "bodega": {"id": bodega.pk, "codigo": bodega.codigo, "nombre": bodega.nombre},
+            "cantidad": str(cantidad),
+        })
+
+    cierre = ultimo_cierre(hasta=fecha)
+    return JsonResponse({
+        "fecha": fecha.isoformat(),
+        "cierre_base": cierre.isoformat() if cierre else None,
+        "resultados": resultados,
+    })
+
+@login_required
+@role_required("ADMIN", "OPER_INVENTARIO", "AUDITOR")
+def buscar_serie(request):
+    """JSON con la ubicación actual de ?serie= (opcionalmente de un ?producto=), desde numero_serie."""
+    serie = request.GET.get("serie", "").strip()
+    if not serie:
+        return JsonResponse({"errores": {"serie": ["Indica un número de serie."]}}, status=400)
+    qs = NumeroSerie.objects.filter(serie=serie).select_related("producto", "bodega")
+    producto = request.GET.get("producto", "")
+    if producto.isdigit():
+        qs = qs.filter(producto_id=int(producto))
+    return JsonResponse({
+        "resultados": [
+            {
+                "producto": {"id": n.producto_id, "sku": n.producto.sku, "nombre": n.producto.nombre},
+                "serie": n.serie,
+                "estado": n.estado,
+                "bodega": (
+                    {"id": n.bodega_id, "codigo": n.bodega.codigo, "nombre": n.bodega.nombre}
+                    if n.bodega_id else None
+                ),
+                "ultimo_movimiento": n.tipo_ultimo,
+                "fecha_ultimo": n.fecha_ultimo.isoformat() if n.fecha_ultimo else None,
+            }
+            for n in qs
+        ],
+    })
+
+@login_required
+@role_required("ADMIN", "OPER_INVENTARIO", "AUDITOR")
+@lectura_replica
 def exportar_movimientos_excel(request):
-    from .models import MovimientoInventario 
-    movimientos = (
-        MovimientoInventario.objects
-        .select_related("producto", "proveedor", "bodega_origen", "bodega_destino", "usuario")
-        .order_by("-fecha")
-    )   
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Movimientos"
-    encabezados = [
-        "ID", "Fecha registro", "Tipo", "Producto", "Proveedor (RUT/NIF)",
-        "Bodega origen", "Bodega destino", "Cantidad", "Lote", "Serie",
-        "Fecha vencimiento", "Documento referencia", "Motivo", "Observaciones", "Usuario",
-    ]
-    ws.append(encabezados)
-    for m in movimientos:
-        ws.append([
-            m.id,
-            m.fecha.strftime("%d-%m-%Y %H:%M") if m.fecha else "",
-            m.get_tipo_display(),
-            m.producto.nombre if m.producto else "",
-            m.proveedor.rut_nif if m.proveedor else "",
-            m.bodega_origen.nombre if m.bodega_origen else "",
-            m.bodega_destino.nombre if m.bodega_destino else "",
-            float(m.cantidad) if m.cantidad is not None else "",
-            m.lote or "",
-            m.serie or "",
-            m.fecha_vencimiento.strftime("%d-%m-%Y") if m.fecha_vencimiento else "",
-            m.doc_referencia or "", # <-- Corregido para evitar error
-            m.motivo or "",
-            m.observaciones or "",
-            m.usuario.username if getattr(m, "usuario", None) else "",
-        ])
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    filtros = FiltroMovimientosForm(request.GET).filtros()
+    movimientos = MovimientosExportables(movimientos_historicos(filtros))
+    if en_segundo_plano(request, movimientos):
+        return encolar_desde_request(request, "movimientos")
+    return respuesta_exportacion(
+        movimientos,
+        COLUMNAS_EXPORTACION,
+        "movimientos_inventario",
+        formato=formato_solicitado(request),
+        titulo_hoja="Movimientos",
     )
-    response["Content-Disposition"] = 'attachment; filename="movimientos_inventario.xlsx"'
-    wb.save(response)
-    return response
\ No newline at end of file
+
+
+@login_required
+def exportacion_estado(request, pk):
+    trabajo = get_object_or_404(TrabajoExportacion, pk=pk)
+    if not puede_ver(request.user, trabajo):
+        messages.error(request, "No tienes permisos para acceder a este módulo.")
+        return redirect("mantenedores")
+
+    descarga = (
+        reverse("inventario:exportacion_descargar", args=[trabajo.pk])
+        if trabajo.estado == "LISTO" else None
+    )
+    if request.GET.get("formato") == "json":
+        return JsonResponse({
+            "id": trabajo.pk,
+            "tipo": trabajo.tipo,
+            "formato": trabajo.formato,
+            "estado": trabajo.estado,
+            "total_filas": trabajo.total_filas,
+            "filas_procesadas": trabajo.filas_procesadas,
+            "porcentaje": trabajo.porcentaje,
+            "error": trabajo.error,
+            "descarga": descarga,
+        })
+    return render(request, "mantenedores/inventario/exportacion_estado.html", {
+        "trabajo": trabajo, "descarga": descarga, "permisos": permisos_por_rol(request.user),
+    })
+
+@login_required
+def exportacion_descargar(request, pk):
+    trabajo = get_object_or_404(TrabajoExportacion, pk=pk, estado="LISTO")
+    if not puede_ver(request.user, trabajo):
+        messages.error(request, "No tienes permisos para acceder a este módulo.")
+        return redirect("mantenedores")
+    if not trabajo.archivo or not trabajo.archivo.storage.exists(trabajo.archivo.name):
+        raise Http404("El archivo de la exportación ya no existe.")
+    return FileResponse(
+        trabajo.archivo.open("rb"),
+        as_attachment=True,
+        filename=os.path.basename(trabajo.archivo.name),
+        content_type=FORMATOS.get(trabajo.formato),
+    )
\ No newline at end of file
@@ -0,0 +1,52 @@
+from django.db.models import Q
+
+from .choices import CONDICIONES_PAGO
+from .models import Proveedor
+
+
+def filtrar_proveedores(q):
+    """Búsqueda del listado de proveedores (la misma que usa la exportación)."""
+    qs = Proveedor.objects.select_related("pais", "division").order_by("razon_social")
+    if q:
+        qs = qs.filter(
+            Q(razon_social__icontains=q) |
+            Q(rut_nif__icontains=q) |
+            Q(email__icontains=q) |
+            Q(ciudad__icontains=q)
+        )
+    return qs
+
+
+def buscar_proveedores(q, limite):
+    """Proveedores cuyo RUT/NIF o razón social empieza con `q`, hasta `limite` (una consulta indexada por campo)."""
+    encontrados = {}
+    for campo in ("rut_nif", "razon_social"):
+        faltan = limite - len(encontrados)
+        if faltan <= 0:
+            break
+        qs = (
+            Proveedor.objects.filter(**{f"{campo}__istartswith": q})
+            .exclude(pk__in=list(encontrados))
+            .order_by(campo)
+            .only("rut_nif", "razon_social")
+        )
+        for proveedor in qs[:faltan]:
+            encontrados[proveedor.pk] = proveedor
+    return list(encontrados.values())
+
+
+COLUMNAS_EXPORTACION = [
+    ("RUT/NIF", lambda p: p.rut_nif),
+    ("Razón Social", lambda p: p.razon_social),
+    ("Nombre Fantasía", lambda p: p.nombre_fantasia or ""),
+    ("Email", lambda p: p.email),
+    ("Teléfono", lambda p: p.telefono or ""),
+    ("Ciudad", lambda p: p.ciudad or ""),
+    ("País", lambda p: p.pais.nombre if p.pais else ""),
+    ("División", lambda p: p.division.nombre if p.division else ""),
+    ("Dirección", lambda p: p.direccion or ""),
+    ("Sitio Web", lambda p: p.sitio_web or ""),
+    ("Moneda", lambda p: p.moneda),
+    ("Condiciones Pago", lambda p: dict(CONDICIONES_PAGO).get(p.condiciones_pago, p.condiciones_pago)),
+    ("Estado", lambda p: p.get_estado_display()),
+]
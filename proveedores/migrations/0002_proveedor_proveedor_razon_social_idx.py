@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proveedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proveedor',
+            index=models.Index(fields=['razon_social'], name='proveedor_razon_social_idx'),
+        ),
+    ]
@@ -90,6 +90,10 @@ class Proveedor(models.Model):
         verbose_name = 'Proveedor'
         verbose_name_plural = 'Proveedores'
         ordering = ['razon_social']
+        indexes = [
+            # Búsqueda por prefijo del autocompletar (RUT/NIF ya es único)
+            models.Index(fields=['razon_social'], name='proveedor_razon_social_idx'),
+        ]
 
     def __str__(self):
         return f"{self.razon_social} ({self.rut_nif})"
@@ -1,13 +1,15 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q
-from django.utils import timezone # <--- Importante para la auditoría
+from django.http import JsonResponse
 
 from .models import Proveedor, Pais, DivisionAdministrativa
 from .forms import ProveedorForm
 from .permisos import permisos_proveedores_context
-from .choices import CONDICIONES_PAGO
+from .consultas import COLUMNAS_EXPORTACION, filtrar_proveedores
+from proyecto_lilis.exportar import formato_solicitado, respuesta_exportacion
+from proyecto_lilis.replica import lectura_replica
+from inventario.auditoria import registrar
+from inventario.exportaciones import en_segundo_plano, encolar_desde_request
 
 def puede_entrar_modulo(user):
     return user.is_authenticated and user.rol in ["ADMIN", "OPER_COMPRAS", "AUDITOR"]
@@ -25,14 +27,7 @@ def puede_eliminar(user):
 @user_passes_test(puede_entrar_modulo)
 def mostrar_todos_proveedores(request):
     q = request.GET.get("q", "").strip()
-    proveedores = Proveedor.objects.all().order_by("razon_social")
-    if q:
-        proveedores = proveedores.filter(
-            Q(razon_social__icontains=q) |
-            Q(rut_nif__icontains=q) |
-            Q(email__icontains=q) |
-            Q(ciudad__icontains=q)
-        )
+    proveedores = filtrar_proveedores(q)
     context = {
         "proveedores": proveedores,
         **permisos_proveedores_context(request.user),
@@ -45,10 +40,7 @@ def crear_proveedor(request):
     form = ProveedorForm(request.POST or None)
     if request.method == "POST" and form.is_valid():
         prov = form.save()
-
-        # --- LOG AUDITORÍA ---
-        print(f"🏭 [AUDITORIA] Fecha: {timezone.now()} | Usuario: {request.user.username} | Acción: CREAR_PROVEEDOR | ID: {prov.id} | Nombre: {prov.razon_social}")
-        # ---------------------
+        registrar("CREAR_PROVEEDOR", request, entidad="proveedor", entidad_id=prov.id, nombre=prov.razon_social)
 
         return redirect("proveedores:listar")
     return render(request, "mantenedores/proveedores/MantenedorAgregarProveedor.html", {
@@ -62,10 +54,10 @@ def editar_proveedor(request, id):
     form = ProveedorForm(request.POST or None, instance=proveedor)
     if request.method == "POST" and form.is_valid():
         form.save()
-
-        # --- LOG AUDITORÍA ---
-        print(f"🔧 [AUDITORIA] Fecha: {timezone.now()} | Usuario: {request.user.username} | Acción: EDITAR_PROVEEDOR | ID: {proveedor.id} | Nombre: {proveedor.razon_social}")
-        # ---------------------
+        registrar(
+            "EDITAR_PROVEEDOR", request, entidad="proveedor", entidad_id=proveedor.id,
+            nombre=proveedor.razon_social, campos=form.changed_data,
+        )
 
         return redirect("proveedores:listar")
     return render(request, "mantenedores/proveedores/MantenedorEditarProveedor.html", {
@@ -77,51 +69,28 @@ def editar_proveedor(request, id):
 def eliminar_proveedor(request, id):
     proveedor = get_object_or_404(Proveedor, id=id)
     if request.method == "POST":
-        
-        # --- LOG AUDITORÍA ---
-        print(f"🗑️ [AUDITORIA] Fecha: {timezone.now()} | Usuario: {request.user.username} | Acción: ELIMINAR_PROVEEDOR | ID: {proveedor.id} | Nombre: {proveedor.razon_social}")
-        # ---------------------
-
+        registrar(
+            "ELIMINAR_PROVEEDOR", request, entidad="proveedor", entidad_id=proveedor.id,
+            nombre=proveedor.razon_social,
+        )
         proveedor.delete()
         return redirect("proveedores:listar")
     return redirect("proveedores:listar")
 
 @login_required
 @user_passes_test(puede_entrar_modulo)
+@lectura_replica
 def exportar_proveedores_excel(request):
-    q = request.GET.get("q", "").strip()
-    qs = Proveedor.objects.all().order_by("razon_social")
-    if q:
-        qs = qs.filter(
-            Q(razon_social__icontains=q) |
-            Q(rut_nif__icontains=q) |
-            Q(email__icontains=q) |
-            Q(ciudad__icontains=q)
-        )
-    from openpyxl import Workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Proveedores"
-    headers = [
-        "RUT/NIF", "Razón Social", "Nombre Fantasía", "Email", "Teléfono", "Ciudad",
-        "País", "División", "Dirección", "Sitio Web", "Moneda", "Condiciones Pago", "Estado"
-    ]
-    ws.append(headers)
-    for p in qs:
-        ws.append([
-            p.rut_nif, p.razon_social, (p.nombre_fantasia or ""), p.email, (p.telefono or ""),
-            (p.ciudad or ""), (p.pais.nombre if p.pais else ""), (p.division.nombre if p.division else ""),
-            (p.direccion or ""), (p.sitio_web or ""), p.moneda,
-            dict(CONDICIONES_PAGO).get(p.condiciones_pago, p.condiciones_pago),
-            p.get_estado_display() if hasattr(p, "get_estado_display") else p.estado,
-        ])
-    from openpyxl.writer.excel import save_virtual_workbook
-    respuesta = HttpResponse(
-        save_virtual_workbook(wb),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    proveedores = filtrar_proveedores(request.GET.get("q", "").strip())
+    if en_segundo_plano(request, proveedores):
+        return encolar_desde_request(request, "proveedores")
+    return respuesta_exportacion(
+        proveedores,
+        COLUMNAS_EXPORTACION,
+        "proveedores",
+        formato=formato_solicitado(request),
+        titulo_hoja="Proveedores",
     )
-    respuesta["Content-Disposition"] = 'attachment; filename=\"proveedores.xlsx\"'
-    return respuesta
 
 @login_required
 @user_passes_test(puede_entrar_modulo)
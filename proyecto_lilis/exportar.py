@@ -0,0 +1,143 @@
+"""
+Motor de exportación tabular compartido por inventario, proveedores y catalogo.
+
+Recibe un queryset y una especificación de columnas [(titulo, funcion), ...]
+donde `funcion(obj)` devuelve el valor de la celda. Recorre el queryset con
+iterator(chunk_size=...) para no cargarlo entero en memoria y responde con
+StreamingHttpResponse (CSV / NDJSON) o FileResponse sobre un archivo temporal
+(XLSX en modo write-only de openpyxl, que escribe las filas a disco).
+
+El XLSX no se transmite por partes: el archivo (un zip) tiene que estar
+completo antes de enviar el primer byte, así que la memoria queda acotada
+pero el tiempo de respuesta crece con las filas. Para exportaciones
+grandes en XLSX usar CSV / NDJSON o generarlas fuera del request.
+"""
+import csv
+import json
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+
+FORMATOS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+FORMATO_DEFECTO = "xlsx"
+CHUNK_SIZE = 2000
+
+
+def formato_solicitado(request):
+    formato = request.GET.get("formato", FORMATO_DEFECTO).lower()
+    return formato if formato in FORMATOS else FORMATO_DEFECTO
+
+
+def filas(qs, columnas, chunk_size=CHUNK_SIZE, progreso=None):
+    """
+    Genera cada fila como lista de valores, en lotes de chunk_size.
+    `qs` puede ser también una lista ya calculada (p. ej. la propuesta de
+    reposición). `progreso(n)` se llama cada chunk_size filas y al terminar.
+    """
+    total = 0
+    objetos = qs.iterator(chunk_size=chunk_size) if hasattr(qs, "iterator") else qs
+    for obj in objetos:
+        yield [funcion(obj) for _, funcion in columnas]
+        total += 1
+        if progreso and total % chunk_size == 0:
+            progreso(total)
+    if progreso:
+        progreso(total)
+
+
+def _valor_texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime("%d-%m-%Y %H:%M")
+    if isinstance(valor, date):
+        return valor.strftime("%d-%m-%Y")
+    return valor
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _stream_csv(qs, columnas, chunk_size, progreso=None):
+    writer = csv.writer(_Eco())
+    yield "\ufeff"  # BOM para que Excel abra bien los acentos
+    yield writer.writerow([titulo for titulo, _ in columnas])
+    for fila in filas(qs, columnas, chunk_size, progreso):
+        yield writer.writerow([_valor_texto(v) for v in fila])
+
+
+def _stream_ndjson(qs, columnas, chunk_size, progreso=None):
+    titulos = [titulo for titulo, _ in columnas]
+    for fila in filas(qs, columnas, chunk_size, progreso):
+        yield json.dumps(
+            dict(zip(titulos, (_valor_json(v) for v in fila))), ensure_ascii=False
+        ) + "\n"
+
+
+def escribir_xlsx(destino, qs, columnas, titulo_hoja, chunk_size=CHUNK_SIZE, progreso=None):
+    """Escribe el XLSX en `destino` (ruta o archivo) con un Workbook write-only."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo_hoja)
+    ws.append([titulo for titulo, _ in columnas])
+    for fila in filas(qs, columnas, chunk_size, progreso):
+        ws.append([_valor_texto(v) if isinstance(v, (datetime, date)) else v for v in fila])
+    wb.save(destino)
+
+
+def escribir_archivo(ruta, qs, columnas, formato, titulo_hoja="Datos",
+                     chunk_size=CHUNK_SIZE, progreso=None):
+    """Escribe la exportación completa en `ruta` (usado por los trabajos en segundo plano)."""
+    if formato == "xlsx":
+        escribir_xlsx(ruta, qs, columnas, titulo_hoja, chunk_size, progreso)
+        return
+    generador = _stream_csv if formato == "csv" else _stream_ndjson
+    with open(ruta, "w", encoding="utf-8", newline="") as archivo:
+        for linea in generador(qs, columnas, chunk_size, progreso):
+            archivo.write(linea)
+
+
+def respuesta_exportacion(qs, columnas, nombre, formato=FORMATO_DEFECTO,
+                          titulo_hoja="Datos", chunk_size=CHUNK_SIZE):
+    """
+    Arma la respuesta de descarga `nombre.<formato>` para el queryset. CSV y
+    NDJSON se transmiten fila a fila; XLSX se escribe entero antes de
+    responder (ver el docstring del módulo).
+    """
+    archivo = f"{nombre}.{formato}"
+
+    if formato == "xlsx":
+        # openpyxl necesita terminar el archivo antes de enviarlo; el modo
+        # write-only lo va escribiendo a disco, así que la memoria no crece.
+        tmp = tempfile.TemporaryFile()
+        escribir_xlsx(tmp, qs, columnas, titulo_hoja, chunk_size)
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=archivo, content_type=FORMATOS["xlsx"])
+
+    generador = _stream_csv if formato == "csv" else _stream_ndjson
+    respuesta = StreamingHttpResponse(generador(qs, columnas, chunk_size), content_type=FORMATOS[formato])
+    respuesta["Content-Disposition"] = f'attachment; filename="{archivo}"'
+    return respuesta
@@ -0,0 +1,118 @@
+"""
+Lecturas de reportes en una réplica de la base de datos.
+
+Si settings.DATABASES define el alias "replica", ReplicaRouter manda ahí
+las lecturas hechas dentro de lecturas_en_replica(): las vistas marcadas
+con @lectura_replica (exportaciones, Kardex, inicio, auditoría, reportes),
+los trabajos de exportación en segundo plano y los GET de usuarios con
+rol AUDITOR (ReplicaAuditorMiddleware). Todo lo demás, las escrituras y
+cualquier lectura dentro de una transacción (select_for_update) siguen en
+"default". Sin réplica configurada no cambia nada.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+
+
+ALIAS = "replica"
+
+# Apps que se leen siempre del primario: la sesión y la caché en BD deben
+# ver lo que el mismo request acaba de escribir.
+APPS_PRIMARIO = {"sessions", "django_cache"}
+
+_en_replica = ContextVar("lilis_en_replica", default=False)
+
+
+def replica_configurada():
+    return ALIAS in settings.DATABASES
+
+
+@contextmanager
+def lecturas_en_replica():
+    """Dentro del bloque las lecturas van a la réplica (si existe)."""
+    token = _en_replica.set(True)
+    try:
+        yield
+    finally:
+        _en_replica.reset(token)
+
+
+@contextmanager
+def lecturas_en_primario():
+    """Anula lecturas_en_replica() dentro del bloque (datos que quedan en caché)."""
+    token = _en_replica.set(False)
+    try:
+        yield
+    finally:
+        _en_replica.reset(token)
+
+
+def _iterar_en_replica(contenido):
+    # Las respuestas en streaming consultan la BD después de que la vista retorna
+    iterador = iter(contenido)
+    while True:
+        with lecturas_en_replica():
+            try:
+                parte = next(iterador)
+            except StopIteration:
+                return
+        yield parte
+
+
+def lectura_replica(vista):
+    """Decorador para vistas de solo lectura que pueden usar la réplica."""
+    @wraps(vista)
+    def _envoltura(request, *args, **kwargs):
+        with lecturas_en_replica():
+            respuesta = vista(request, *args, **kwargs)
+        if getattr(respuesta, "streaming", False) and replica_configurada():
+            respuesta.streaming_content = _iterar_en_replica(respuesta.streaming_content)
+        return respuesta
+    return _envoltura
+
+
+class ReplicaAuditorMiddleware:
+    """Los GET de un AUDITOR (solo consulta) se leen de la réplica."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            request.method in ("GET", "HEAD")
+            and replica_configurada()
+            and getattr(request.user, "rol", None) == "AUDITOR"
+        ):
+            with lecturas_en_replica():
+                return self.get_response(request)
+        return self.get_response(request)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _en_replica.get() or not replica_configurada():
+            return None
+        if model._meta.app_label in APPS_PRIMARIO:
+            return None
+        if transaction.get_connection().in_atomic_block:
+            return None
+        return ALIAS
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bases = {"default", ALIAS}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == ALIAS:
+            # Una réplica real recibe el esquema por replicación; la de SQLite
+            # para pruebas locales se migra con: migrate --database=replica
+            return settings.DATABASES[ALIAS]["ENGINE"].endswith("sqlite3")
+        return None
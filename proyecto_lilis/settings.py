@@ -41,10 +41,11 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'accounts_lilis.middleware.NoCacheMiddleware',
+    'accounts_lilis.middleware.PoliticaCacheMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'proyecto_lilis.replica.ReplicaAuditorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,14 +73,69 @@ WSGI_APPLICATION = 'proyecto_lilis.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+def _env_bool(nombre, defecto):
+    return os.environ.get(nombre, str(defecto)).strip().lower() in ("1", "true", "si", "sí", "yes")
+
+
+# Conexiones persistentes: cada worker reutiliza su conexión hasta
+# LILIS_DB_CONN_MAX_AGE segundos (0 = una por request, vacío = sin límite) y
+# la verifica antes de usarla si LILIS_DB_CONN_HEALTH_CHECKS está activo.
+_conn_max_age = os.environ.get('LILIS_DB_CONN_MAX_AGE', '60').strip()
+_conexion = {
+    'CONN_MAX_AGE': int(_conn_max_age) if _conn_max_age else None,
+    'CONN_HEALTH_CHECKS': _env_bool('LILIS_DB_CONN_HEALTH_CHECKS', True),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'proyecto_lilis',
-        'USER': 'lilis_admin',
-        'PASSWORD': 'lilisuser1234',
-        'HOST': '127.0.0.1',
-        'PORT': '3306',
+        'NAME': os.environ.get('LILIS_DB_NAME', 'proyecto_lilis'),
+        'USER': os.environ.get('LILIS_DB_USER', 'lilis_admin'),
+        'PASSWORD': os.environ.get('LILIS_DB_PASSWORD', 'lilisuser1234'),
+        'HOST': os.environ.get('LILIS_DB_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('LILIS_DB_PORT', '3306'),
+        **_conexion,
+    }
+}
+
+# Réplica de lectura opcional para reportes (ver proyecto_lilis/replica.py).
+# LILIS_DB_REPLICA_HOST apunta a una réplica MySQL con las mismas
+# credenciales; LILIS_DB_REPLICA_SQLITE usa un archivo SQLite en su lugar
+# para probar el ruteo en local (con LILIS_DB_SQLITE como primario).
+if os.environ.get('LILIS_DB_SQLITE'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['LILIS_DB_SQLITE'],
+        **_conexion,
+    }
+if os.environ.get('LILIS_DB_REPLICA_SQLITE'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['LILIS_DB_REPLICA_SQLITE'],
+        **_conexion,
+    }
+elif os.environ.get('LILIS_DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['LILIS_DB_REPLICA_HOST'],
+        'PORT': os.environ.get('LILIS_DB_REPLICA_PORT', DATABASES['default'].get('PORT', '3306')),
+    }
+if 'replica' in DATABASES:
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['proyecto_lilis.replica.ReplicaRouter']
+
+# Caché compartida entre procesos (propuesta de reposición, contadores, etc.).
+# La tabla se crea con createcachetable (ver README). MAX_ENTRIES acota la
+# tabla: al superarlo se descarta 1/CULL_FREQUENCY de las entradas.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'lilis_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 4,
+        },
     }
 }
 
@@ -143,3 +199,6 @@ PASSWORD_RESET_EMAIL_TEMPLATE_NAME = "accounts_lilis/password_reset_email.html"
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Archivos generados que solo se entregan por vistas con control de acceso
+# (exportaciones en segundo plano). No debe quedar bajo MEDIA_ROOT.
+ARCHIVOS_PRIVADOS_ROOT = os.path.join(BASE_DIR, 'privado')
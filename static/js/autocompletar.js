@@ -0,0 +1,69 @@
+// Selects con data-autocompletar: agrega un campo de búsqueda encima y
+// llena las opciones con la respuesta de la vista inventario:autocompletar.
+// Las filas agregadas después (formsets) se activan con el evento
+// "autocompletar:nuevos" sobre document.
+(function () {
+    function activar(select) {
+        if (select.dataset.autocompletarActivo) return;
+        select.dataset.autocompletarActivo = "1";
+        const url = select.dataset.autocompletar;
+        const vacia = select.querySelector('option[value=""]');
+        const buscador = document.createElement("input");
+        buscador.type = "search";
+        buscador.className = "form-control form-control-sm mb-1";
+        buscador.placeholder = "Buscar…";
+        buscador.autocomplete = "off";
+        select.parentNode.insertBefore(buscador, select);
+
+        let espera = null;
+        let pedido = null;
+
+        function llenar(resultados) {
+            const actual = select.value;
+            const seleccionada = select.selectedOptions[0];
+            select.innerHTML = "";
+            if (vacia) select.appendChild(vacia);
+            let incluida = false;
+            resultados.forEach(function (r) {
+                const opcion = new Option(r.texto, r.id);
+                if (String(r.id) === actual) {
+                    opcion.selected = true;
+                    incluida = true;
+                }
+                select.appendChild(opcion);
+            });
+            // La opción elegida se mantiene aunque no esté en los resultados
+            if (actual && !incluida && seleccionada) {
+                select.insertBefore(seleccionada, vacia ? vacia.nextSibling : select.firstChild);
+                seleccionada.selected = true;
+            }
+        }
+
+        function buscar() {
+            if (pedido) pedido.abort();
+            pedido = new AbortController();
+            fetch(url + "?q=" + encodeURIComponent(buscador.value.trim()), {
+                signal: pedido.signal,
+                headers: { "Accept": "application/json" },
+            })
+                .then(function (r) { return r.ok ? r.json() : { resultados: [] }; })
+                .then(function (datos) { llenar(datos.resultados); })
+                .catch(function () {});
+        }
+
+        buscador.addEventListener("input", function () {
+            clearTimeout(espera);
+            espera = setTimeout(buscar, 250);
+        });
+        buscador.addEventListener("focus", function () {
+            if (select.options.length <= 2) buscar();
+        }, { once: true });
+    }
+
+    function activarTodos() {
+        document.querySelectorAll("select[data-autocompletar]").forEach(activar);
+    }
+
+    document.addEventListener("DOMContentLoaded", activarTodos);
+    document.addEventListener("autocompletar:nuevos", activarTodos);
+})();